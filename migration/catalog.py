@@ -0,0 +1,62 @@
+"""
+Snapshot of the source and destination catalogs, taken once per run
+"""
+from datetime import datetime
+from typing import Dict, Any, Iterable, List
+
+from constraints import required_columns
+from utils.db_connection import AccessConnection, PostgresConnection
+
+
+class CatalogSnapshot:
+    """
+    Tables, columns, types, nullability, foreign keys and indexes of both databases
+    
+    The source catalog is read with a single mdb-schema call (or ODBC
+    columns() call) and the destination catalog with one query per kind of
+    object over all tables. Schema checks, the loader and validation then
+    look tables up in memory instead of spawning mdbtools or querying
+    information_schema once per table. Schemas have the format of
+    AccessConnection.get_table_schema and PostgresConnection.get_table_schema.
+    """
+    
+    def __init__(self, source: Dict[str, Dict[str, Any]], dest: Dict[str, Dict[str, Any]]):
+        self.source = source
+        self.dest = dest
+        self.taken_at = datetime.now().isoformat()
+    
+    @classmethod
+    def take(cls, access_db: AccessConnection, postgres_db: PostgresConnection) -> 'CatalogSnapshot':
+        """Read both catalogs"""
+        return cls(access_db.get_table_schemas(), postgres_db.get_table_schemas())
+    
+    @property
+    def source_tables(self) -> List[str]:
+        return list(self.source)
+    
+    @property
+    def dest_tables(self) -> List[str]:
+        return list(self.dest)
+    
+    def source_schema(self, table_name: str) -> Dict[str, Any]:
+        """Schema of a source table (no columns if it doesn't exist)"""
+        return self.source.get(table_name, {'table_name': table_name, 'columns': []})
+    
+    def dest_schema(self, table_name: str) -> Dict[str, Any]:
+        """Schema of a destination table (no columns if it doesn't exist)"""
+        return self.dest.get(table_name, {
+            'table_name': table_name,
+            'columns': [],
+            'foreign_keys': {},
+            'unique_keys': [],
+            'indexes': [],
+        })
+    
+    def required_columns(self, tables: Iterable[str]) -> Dict[str, List[str]]:
+        """Required (NOT NULL, no default) columns of each destination table that has any"""
+        required = {}
+        for table_name in tables:
+            columns = required_columns(self.dest_schema(table_name))
+            if columns:
+                required[table_name] = columns
+        return required
@@ -0,0 +1,152 @@
+"""
+Order-independent checksums of the rows a migration reads and loads
+"""
+from typing import Dict, Any, Iterable, List, Optional, Sequence
+
+from reconcile import FIELD_SEPARATOR, GENERATED_COLUMNS, NULL_MARKER, SKIPPED_TYPES, hash_sql, hash_text, text_normalizer, value_sql
+from utils.db_connection import PostgresConnection, quote_ident
+
+# Checksum sums wrap at 64 bits
+CHECKSUM_BITS = 64
+
+
+class RowChecksum:
+    """
+    Row count and sum of the row hashes of a set of rows
+    
+    The sum (of 60-bit hash_text values, modulo 2^64) doesn't depend on row
+    order, so a table can be checksummed batch by batch as it is streamed,
+    and checksums of disjoint sets of rows (such as the batches of a resumed
+    run, or replayed rejects) add up to the checksum of their union.
+    """
+    
+    def __init__(self, rows: int = 0, hash_sum: int = 0):
+        self.rows = rows
+        self.hash_sum = hash_sum % (1 << CHECKSUM_BITS)
+    
+    def add(self, row_hash: int):
+        self.rows += 1
+        self.hash_sum = (self.hash_sum + row_hash) % (1 << CHECKSUM_BITS)
+    
+    def update(self, row_hashes: Iterable[int]):
+        for row_hash in row_hashes:
+            self.add(row_hash)
+    
+    def __add__(self, other: 'RowChecksum') -> 'RowChecksum':
+        return RowChecksum(self.rows + other.rows, self.hash_sum + other.hash_sum)
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RowChecksum) and (self.rows, self.hash_sum) == (other.rows, other.hash_sum)
+    
+    def __repr__(self) -> str:
+        return f"{self.rows}:{self.hash_sum:016x}"
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON form stored in the migration state"""
+        return {'rows': self.rows, 'sum': f"{self.hash_sum:016x}"}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RowChecksum':
+        return cls(data['rows'], int(data['sum'], 16))
+
+
+def source_row_hash(row: Sequence[Any]) -> int:
+    """Hash of a source row's values as extracted"""
+    return hash_text(FIELD_SEPARATOR.join(NULL_MARKER if value is None else str(value) for value in row))
+
+
+def source_checksum(rows: Iterable[Sequence[Any]]) -> RowChecksum:
+    """Checksum of a source table's rows as extracted"""
+    checksum = RowChecksum()
+    checksum.update(source_row_hash(row) for row in rows)
+    return checksum
+
+
+class LoadedRowHasher:
+    """
+    Hashes rows as they are loaded into a destination table
+    
+    Rows are hashed on the text form PostgreSQL gives their values (see
+    text_normalizer), so the checksum of the loaded rows can later be
+    compared with a single aggregate over the destination table
+    (dest_checksum). Left out are generated columns (ids and timestamps),
+    types without a comparable text form, and columns with a server
+    default: None is sent to those as DEFAULT (see
+    PostgresConnection.insert_rows), so the value stored isn't known here.
+    The hashed columns are recorded with the checksum.
+    """
+    
+    def __init__(self, dest_schema: Dict[str, Any], load_columns: List[str], keep_null: Sequence[str] = ()):
+        catalog = {col['name']: col for col in dest_schema['columns']}
+        self.columns = [
+            name for name in load_columns
+            if name in catalog
+            and name not in GENERATED_COLUMNS
+            and catalog[name]['type'] not in SKIPPED_TYPES
+            and (catalog[name]['default'] is None or name in keep_null)
+        ]
+        self.positions = [load_columns.index(name) for name in self.columns]
+        self.normalizers = [text_normalizer(catalog[name]) for name in self.columns]
+    
+    def hash_row(self, row: tuple) -> int:
+        return hash_text(FIELD_SEPARATOR.join(
+            NULL_MARKER if row[p] is None else normalize(row[p])
+            for p, normalize in zip(self.positions, self.normalizers)
+        ))
+
+
+def dest_checksum(
+    postgres_db: PostgresConnection,
+    dest_table: str,
+    dest_schema: Dict[str, Any],
+    columns: List[str]
+) -> RowChecksum:
+    """
+    Checksum of a destination table's rows over the given columns, in one query
+    
+    Raises:
+        ValueError: If a column no longer exists in the table
+    """
+    catalog = {col['name']: col for col in dest_schema['columns']}
+    missing = [name for name in columns if name not in catalog]
+    if missing:
+        raise ValueError(f"Checksummed columns no longer in {dest_table}: {', '.join(missing)}")
+    
+    if columns:
+        values = ', '.join(value_sql(catalog[name]) for name in columns)
+        row_text = f"concat_ws(chr({ord(FIELD_SEPARATOR)}), {values})"
+    else:
+        row_text = "''"
+    row = postgres_db.fetch_one(f"""
+        SELECT COUNT(*) AS rows, COALESCE(SUM({hash_sql(row_text)}), 0) AS hash_sum
+        FROM {quote_ident(dest_table)}
+    """)
+    return RowChecksum(row['rows'], int(row['hash_sum']))
+
+
+def verify_checksum(
+    postgres_db: PostgresConnection,
+    dest_table: str,
+    dest_schema: Dict[str, Any],
+    checksum: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Compare the checksum recorded when a table was migrated with its current contents
+    
+    Args:
+        checksum: The table's 'checksum' entry in the migration state
+    
+    Returns:
+        None if no loaded-row checksum was recorded, else the recorded and
+        current checksums and whether they match
+    """
+    if not checksum or not checksum.get('loaded'):
+        return None
+    expected = RowChecksum.from_dict(checksum['loaded'])
+    actual = dest_checksum(postgres_db, dest_table, dest_schema, checksum['columns'])
+    return {
+        'columns': checksum['columns'],
+        'expected': repr(expected),
+        'actual': repr(actual),
+        'match': actual == expected,
+    }
@@ -0,0 +1,113 @@
+"""
+Pre-insert constraint checks compiled from the destination catalog
+"""
+from decimal import Decimal
+from typing import AbstractSet, Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+
+# Value ranges of the integer column types
+INTEGER_RANGES: Dict[str, Tuple[int, int]] = {
+    'smallint': (-2 ** 15, 2 ** 15 - 1),
+    'integer': (-2 ** 31, 2 ** 31 - 1),
+    'bigint': (-2 ** 63, 2 ** 63 - 1),
+}
+
+LENGTH_TYPES = ('character varying', 'character')
+
+
+def required_columns(table_schema: Dict[str, Any]) -> List[str]:
+    """Columns that are NOT NULL and have no default, from PostgresConnection.get_table_schema"""
+    return [
+        col['name'] for col in table_schema.get('columns', [])
+        if not col['nullable'] and col['default'] is None
+    ]
+
+
+class ConstraintChecker:
+    """
+    Checks load rows against a destination table's constraints in-process
+    
+    Compiled once per table from the catalog (get_table_schema): NOT NULL
+    columns, varchar/char lengths, numeric precision, integer ranges and
+    foreign keys. Foreign key values must be non-empty and, when the ids of
+    the referenced table are known, one of them. Rows that would be
+    rejected by the server are caught before they are sent, so a batch
+    insert almost never falls back to row-by-row.
+    """
+    
+    def __init__(
+        self,
+        table_schema: Dict[str, Any],
+        columns: Sequence[str],
+        keep_null: Sequence[str] = (),
+        reference_ids: Optional[Dict[str, AbstractSet[str]]] = None
+    ):
+        catalog = {col['name']: col for col in table_schema.get('columns', [])}
+        foreign_keys = table_schema.get('foreign_keys', {})
+        reference_ids = reference_ids or {}
+        
+        self.columns = list(columns)
+        self.not_null: List[Tuple[int, str]] = []
+        self.lengths: List[Tuple[int, str, int]] = []
+        self.numeric: List[Tuple[int, str, Decimal]] = []
+        self.integers: List[Tuple[int, str, int, int]] = []
+        self.foreign_keys: List[Tuple[int, str, Optional[AbstractSet[str]]]] = []
+        
+        for i, name in enumerate(self.columns):
+            col = catalog.get(name)
+            if col is None:
+                continue
+            
+            # None is sent as DEFAULT unless the column keeps NULLs
+            if not col['nullable'] and (name in keep_null or col['default'] is None):
+                self.not_null.append((i, name))
+            
+            if col['type'] in LENGTH_TYPES and col.get('size'):
+                self.lengths.append((i, name, col['size']))
+            elif col['type'] == 'numeric' and col.get('precision') is not None:
+                # Largest magnitude that fits numeric(p, s) is below 10^(p - s)
+                self.numeric.append((i, name, Decimal(10) ** (col['precision'] - (col.get('scale') or 0))))
+            elif col['type'] in INTEGER_RANGES:
+                self.integers.append((i, name) + INTEGER_RANGES[col['type']])
+            
+            if name in foreign_keys:
+                self.foreign_keys.append((i, name, reference_ids.get(foreign_keys[name])))
+    
+    def check(self, row: Sequence[Any]) -> Optional[Tuple[str, str]]:
+        """
+        Check one load row
+        
+        Returns:
+            (column, reason) for the first violation, or None if the row is valid
+        """
+        return next(self.violations(row), None)
+    
+    def violations(self, row: Sequence[Any]) -> Iterator[Tuple[str, str]]:
+        """Every violation of one load row as (column, reason), in check order"""
+        for i, name in self.not_null:
+            if row[i] is None:
+                yield name, "null value in required column"
+        
+        for i, name, size in self.lengths:
+            value = row[i]
+            if value is not None and len(str(value)) > size:
+                yield name, f"value too long for length {size}"
+        
+        for i, name, limit in self.numeric:
+            value = row[i]
+            if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool) and abs(value) >= limit:
+                yield name, "numeric value out of range"
+        
+        for i, name, low, high in self.integers:
+            value = row[i]
+            if isinstance(value, int) and not isinstance(value, bool) and not low <= value <= high:
+                yield name, "integer value out of range"
+        
+        for i, name, known_ids in self.foreign_keys:
+            value = row[i]
+            if value is None:
+                continue
+            if value == "":
+                yield name, "unresolved foreign key"
+            elif known_ids is not None and value not in known_ids:
+                yield name, "foreign key not in referenced table"
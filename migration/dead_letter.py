@@ -0,0 +1,144 @@
+"""
+Dead-letter output for rejected records
+"""
+import base64
+import gzip
+import json
+from collections import Counter, OrderedDict
+from datetime import date, datetime, time
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from utils.row_schema import RowSchema
+
+
+def encode_value(value: Any) -> Any:
+    """Encode a source value for JSON, tagging types JSON can't represent"""
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, time):
+        return {'$time': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$decimal': str(value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'$bytes': base64.b64encode(bytes(value)).decode('ascii')}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def decode_value(value: Any) -> Any:
+    """Decode a value written by encode_value"""
+    if not isinstance(value, dict) or len(value) != 1:
+        return value
+    tag, raw = next(iter(value.items()))
+    if tag == '$datetime':
+        return datetime.fromisoformat(raw)
+    if tag == '$date':
+        return date.fromisoformat(raw)
+    if tag == '$time':
+        return time.fromisoformat(raw)
+    if tag == '$decimal':
+        return Decimal(raw)
+    if tag == '$bytes':
+        return base64.b64decode(raw)
+    return value
+
+
+class DeadLetterWriter:
+    """
+    Writes rejected records as gzip-compressed JSON lines
+    
+    Each line holds the source and destination table, the record's source
+    ordinal and values, the stage that rejected it (transform, constraint or
+    insert, or duplicate for rows dropped by the duplicate policy), the
+    failing field if known, a short reason and the full error detail.
+    Rejections are also counted per table and reason for the run summary.
+    The file is only created once the first record is rejected.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = None
+        # (dest_table, reason) -> count
+        self.counts: Counter = Counter()
+    
+    def write(
+        self,
+        access_table: str,
+        dest_table: str,
+        record: Dict[str, Any],
+        ordinal: Optional[int],
+        stage: str,
+        reason: str,
+        field: Optional[str] = None,
+        detail: Optional[str] = None
+    ):
+        """Write one rejected record"""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self.path, 'at', encoding='utf-8')
+        entry = {
+            'table': access_table,
+            'dest_table': dest_table,
+            'ordinal': ordinal,
+            'stage': stage,
+            'field': field,
+            'reason': reason,
+            'detail': detail,
+            'record': {key: encode_value(value) for key, value in record.items()},
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.counts[(dest_table, reason)] += 1
+    
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+    
+    def close(self):
+        """Finish the compressed stream"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_dead_letters(path: Path) -> Iterator[Dict[str, Any]]:
+    """Read entries from a dead-letter file, decoding their source values"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            entry['record'] = {key: decode_value(value) for key, value in entry['record'].items()}
+            yield entry
+
+
+def load_rejected_tables(path: Path) -> Dict[str, Tuple[RowSchema, List[tuple], List[Optional[int]]]]:
+    """
+    Group the records in a dead-letter file back into source rows per Access table
+    
+    Rows dropped as duplicates were resolved on purpose, not rejected, so
+    they aren't replayed.
+    
+    Returns:
+        {access_table: (schema, rows, source ordinals of the rows)} in the
+        order tables first appear
+    """
+    records: Dict[str, List[Dict[str, Any]]] = OrderedDict()
+    ordinals: Dict[str, List[Optional[int]]] = {}
+    for entry in read_dead_letters(path):
+        if entry['stage'] == 'duplicate':
+            continue
+        records.setdefault(entry['table'], []).append(entry['record'])
+        ordinals.setdefault(entry['table'], []).append(entry.get('ordinal'))
+    
+    tables = OrderedDict()
+    for access_table, table_records in records.items():
+        columns = list(dict.fromkeys(key for record in table_records for key in record))
+        schema = RowSchema(columns)
+        rows = [tuple(record.get(col) for col in columns) for record in table_records]
+        tables[access_table] = (schema, rows, ordinals[access_table])
+    return tables
@@ -0,0 +1,327 @@
+"""
+Duplicate natural key detection for rows streaming into a table
+"""
+import hashlib
+import math
+from typing import Dict, Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+
+DUPLICATE_POLICIES = ('first', 'last', 'merge')
+
+
+def natural_key(table_schema: Dict[str, Any], columns: Iterable[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Natural key of a table: its first unique key made only of the given columns
+    
+    Keys that include the generated id column are ignored, since new ids
+    never collide.
+    
+    Args:
+        table_schema: Schema from PostgresConnection.get_table_schema
+        columns: Destination columns the transform produces
+    
+    Returns:
+        Key column names, or None if no unique key is covered
+    """
+    available = set(columns)
+    for key in table_schema.get('unique_keys', []):
+        if 'id' not in key and all(col in available for col in key):
+            return tuple(key)
+    return None
+
+
+class BloomFilter:
+    """Set membership with a fixed memory footprint and a bounded false positive rate"""
+    
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, key: tuple) -> List[int]:
+        digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+    
+    def add(self, key: tuple) -> bool:
+        """Add a key; returns whether it was (probably) already present"""
+        present = True
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+
+class DuplicateFilter:
+    """
+    Resolves rows that share a natural key before they are sent to the database
+    
+    Under the 'first' policy the first row with a key is loaded and later
+    ones are dropped; under 'last' only the last one is loaded; under 'merge'
+    the rows are combined into one, later non-NULL values taking precedence,
+    and loaded at the position of the last. Rows with a NULL key column never
+    collide and are always loaded.
+    
+    A row chosen to be loaded may still be rejected (see release). Under
+    'first' the key is only claimed by its first row until the rows offered
+    so far settle, and the next row of the key is held meanwhile; under
+    'last' the latest earlier row of a key is held. Either way the key falls
+    back to the held row instead of disappearing.
+    
+    'last' and 'merge' need to know where each key occurs last, so the table
+    is pre-scanned for duplicated keys first. Keys are held in an exact set,
+    or for tables over exact_max_rows in a Bloom filter; only keys the
+    filter reports as repeated (true duplicates plus a small share of false
+    positives) are kept exactly. 'first' with an exact set needs no
+    pre-scan.
+    """
+    
+    def __init__(
+        self,
+        columns: Sequence[str],
+        key_positions: Sequence[int],
+        source_key: Callable[[Sequence[Any]], tuple],
+        transform: Callable[[Sequence[Any]], tuple],
+        policy: str = 'first',
+        expected_rows: int = 0,
+        exact_max_rows: int = 2000000,
+        error_rate: float = 0.001
+    ):
+        if policy not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy {policy!r}, expected one of {', '.join(DUPLICATE_POLICIES)}")
+        self.columns = tuple(columns)
+        self.policy = policy
+        self.key_positions = list(key_positions)
+        self.source_key = source_key
+        self.transform = transform
+        self.use_bloom = expected_rows > exact_max_rows
+        self.expected_rows = expected_rows
+        self.error_rate = error_rate
+        
+        # Streaming mode: every key loaded so far
+        self._seen: Optional[set] = None
+        # Pre-scan mode: ordinal of the last row of each repeated key
+        self._last: Optional[Dict[tuple, int]] = None
+        # Keys of _last already loaded ('first') or merged so far ('merge')
+        self._loaded: set = set()
+        self._pending: Dict[tuple, tuple] = {}
+        # 'first': ordinal of the row that claimed each key, until settled
+        self._claims: Dict[tuple, int] = {}
+        # (ordinal, source row, row) of the fallback per key: 'first', the next
+        # row of a claimed key; 'last', the latest earlier row, then (by the
+        # ordinal of the last row once that is offered) until settled
+        self._held: Dict[tuple, Tuple[int, Any, tuple]] = {}
+        self._fallbacks: Dict[int, Tuple[int, Any, tuple]] = {}
+        # 'last': (ordinal, source row) of held rows replaced by later ones
+        self._superseded: List[Tuple[int, Any]] = []
+        # Rows seen per repeated key in the load pass, to count false positives
+        self._occurrences: Dict[tuple, int] = {}
+        # Streaming mode: keys that were dropped at least once
+        self._repeated: set = set()
+        
+        self.stats = {'dropped': 0, 'merged': 0}
+    
+    @property
+    def needs_prescan(self) -> bool:
+        return self.policy != 'first' or self.use_bloom
+    
+    @staticmethod
+    def _complete(key: tuple) -> bool:
+        return all(value is not None for value in key)
+    
+    def prescan(self, rows: Iterable[Sequence[Any]]):
+        """Find the repeated keys of the whole table and where each occurs last"""
+        seen = BloomFilter(self.expected_rows, self.error_rate) if self.use_bloom else set()
+        self._last = {}
+        for ordinal, row in enumerate(rows):
+            key = self.source_key(row)
+            if not self._complete(key):
+                continue
+            if self.use_bloom:
+                repeated = seen.add(key)
+            else:
+                repeated = key in seen
+                seen.add(key)
+            if repeated:
+                self._last[key] = ordinal
+    
+    def resume(self, rows: Iterable[Sequence[Any]]):
+        """Replay the keys of rows loaded before a resume point"""
+        if not self.needs_prescan:
+            self._seen = set()
+        for ordinal, row in enumerate(rows):
+            key = self.source_key(row)
+            if not self._complete(key):
+                continue
+            if self._seen is not None:
+                self._seen.add(key)
+            elif key in self._last:
+                self._occurrences[key] = self._occurrences.get(key, 0) + 1
+                if self.policy == 'first':
+                    self._loaded.add(key)
+                elif self.policy == 'merge':
+                    self._absorb(key, self.transform(row))
+                elif ordinal < self._last[key]:
+                    self._held[key] = (ordinal, row, self.transform(row))
+                else:
+                    self._held.pop(key, None)
+    
+    def _absorb(self, key: tuple, row: tuple):
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = row
+            return
+        self._pending[key] = tuple(new if new is not None else old for old, new in zip(pending, row))
+    
+    def release(self, ordinal: int, row: Sequence[Any]) -> Optional[Tuple[int, Any, tuple]]:
+        """
+        Row to load in place of the row chosen for a key that can't be loaded
+        
+        The chosen row (the first, or the last) may fail to transform, break a
+        constraint or fail to insert. Under 'merge' the rows merged so far
+        would otherwise never be loaded, and under 'first' and 'last' the key
+        would disappear. Under 'first' a key with no held row is released, so
+        its next row is loaded.
+        
+        Args:
+            ordinal: Ordinal of the row that can't be loaded
+            row: Its source row
+        
+        Returns:
+            (ordinal, source row, transformed row) to load instead, or None
+        """
+        if self.policy == 'first':
+            key = self.source_key(row)
+            if self._claims.get(key) != ordinal:
+                return None
+            del self._claims[key]
+            held = self._held.pop(key, None)
+            if held is None:
+                (self._seen if self._last is None else self._loaded).discard(key)
+                return None
+            self._claims[key] = held[0]
+            return held
+        if self._last is None:
+            return None
+        key = self.source_key(row)
+        if self._last.get(key) != ordinal:
+            return None
+        if self.policy == 'merge':
+            pending = self._pending.pop(key, None)
+            return None if pending is None else (ordinal, row, pending)
+        return self._fallbacks.pop(ordinal, None) or self._held.pop(key, None)
+    
+    def settle(self) -> List[Tuple[int, Any]]:
+        """
+        Held rows dropped as duplicates since the last call
+        
+        Call once the rows offered so far are loaded or rejected: rows held
+        as fallbacks for them are dropped.
+        
+        Returns:
+            (ordinal, source row) of each dropped row, in ordinal order
+        """
+        dropped = self._superseded + [(ordinal, source) for ordinal, source, _ in self._fallbacks.values()]
+        self._superseded = []
+        self._fallbacks = {}
+        if self.policy == 'first':
+            dropped += [(ordinal, source) for ordinal, source, _ in self._held.values()]
+            self._held = {}
+            self._claims = {}
+        self.stats['dropped'] += len(dropped)
+        return sorted(dropped, key=lambda item: item[0])
+    
+    def offer(self, ordinal: int, row: tuple, source: Optional[Sequence[Any]] = None) -> Tuple[Optional[tuple], bool]:
+        """
+        Decide what to load for one transformed row
+        
+        Args:
+            ordinal: Ordinal of the row in the source table
+            row: The transformed row
+            source: The source row, returned by release and settle
+        
+        Returns:
+            (row to load or None, whether the row was dropped as a duplicate).
+            A row can be held (None, False): merged with the last row of its
+            key ('merge'), or kept as a fallback.
+        """
+        key = tuple(row[p] for p in self.key_positions)
+        if not self._complete(key):
+            return row, False
+        
+        if self._last is None:
+            if self._seen is None:
+                self._seen = set()
+            if key in self._seen:
+                self._repeated.add(key)
+            return self._offer_first(ordinal, key, row, source, self._seen)
+        
+        last = self._last.get(key)
+        if last is None:
+            return row, False
+        self._occurrences[key] = self._occurrences.get(key, 0) + 1
+        
+        if self.policy == 'first':
+            return self._offer_first(ordinal, key, row, source, self._loaded)
+        
+        if self.policy == 'last':
+            if ordinal < last:
+                held = self._held.get(key)
+                if held is not None:
+                    self._superseded.append(held[:2])
+                self._held[key] = (ordinal, source, row)
+                return None, False
+            # Kept until the rows settle, in case this one can't be loaded
+            held = self._held.pop(key, None)
+            if held is not None:
+                self._fallbacks[ordinal] = held
+            return row, False
+        
+        # merge
+        self._absorb(key, row)
+        if ordinal < last:
+            self.stats['merged'] += 1
+            return None, False
+        return self._pending.pop(key), False
+    
+    def _offer_first(
+        self,
+        ordinal: int,
+        key: tuple,
+        row: tuple,
+        source: Optional[Sequence[Any]],
+        loaded: set
+    ) -> Tuple[Optional[tuple], bool]:
+        if key not in loaded:
+            loaded.add(key)
+            self._claims[key] = ordinal
+            return row, False
+        if key in self._claims and key not in self._held:
+            # The first row may still be rejected
+            self._held[key] = (ordinal, source, row)
+            return None, False
+        self.stats['dropped'] += 1
+        return None, True
+    
+    def summary(self) -> Dict[str, Any]:
+        """Duplicate statistics for the table"""
+        if self._last is None:
+            duplicate_keys = len(self._repeated)
+            false_positives = 0
+        else:
+            duplicate_keys = sum(1 for n in self._occurrences.values() if n > 1)
+            false_positives = sum(1 for n in self._occurrences.values() if n == 1)
+        return {
+            'key': list(self.columns),
+            'policy': self.policy,
+            'mode': 'bloom' if self.use_bloom else 'exact',
+            'duplicate_rows': self.stats['dropped'] + self.stats['merged'],
+            'duplicate_keys': duplicate_keys,
+            'dropped': self.stats['dropped'],
+            'merged': self.stats['merged'],
+            'false_positives': false_positives if self.use_bloom else 0,
+        }
@@ -0,0 +1,245 @@
+"""
+Per-column statistical fingerprints of source and destination tables
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalog import CatalogSnapshot
+from reconcile import compared_columns, NUMERIC_TYPES, TIMESTAMP_TYPES
+from transform_pool import compile_row_plan
+from transformers import transform_batch
+from utils.db_connection import AccessConnection, PostgresConnection, quote_ident
+
+TEXT_TYPES = ('character varying', 'character', 'text', 'USER-DEFINED')
+TEMPORAL_TYPES = ('date', 'time without time zone') + TIMESTAMP_TYPES
+FLOAT_TYPES = ('real', 'double precision')
+
+# Inclusive string length ranges of the length histogram (None = unbounded)
+LENGTH_BUCKETS: List[Tuple[int, Optional[int]]] = [
+    (0, 0), (1, 8), (9, 16), (17, 32), (33, 64), (65, 128), (129, 255), (256, None),
+]
+
+
+def length_bucket_label(low: int, high: Optional[int]) -> str:
+    if high is None:
+        return f"{low}+"
+    return str(low) if low == high else f"{low}-{high}"
+
+
+def column_metrics(column: Dict[str, Any]) -> List[str]:
+    """Metrics fingerprinted for a column, by type"""
+    metrics = ['nulls', 'distinct']
+    col_type = column['type']
+    if col_type in NUMERIC_TYPES:
+        metrics += ['sum', 'min', 'max']
+    elif col_type in TEMPORAL_TYPES:
+        metrics += ['min', 'max']
+    elif col_type == 'boolean':
+        metrics += ['true']
+    elif col_type in TEXT_TYPES:
+        metrics += ['min_length', 'max_length', 'lengths']
+    return metrics
+
+
+def _coercer(column: Dict[str, Any]) -> Callable[[Any], Any]:
+    """Convert a transformed value to what the column stores (before rounding or truncation)"""
+    col_type = column['type']
+    if col_type in NUMERIC_TYPES:
+        return lambda value: value if isinstance(value, Decimal) else Decimal(str(value))
+    if col_type == 'date':
+        return lambda value: value.date() if isinstance(value, datetime) else value
+    if col_type in TIMESTAMP_TYPES:
+        return lambda value: value if isinstance(value, datetime) or not isinstance(value, date) \
+            else datetime.combine(value, time())
+    if col_type == 'boolean':
+        return bool
+    if col_type == 'character':
+        return lambda value: str(value).rstrip()
+    if col_type in TEXT_TYPES:
+        return str
+    return lambda value: value
+
+
+class ColumnFingerprinter:
+    """
+    Compares per-column aggregates of a source table and its destination table
+    
+    For every compared column (see reconcile.compared_columns; columns with a
+    server default are left out, since source NULLs load as the default):
+    NULL count and distinct count, plus sum/min/max of numbers, min/max of
+    dates and times, the number of true booleans, and min/max length and a
+    length histogram of strings. The source side is computed with pandas over
+    the transformed rows, chunk by chunk; the destination side with one
+    aggregate query. Drift in any metric points at
+    truncation, rounding or shifted dates without comparing rows.
+    """
+    
+    def __init__(
+        self,
+        access_db: AccessConnection,
+        postgres_db: PostgresConnection,
+        access_table: str,
+        dest_table: str,
+        float_tolerance: float = 1e-9,
+        catalog: Optional[CatalogSnapshot] = None
+    ):
+        self.access_db = access_db
+        self.postgres_db = postgres_db
+        self.access_table = access_table
+        self.dest_table = dest_table
+        self.float_tolerance = float_tolerance
+        self.catalog = catalog
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Fingerprint both sides
+        
+        Returns:
+            {'columns': {column: {'source', 'dest', 'drift': [metric names]}},
+            'drift': total number of drifting metrics}
+        """
+        source_table = self.access_db.fetch_table(self.access_table)
+        plan = compile_row_plan(self.access_table, self.dest_table, source_table.schema, {})
+        dest_schema = (
+            self.catalog.dest_schema(self.dest_table) if self.catalog is not None
+            else self.postgres_db.get_table_schema(self.dest_table)
+        )
+        columns = compared_columns(self.dest_table, dest_schema, plan.dest_schema.columns)
+        if not columns:
+            return {'skipped': 'no comparable columns'}
+        
+        source = self._source_fingerprint(source_table, plan, columns)
+        dest = self._dest_fingerprint(columns)
+        
+        result = {'columns': {}, 'drift': 0}
+        for column in columns:
+            name = column['name']
+            drift = [
+                metric for metric in column_metrics(column)
+                if not self._same(column, metric, source[name].get(metric), dest[name].get(metric))
+            ]
+            result['columns'][name] = {'source': source[name], 'dest': dest[name], 'drift': drift}
+            result['drift'] += len(drift)
+        return result
+    
+    def _same(self, column: Dict[str, Any], metric: str, source_value: Any, dest_value: Any) -> bool:
+        if metric == 'sum' and column['type'] in FLOAT_TYPES and source_value is not None and dest_value is not None:
+            scale = max(abs(float(source_value)), abs(float(dest_value)), 1.0)
+            return abs(float(source_value) - float(dest_value)) <= self.float_tolerance * scale
+        return source_value == dest_value
+    
+    def _source_fingerprint(self, source_table, plan, columns) -> Dict[str, Dict[str, Any]]:
+        """Aggregate the transformed source rows with pandas, one chunk at a time"""
+        positions = [plan.dest_schema.index(col['name']) for col in columns]
+        coercers = [_coercer(col) for col in columns]
+        names = [col['name'] for col in columns]
+        totals = {col['name']: {'nulls': 0, 'count': 0} for col in columns}
+        distinct = {col['name']: set() for col in columns}
+        edges = [low for low, _ in LENGTH_BUCKETS[1:]]
+        
+        for chunk in source_table.iter_chunks():
+            rows = [
+                tuple(transformed[p] for p in positions)
+                for transformed, error in transform_batch(chunk, plan)
+                if error is None
+            ]
+            if not rows:
+                continue
+            frame = pd.DataFrame(rows, columns=names, dtype=object)
+            for column, coerce in zip(columns, coercers):
+                name = column['name']
+                stats = totals[name]
+                series = frame[name]
+                present = series[series.notna()]
+                stats['nulls'] += len(series) - len(present)
+                if present.empty:
+                    continue
+                values = present.map(coerce)
+                distinct[name].update(values.unique())
+                metrics = column_metrics(column)
+                if 'sum' in metrics:
+                    stats['sum'] = stats.get('sum', Decimal(0)) + sum(values, Decimal(0))
+                if 'min' in metrics:
+                    low, high = values.min(), values.max()
+                    stats['min'] = low if 'min' not in stats else min(stats['min'], low)
+                    stats['max'] = high if 'max' not in stats else max(stats['max'], high)
+                if 'true' in metrics:
+                    stats['true'] = stats.get('true', 0) + int(values.sum())
+                if 'lengths' in metrics:
+                    lengths = values.str.len().to_numpy()
+                    stats['min_length'] = min(stats.get('min_length', lengths.min()), lengths.min())
+                    stats['max_length'] = max(stats.get('max_length', lengths.max()), lengths.max())
+                    counts = np.bincount(np.searchsorted(edges, lengths, side='right'), minlength=len(LENGTH_BUCKETS))
+                    stats['histogram'] = stats.get('histogram', 0) + counts
+        
+        fingerprint = {}
+        for column in columns:
+            name = column['name']
+            stats = totals[name]
+            metrics = column_metrics(column)
+            values = {'nulls': stats['nulls'], 'distinct': len(distinct[name])}
+            for metric in ('sum', 'min', 'max', 'true', 'min_length', 'max_length'):
+                if metric in metrics:
+                    value = stats.get(metric, 0 if metric in ('sum', 'true') else None)
+                    values[metric] = int(value) if isinstance(value, np.integer) else value
+            if 'lengths' in metrics:
+                histogram = stats.get('histogram', np.zeros(len(LENGTH_BUCKETS), dtype=int))
+                values['lengths'] = {
+                    length_bucket_label(low, high): int(count)
+                    for (low, high), count in zip(LENGTH_BUCKETS, histogram)
+                }
+            fingerprint[name] = values
+        return fingerprint
+    
+    def _dest_fingerprint(self, columns) -> Dict[str, Dict[str, Any]]:
+        """Aggregate every column of the destination table in one query"""
+        expressions: List[Tuple[str, str, str]] = []
+        for column in columns:
+            name = column['name']
+            ident = quote_ident(name)
+            value = f"{ident}::timestamp" if column['type'] in TIMESTAMP_TYPES else ident
+            for metric in column_metrics(column):
+                if metric == 'nulls':
+                    expressions.append((name, metric, f"COUNT(*) FILTER (WHERE {ident} IS NULL)"))
+                elif metric == 'distinct':
+                    expressions.append((name, metric, f"COUNT(DISTINCT {ident})"))
+                elif metric == 'sum':
+                    expressions.append((name, metric, f"COALESCE(SUM({ident}), 0)"))
+                elif metric in ('min', 'max'):
+                    expressions.append((name, metric, f"{metric.upper()}({value})"))
+                elif metric == 'true':
+                    expressions.append((name, metric, f"COUNT(*) FILTER (WHERE {ident})"))
+                elif metric in ('min_length', 'max_length'):
+                    expressions.append((name, metric, f"{metric[:3].upper()}(length({ident}::text))"))
+                elif metric == 'lengths':
+                    for low, high in LENGTH_BUCKETS:
+                        condition = f"length({ident}::text) >= {low}"
+                        if high is not None:
+                            condition += f" AND length({ident}::text) <= {high}"
+                        expressions.append((name, f"lengths:{length_bucket_label(low, high)}",
+                                            f"COUNT(*) FILTER (WHERE {condition})"))
+        
+        select = ', '.join(f"{sql} AS m{i}" for i, (_, _, sql) in enumerate(expressions))
+        row = self.postgres_db.fetch_one(f"SELECT {select} FROM {quote_ident(self.dest_table)}")
+        
+        fingerprint: Dict[str, Dict[str, Any]] = {col['name']: {} for col in columns}
+        for i, (name, metric, _) in enumerate(expressions):
+            value = row[f"m{i}"]
+            if metric.startswith('lengths:'):
+                fingerprint[name].setdefault('lengths', {})[metric.split(':', 1)[1]] = value
+            else:
+                fingerprint[name][metric] = value
+        return fingerprint
+
+
+def format_drift(dest_table: str, column: str, fingerprint: Dict[str, Any]) -> List[str]:
+    """Describe a column's drifting metrics"""
+    return [
+        f"Column drift in {dest_table}.{column}: {metric} source={fingerprint['source'].get(metric)} "
+        f"dest={fingerprint['dest'].get(metric)}"
+        for metric in fingerprint['drift']
+    ]
@@ -0,0 +1,279 @@
+"""
+Foreign key resolution with normalized and fuzzy key matching
+"""
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Mapping
+
+from utils.shared_lookup import SharedLookupIndex
+
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def canonicalize_key(value: Any) -> str:
+    """Canonical form of a lookup key: uppercase with whitespace and punctuation removed"""
+    return _SEPARATORS.sub('', str(value)).upper()
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of a canonical key (padded so short keys still index)"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_postings(keys: Iterable[str]) -> Dict[str, str]:
+    """
+    Trigram index of canonical keys
+    
+    Maps each trigram to the space-separated keys containing it (canonical
+    keys hold no whitespace), so the index can be placed in shared memory as
+    a plain string map.
+    """
+    postings: Dict[str, List[str]] = defaultdict(list)
+    for key in keys:
+        for gram in trigrams(key):
+            postings[gram].append(key)
+    return {gram: ' '.join(matches) for gram, matches in postings.items()}
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Levenshtein distance between two strings, giving up past max_distance
+    
+    Returns max_distance + 1 if the strings are further apart than that.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            )
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class ForeignKeyIndex:
+    """
+    Lookup index for one reference table
+    
+    Resolves a key by exact match, then uppercase, then canonical form, and
+    finally by the closest canonical key within a small edit distance (found
+    through a trigram index). Keys whose canonical form maps to more than one
+    id are left out of the canonical map rather than guessed. The trigram
+    index is built on the first fuzzy lookup, or up front by to_shared so
+    worker processes share it instead of each building their own.
+    """
+    
+    def __init__(
+        self,
+        exact: Mapping,
+        canonical: Mapping,
+        max_distance: int = 2,
+        trigram_index: Optional[Mapping] = None
+    ):
+        self.exact = exact
+        self.canonical = canonical
+        self.max_distance = max_distance
+        self._trigram_index = trigram_index
+    
+    @classmethod
+    def build(cls, lookup_map: Mapping, max_distance: int = 2) -> 'ForeignKeyIndex':
+        """Build the canonical key map for a lookup map"""
+        canonical: Dict[str, str] = {}
+        ambiguous = set()
+        for key, value in lookup_map.items():
+            canon = canonicalize_key(key)
+            if not canon or canon in ambiguous:
+                continue
+            if canon in canonical and canonical[canon] != value:
+                del canonical[canon]
+                ambiguous.add(canon)
+                continue
+            canonical[canon] = value
+        return cls(lookup_map, canonical, max_distance)
+    
+    def to_shared(self) -> 'ForeignKeyIndex':
+        """Copy of this index with its maps and trigram index placed in shared memory for worker processes"""
+        return ForeignKeyIndex(
+            SharedLookupIndex.create(self.exact),
+            SharedLookupIndex.create(self.canonical),
+            self.max_distance,
+            SharedLookupIndex.create(trigram_postings(self.canonical))
+        )
+    
+    def close(self):
+        """Release shared memory held by this index"""
+        for lookup_map in (self.exact, self.canonical, self._trigram_index):
+            if isinstance(lookup_map, SharedLookupIndex):
+                lookup_map.close()
+    
+    def __getstate__(self):
+        # A trigram index built on demand in this process isn't sent along;
+        # a shared one pickles as its block name
+        state = self.__dict__.copy()
+        if not isinstance(state['_trigram_index'], SharedLookupIndex):
+            state['_trigram_index'] = None
+        return state
+    
+    def __len__(self) -> int:
+        return len(self.exact)
+    
+    def resolve(self, key: str) -> Tuple[Optional[str], str]:
+        """
+        Resolve a key to a destination id
+        
+        Returns:
+            (id or None, method) where method is exact, canonical, fuzzy or miss
+        """
+        if key in self.exact:
+            return self.exact[key], 'exact'
+        
+        # Uppercase keys are used by the description/name based maps
+        key_upper = key.upper()
+        if key_upper in self.exact:
+            return self.exact[key_upper], 'exact'
+        
+        canon = canonicalize_key(key)
+        if canon in self.canonical:
+            return self.canonical[canon], 'canonical'
+        
+        match = self._fuzzy_match(canon)
+        if match is not None:
+            return self.canonical[match], 'fuzzy'
+        
+        return None, 'miss'
+    
+    def _fuzzy_match(self, canon: str) -> Optional[str]:
+        """Find the single closest canonical key within the allowed edit distance"""
+        # Short codes are too easy to confuse, so allow one edit per four characters
+        allowed = min(self.max_distance, len(canon) // 4)
+        if allowed < 1:
+            return None
+        
+        if self._trigram_index is None:
+            self._trigram_index = trigram_postings(self.canonical)
+        
+        shared = Counter()
+        for gram in trigrams(canon):
+            for candidate in self._trigram_index.get(gram, '').split():
+                shared[candidate] += 1
+        
+        best, best_distance, tied = None, allowed + 1, False
+        for candidate, _ in shared.most_common(20):
+            distance = edit_distance(canon, candidate, allowed)
+            if distance < best_distance:
+                best, best_distance, tied = candidate, distance, False
+            elif distance == best_distance:
+                tied = True
+        
+        if best is None or tied:
+            return None
+        return best
+
+
+class ForeignKeyResolver:
+    """Resolves values for one foreign key column, caching each distinct miss"""
+    
+    def __init__(self, column: str, index: Optional[ForeignKeyIndex], allow_null: bool = True):
+        self.column = column
+        self.index = index
+        self.allow_null = allow_null
+        # Non-exact resolutions (canonical, fuzzy and misses) keyed by raw value
+        self._resolved: Dict[str, Tuple[Optional[str], str]] = {}
+        self.counts: Counter = Counter()
+        self.missing: Counter = Counter()
+    
+    def __call__(self, value: Any) -> Optional[str]:
+        if value is None:
+            self.counts['null'] += 1
+            return None if self.allow_null else ""
+        
+        if self.index is None:
+            self.counts['no_map'] += 1
+            return None if self.allow_null else ""
+        
+        key = str(value).strip()
+        if key in self._resolved:
+            resolved, method = self._resolved[key]
+        else:
+            resolved, method = self.index.resolve(key)
+            if method != 'exact':
+                self._resolved[key] = (resolved, method)
+        
+        self.counts[method] += 1
+        if resolved is not None:
+            return resolved
+        
+        self.missing[key] += 1
+        # If not found and null not allowed, return empty string (will cause FK error)
+        return None if self.allow_null else ""
+    
+    def take_stats(self) -> Dict[str, Any]:
+        """Return counters accumulated since the last call and reset them"""
+        stats = {
+            'counts': dict(self.counts),
+            'missing': dict(self.missing),
+        }
+        self.counts = Counter()
+        self.missing = Counter()
+        return stats
+
+
+def build_fk_indexes(
+    lookup_maps: Dict[str, Mapping],
+    max_distance: int = 2,
+    shared: bool = False
+) -> Dict[str, ForeignKeyIndex]:
+    """
+    Build one ForeignKeyIndex per reference table
+    
+    Alias keys that point at the same lookup map share a single index.
+    """
+    built: Dict[int, ForeignKeyIndex] = {}
+    indexes = {}
+    for map_name, lookup_map in lookup_maps.items():
+        if id(lookup_map) not in built:
+            index = ForeignKeyIndex.build(lookup_map, max_distance)
+            built[id(lookup_map)] = index.to_shared() if shared else index
+        indexes[map_name] = built[id(lookup_map)]
+    return indexes
+
+
+def release_fk_indexes(indexes: Optional[Dict[str, ForeignKeyIndex]]):
+    """Release shared memory held by a set of indexes"""
+    if not indexes:
+        return
+    for index in {id(i): i for i in indexes.values()}.values():
+        index.close()
+
+
+def merge_fk_stats(total: Dict[str, Dict[str, Any]], delta: Dict[str, Dict[str, Any]]):
+    """Merge per-column resolution counters from take_stats into a running total"""
+    for column, stats in delta.items():
+        column_total = total.setdefault(column, {'counts': Counter(), 'missing': Counter()})
+        column_total['counts'].update(stats['counts'])
+        column_total['missing'].update(stats['missing'])
+
+
+def format_fk_stats(column: str, stats: Dict[str, Any], top: int = 5) -> str:
+    """One-line summary of resolution statistics for a foreign key column"""
+    counts = stats['counts']
+    line = (
+        f"{column}: {counts.get('exact', 0):,} exact, "
+        f"{counts.get('canonical', 0):,} normalized, "
+        f"{counts.get('fuzzy', 0):,} fuzzy, "
+        f"{counts.get('miss', 0) + counts.get('no_map', 0):,} unresolved"
+    )
+    if stats['missing']:
+        top_missing = Counter(stats['missing']).most_common(top)
+        line += " (top missing: " + ", ".join(f"'{k}' x{n}" for k, n in top_missing) + ")"
+    return line
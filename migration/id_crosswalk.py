@@ -0,0 +1,110 @@
+"""
+Legacy key to new id crosswalk persisted in the destination database
+"""
+import sys
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from utils.db_connection import PostgresConnection
+
+
+def legacy_key(value: Any, uppercase: bool = False) -> Optional[str]:
+    """Normalize a source key value the way lookup maps store it (None if blank)"""
+    if value is None:
+        return None
+    key = str(value).strip()
+    if not key:
+        return None
+    return sys.intern(key.upper() if uppercase else key)
+
+
+class IdCrosswalk:
+    """
+    Maps each reference row's legacy (Access) key to the id it was given
+    
+    Entries are written in the loader's transaction as rows are inserted, so
+    later runs, delta syncs and validation can load a foreign key map with
+    one indexed query instead of re-extracting and joining the source table.
+    """
+    
+    TABLE = 'legacy_id_map'
+    
+    def __init__(self, postgres_db: PostgresConnection):
+        self.db = postgres_db
+    
+    def exists(self) -> bool:
+        """Whether the crosswalk table has been created"""
+        row = self.db.fetch_one("SELECT to_regclass(%s) IS NOT NULL AS present", (self.TABLE,))
+        return bool(row and row['present'])
+    
+    def ensure_table(self):
+        """Create the crosswalk table if needed"""
+        self.db.execute_query(f"""
+            CREATE TABLE IF NOT EXISTS "{self.TABLE}" (
+                table_name TEXT NOT NULL,
+                key_name TEXT NOT NULL,
+                legacy_key TEXT NOT NULL,
+                new_id TEXT NOT NULL,
+                PRIMARY KEY (table_name, key_name, legacy_key)
+            )
+        """)
+        self.db.execute_query(
+            f'CREATE INDEX IF NOT EXISTS "{self.TABLE}_new_id_idx" ON "{self.TABLE}" (table_name, new_id)'
+        )
+    
+    def record(
+        self,
+        table_name: str,
+        key_name: str,
+        pairs: Iterable[Tuple[str, str]],
+        cursor=None
+    ) -> int:
+        """
+        Record (legacy_key, new_id) pairs for one key of a table
+        
+        With a cursor the entries are written in that cursor's transaction
+        (so they commit with the rows they describe); otherwise they are
+        committed immediately. A legacy key seen again points at the newer id.
+        
+        Returns:
+            Number of pairs written
+        """
+        # Last id wins for a key repeated within one call
+        values = [(table_name, key_name, key, new_id) for key, new_id in dict(pairs).items()]
+        if not values:
+            return 0
+        
+        query = f"""
+            INSERT INTO "{self.TABLE}" (table_name, key_name, legacy_key, new_id) VALUES %s
+            ON CONFLICT (table_name, key_name, legacy_key) DO UPDATE SET new_id = EXCLUDED.new_id
+        """
+        if cursor is not None:
+            execute_values(cursor, query, values)
+            return len(values)
+        
+        own_cursor = self.db.conn.cursor()
+        try:
+            execute_values(own_cursor, query, values)
+            self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+        finally:
+            own_cursor.close()
+        return len(values)
+    
+    def clear(self, table_name: str):
+        """Delete every entry of a table, e.g. before it is migrated again from scratch"""
+        if self.exists():
+            self.db.execute_query(f'DELETE FROM "{self.TABLE}" WHERE table_name = %s', (table_name,))
+    
+    def load(self, table_name: str, key_name: str) -> Dict[str, str]:
+        """Load the legacy key -> new id map for one key of a table"""
+        if not self.exists():
+            return {}
+        rows = self.db.fetch_all(
+            f'SELECT legacy_key, new_id FROM "{self.TABLE}" WHERE table_name = %s AND key_name = %s',
+            (table_name, key_name)
+        )
+        return {sys.intern(row['legacy_key']): row['new_id'] for row in rows}
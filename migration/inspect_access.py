@@ -42,8 +42,9 @@ def inspect_database(db_path: str, output_dir: str = "schema-docs") -> Dict[str,
     
     try:
         with AccessConnection(db_path) as access_db:
-            # Get all tables
-            tables = access_db.get_tables()
+            # Get all tables and their schemas in one catalog call
+            schemas = access_db.get_table_schemas()
+            tables = list(schemas)
             schema_info['table_count'] = len(tables)
             logger.info(f"Found {len(tables)} tables")
             
@@ -52,7 +53,7 @@ def inspect_database(db_path: str, output_dir: str = "schema-docs") -> Dict[str,
                 logger.info(f"  Inspecting table: {table_name}")
                 
                 # Get table schema
-                table_schema = access_db.get_table_schema(table_name)
+                table_schema = schemas[table_name]
                 
                 # Get record count
                 try:
@@ -108,7 +109,7 @@ def inspect_database(db_path: str, output_dir: str = "schema-docs") -> Dict[str,
         logger.success(f"Summary report saved to: {summary_file}")
         
         return schema_info
-        
+    
     except FileNotFoundError as e:
         logger.error(f"Database file not found: {e}")
         sys.exit(1)
@@ -0,0 +1,234 @@
+"""
+Set-based integrity checks of the destination database, run in parallel
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterable, List, Optional
+
+from catalog import CatalogSnapshot
+from utils.db_connection import PostgresConnection, quote_ident
+
+
+def run_parallel(
+    postgres_db: PostgresConnection,
+    tasks: List[Any],
+    check: Callable[[Any, Any], Any],
+    workers: int = 4
+) -> List[Any]:
+    """
+    Run one read-only query task per item on a pool of connections
+    
+    Args:
+        postgres_db: Connection whose database the pool connects to
+        tasks: Items to check
+        check: Function (cursor, item) -> result, run in a worker thread
+        workers: Maximum number of concurrent connections
+    
+    Returns:
+        Results in the order of tasks
+    """
+    if not tasks:
+        return []
+    workers = max(1, min(workers, len(tasks)))
+    pool = postgres_db.connection_pool(workers)
+    
+    def run(item):
+        conn = pool.getconn()
+        try:
+            conn.set_session(readonly=True, autocommit=True)
+            cursor = conn.cursor()
+            try:
+                return check(cursor, item)
+            finally:
+                cursor.close()
+        finally:
+            pool.putconn(conn)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, tasks))
+    finally:
+        pool.closeall()
+
+
+class ForeignKeyChecker:
+    """
+    Finds rows whose foreign key values have no referenced row
+    
+    Every foreign key in the schema is read with one pg_constraint query.
+    Each is then checked with a single anti-join that returns the orphan
+    count and a sample of orphan key values. The checks run concurrently,
+    one connection per check.
+    """
+    
+    def __init__(self, postgres_db: PostgresConnection, workers: int = 4, sample_size: int = 5):
+        self.db = postgres_db
+        self.workers = workers
+        self.sample_size = sample_size
+    
+    def load_foreign_keys(self, tables: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Foreign keys of the public schema, optionally only those of some tables
+        
+        Returns:
+            Dicts with constraint, table, columns, ref_table and ref_columns
+        """
+        rows = self.db.fetch_all("""
+            SELECT
+                con.conname AS constraint_name,
+                rel.relname::text AS table_name,
+                ref.relname::text AS ref_table,
+                ARRAY(
+                    SELECT a.attname::text
+                    FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+                    JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                    ORDER BY k.ord
+                ) AS columns,
+                ARRAY(
+                    SELECT a.attname::text
+                    FROM unnest(con.confkey) WITH ORDINALITY AS k(attnum, ord)
+                    JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+                    ORDER BY k.ord
+                ) AS ref_columns
+            FROM pg_constraint con
+            JOIN pg_class rel ON rel.oid = con.conrelid
+            JOIN pg_namespace ns ON ns.oid = rel.relnamespace
+            JOIN pg_class ref ON ref.oid = con.confrelid
+            WHERE con.contype = 'f'
+            AND ns.nspname = 'public'
+            ORDER BY rel.relname, con.conname
+        """)
+        wanted = set(tables) if tables is not None else None
+        return [
+            {
+                'constraint': row['constraint_name'],
+                'table': row['table_name'],
+                'columns': list(row['columns']),
+                'ref_table': row['ref_table'],
+                'ref_columns': list(row['ref_columns']),
+            }
+            for row in rows
+            if wanted is None or row['table_name'] in wanted
+        ]
+    
+    def _orphan_query(self, fk: Dict[str, Any]) -> str:
+        columns = [f"t.{quote_ident(col)}" for col in fk['columns']]
+        # MATCH SIMPLE: a key with any NULL column references nothing
+        not_null = ' AND '.join(f"{col} IS NOT NULL" for col in columns)
+        join = ' AND '.join(
+            f"r.{quote_ident(ref_col)} = {col}" for col, ref_col in zip(columns, fk['ref_columns'])
+        )
+        key = columns[0] if len(columns) == 1 else f"ROW({', '.join(columns)})"
+        return f"""
+            WITH orphans AS (
+                SELECT ({key})::text AS key
+                FROM {quote_ident(fk['table'])} t
+                WHERE {not_null}
+                AND NOT EXISTS (SELECT 1 FROM {quote_ident(fk['ref_table'])} r WHERE {join})
+            )
+            SELECT
+                (SELECT COUNT(*) FROM orphans),
+                ARRAY(SELECT DISTINCT key FROM orphans ORDER BY key LIMIT %s)
+        """
+    
+    def _check_one(self, cursor, fk: Dict[str, Any]) -> Dict[str, Any]:
+        result = dict(fk)
+        try:
+            cursor.execute(self._orphan_query(fk), (self.sample_size,))
+            count, sample = cursor.fetchone()
+            result['orphans'] = count
+            result['sample'] = list(sample)
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+    
+    def check(self, tables: Optional[Iterable[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Check the foreign keys of the given tables (all tables if None)
+        
+        Returns:
+            {table: [foreign key dict with 'orphans' and 'sample', or 'error']}
+        """
+        foreign_keys = self.load_foreign_keys(tables)
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        for result in run_parallel(self.db, foreign_keys, self._check_one, self.workers):
+            results.setdefault(result['table'], []).append(result)
+        return results
+
+
+def format_orphans(fk: Dict[str, Any]) -> str:
+    """Describe the orphans found for one foreign key"""
+    columns = ', '.join(fk['columns'])
+    ref_columns = ', '.join(fk['ref_columns'])
+    message = (
+        f"Orphaned foreign keys in {fk['table']}.{columns} -> {fk['ref_table']}.{ref_columns}: "
+        f"{fk['orphans']} records"
+    )
+    if fk.get('sample'):
+        message += f" (e.g. {', '.join(fk['sample'])})"
+    return message
+
+
+class RequiredFieldChecker:
+    """
+    Counts NULL values in required (NOT NULL, no default) columns
+    
+    The required columns of all tables are read from the catalog snapshot
+    (or with one catalog query), and each table is scanned once, with a
+    COUNT(*) FILTER per column. Tables are scanned concurrently, one
+    connection per table.
+    """
+    
+    # Generated by the migration rather than mapped from the source
+    SKIP_COLUMNS = ('id', 'created_at', 'updated_at')
+    
+    def __init__(self, postgres_db: PostgresConnection, workers: int = 4, catalog: Optional[CatalogSnapshot] = None):
+        self.db = postgres_db
+        self.workers = workers
+        self.catalog = catalog
+    
+    def load_required_columns(self, tables: Iterable[str]) -> Dict[str, List[str]]:
+        """Required columns of each table that has any"""
+        if self.catalog is not None:
+            required = {
+                table: [col for col in columns if col not in self.SKIP_COLUMNS]
+                for table, columns in self.catalog.required_columns(tables).items()
+            }
+            return {table: columns for table, columns in required.items() if columns}
+        rows = self.db.fetch_all("""
+            SELECT table_name::text AS table_name, column_name::text AS column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+                AND table_name = ANY(%s)
+                AND is_nullable = 'NO'
+                AND column_default IS NULL
+            ORDER BY table_name, ordinal_position
+        """, (list(tables),))
+        required: Dict[str, List[str]] = {}
+        for row in rows:
+            if row['column_name'] not in self.SKIP_COLUMNS:
+                required.setdefault(row['table_name'], []).append(row['column_name'])
+        return required
+    
+    def _check_one(self, cursor, task) -> Dict[str, Any]:
+        table, columns = task
+        result = {'table': table, 'columns': columns}
+        counts = ', '.join(f"COUNT(*) FILTER (WHERE {quote_ident(col)} IS NULL)" for col in columns)
+        try:
+            cursor.execute(f"SELECT {counts} FROM {quote_ident(table)}")
+            result['nulls'] = dict(zip(columns, cursor.fetchone()))
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+    
+    def check(self, tables: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Count NULLs in the required columns of the given tables
+        
+        Returns:
+            {table: {'columns', 'nulls': {column: count}} or {'columns', 'error'}}
+        """
+        required = self.load_required_columns(tables)
+        return {
+            result['table']: result
+            for result in run_parallel(self.db, list(required.items()), self._check_one, self.workers)
+        }
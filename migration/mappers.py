@@ -1,7 +1,7 @@
 """
 Field mapping definitions between Access tables and Prisma models
 """
-from typing import Dict, Any, Callable
+from typing import Dict, Any, Callable, List, Sequence, Tuple
 from transformers import (
     transform_id, transform_date, transform_decimal, transform_text,
     transform_boolean, transform_integer, lookup_foreign_key, transform_json
@@ -259,6 +259,57 @@ TRANSFORMATIONS: Dict[str, Dict[str, Callable]] = {
 }
 
 
+# Categorical source columns whose values repeat across rows and tables
+# (customer names, quality codes, machine numbers, yarn codes, statuses).
+# Values are interned at extraction so each distinct string is held once.
+# Format: {access_table_name: [source_field, ...]}
+INTERNED_COLUMNS: Dict[str, List[str]] = {
+    'Customers': ['Customer'],
+    'Yarn_Types': ['Yarn_Code', 'Yarn_Type', 'Tex', 'Supplier'],
+    'Fabric_Quality': ['Fab_Qual_No', 'Gauge', 'Mach_No'],
+    'Users': ['User_Code', 'User_Name'],
+    'Fabric_Content': ['Fab_Quality', 'TypeYC', 'Tex'],
+    'Stock_Ref': ['Yarn_Code', 'Customer', 'Status', 'Yarn_Type', 'Tex'],
+    'Customer_Orders': ['Customer_Name', 'Quality_No', 'Stock_Ref', 'Actl_Mach'],
+    'Yarn_Stock': ['Job_No', 'Stock', 'Quality_No'],
+    'Production_Information': ['Job_Card_No', 'Delivery_Note_No', 'Pack_Slip_No'],
+    'Delivery_Note': [],
+    'Pack_Info': ['Delivery_No'],
+    'UserLogs': ['User_Name'],
+}
+
+
+# Natural keys used to resolve foreign keys to reference tables, in the order
+# reference tables are migrated. source_key values are matched as-is (trimmed);
+# alt_source_key values are matched uppercase and stored under the alt_map
+# lookup map name.
+# Format: {access_table_name: {source_key, dest_key[, alt_source_key, alt_dest_key, alt_map]}}
+LOOKUP_KEYS: Dict[str, Dict[str, str]] = {
+    'Customers': {
+        'source_key': 'Customer',  # Access field name
+        'dest_key': 'name',  # PostgreSQL field name
+    },
+    'Yarn_Types': {
+        'source_key': 'Yarn_Code',
+        'dest_key': 'code',
+        'alt_source_key': 'Yarn_Type',  # Alternative lookup by description
+        'alt_dest_key': 'description',
+        'alt_map': 'yarn_types_by_description',
+    },
+    'Fabric_Quality': {
+        'source_key': 'Fab_Qual_No',  # Actual field name in Access
+        'dest_key': 'quality_code',
+    },
+    'Users': {
+        'source_key': 'User_Code',
+        'dest_key': 'email',
+        'alt_source_key': 'User_Name',  # Alternative lookup by name
+        'alt_dest_key': 'name',
+        'alt_map': 'users_by_name',
+    },
+}
+
+
 # Table name mappings: Access table name -> PostgreSQL table name
 TABLE_MAPPINGS: Dict[str, str] = {
     'Customers': 'customers',
@@ -286,33 +337,63 @@ def get_transformations(dest_table: str) -> Dict[str, Callable]:
     return TRANSFORMATIONS.get(dest_table, {})
 
 
+def get_interned_columns(access_table: str) -> List[str]:
+    """Get categorical source columns to intern for an Access table"""
+    return INTERNED_COLUMNS.get(access_table, [])
+
+
+def get_lookup_config(access_table: str) -> Dict[str, str]:
+    """Get the natural key config for a reference table (empty if it isn't one)"""
+    return LOOKUP_KEYS.get(access_table, {})
+
+
+def get_lookup_keys(access_table: str) -> List[Tuple[str, bool]]:
+    """
+    Get the source fields whose values identify rows of a reference table
+    
+    Returns:
+        (source_field, uppercase) pairs, uppercase for alternative keys
+    """
+    config = get_lookup_config(access_table)
+    keys = []
+    if 'source_key' in config:
+        keys.append((config['source_key'], False))
+    if 'alt_source_key' in config:
+        keys.append((config['alt_source_key'], True))
+    return keys
+
+
 def get_table_mapping(access_table: str) -> str:
     """Get PostgreSQL table name for an Access table"""
     return TABLE_MAPPINGS.get(access_table, access_table.lower())
 
 
+def get_access_tables(table_names: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """
+    Access tables for the table names listed in config.yaml (empty = all)
+    
+    The config lists destination table names (e.g. customers); Access
+    table names are accepted too. Matching is case-insensitive.
+    
+    Returns:
+        (Access table names, names that match no mapped table)
+    """
+    if not table_names:
+        return list(TABLE_MAPPINGS.keys()), []
+    by_name = {dest_table.lower(): access_table for access_table, dest_table in TABLE_MAPPINGS.items()}
+    by_name.update({access_table.lower(): access_table for access_table in TABLE_MAPPINGS})
+    access_tables = []
+    unknown = []
+    for table_name in table_names:
+        access_table = by_name.get(table_name.lower())
+        if access_table is None:
+            unknown.append(table_name)
+        elif access_table not in access_tables:
+            access_tables.append(access_table)
+    return access_tables, unknown
+
+
 def get_required_source_columns(access_table: str) -> list:
     """Get list of required source columns for a table"""
     mapping = get_field_mapping(access_table)
     return list(mapping.keys())
-
-
-def get_required_dest_columns(dest_table: str) -> list:
-    """Get list of required destination columns for a table"""
-    # Based on Prisma schema, these are the required (non-nullable) fields
-    required_fields = {
-        'customers': ['name'],
-        'yarn_types': ['code'],
-        'fabric_quality': ['quality_code'],
-        'users': ['email', 'name'],
-        'fabric_content': ['quality_id', 'yarn_type_id', 'percentage', 'position'],
-        'stock_ref': ['yarn_type_id', 'quantity_in_stock', 'status'],
-        'customer_orders': ['job_card_number', 'stock_reference', 'customer_id', 'order_date', 'quality_id', 'quantity_required', 'status'],
-        'yarn_stock': ['job_card_id', 'stock_ref_id', 'quantity_received', 'date_received'],
-        'production_information': ['piece_number', 'job_card_id', 'weight', 'production_date'],
-        'delivery_note': ['delivery_number', 'customer_id', 'delivery_date'],
-        'pack_info': ['pack_slip_number', 'total_weight', 'piece_count', 'pack_date'],
-        'user_logs': ['user_id', 'action', 'timestamp'],
-    }
-    return required_fields.get(dest_table, [])
-
@@ -4,31 +4,52 @@ Main migration script for Access to Supabase PostgreSQL migration
 This script is re-runnable and supports resume capability
 """
 import sys
+import signal
 import argparse
+import threading
+import time
+import psycopg2.errorcodes
+from contextlib import contextmanager
+from itertools import islice
 import yaml
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Set, Tuple, Callable
 from datetime import datetime
 from tqdm import tqdm
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from utils.db_connection import AccessConnection, PostgresConnection
+from utils.db_connection import AccessConnection, PostgresConnection, quote_ident
 from utils.logger import MigrationLogger
+from utils.row_schema import RowSchema
+from utils.table_cache import SpooledTable
 from state_manager import StateManager
 from validators import SchemaValidator
-from transformers import apply_transformations
+from catalog import CatalogSnapshot
+from checksum import LoadedRowHasher, RowChecksum, source_row_hash
+from profiler import LoadProfiler, format_column_profile, save_profile
+from transform_pool import TransformExecutor, resolve_worker_count
+from transformers import compile_key_function, transform_row, collect_plan_stats, collect_field_errors
+from id_crosswalk import IdCrosswalk, legacy_key
+from dead_letter import DeadLetterWriter, load_rejected_tables
+from constraints import ConstraintChecker, required_columns
+from dedupe import DuplicateFilter, natural_key
+from fk_index import ForeignKeyIndex, build_fk_indexes, release_fk_indexes, format_fk_stats
 from mappers import (
-    get_field_mapping, get_transformations, get_table_mapping,
-    get_required_source_columns, get_required_dest_columns
+    get_access_tables, get_field_mapping, get_transformations, get_table_mapping,
+    get_required_source_columns, get_interned_columns,
+    get_lookup_config, get_lookup_keys, LOOKUP_KEYS, INTERNED_COLUMNS
 )
 
 
 class MigrationRunner:
     """Main migration runner"""
     
-    def __init__(self, config: Dict[str, Any], dry_run: bool = False, force: bool = False):
+    # Columns sent as NULL even if None; other None values let the DB use defaults
+    KEEP_NULL_COLUMNS = ('id', 'created_at', 'updated_at')
+    
+    def __init__(self, config: Dict[str, Any], dry_run: bool = False, force: bool = False, profile: bool = False):
         self.config = config
         self.dry_run = dry_run
         self.force = force
@@ -36,14 +57,50 @@ class MigrationRunner:
             log_file=config.get('logging', {}).get('log_file'),
             level=config.get('logging', {}).get('level', 'INFO')
         )
-        self.state = StateManager()
+        # A profile only reads the state
+        self.state = StateManager.from_config(config, read_only=profile)
+        
+        # Rejected records are written here with their source values and reason
+        rejects_dir = Path(config.get('migration', {}).get('rejects_dir', 'rejects'))
+        self.dead_letters = DeadLetterWriter(
+            rejects_dir / f"rejects-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz"
+        )
+        
+        # Dead-letter file whose records are loaded instead of the source tables
+        self.replay_file: Optional[Path] = None
+        
+        # Profiling dry run: every table is streamed through the transforms and
+        # its load problems are profiled per column, without writing anything
+        self.profile = profile
+        self.profiles: Dict[str, Dict[str, Any]] = {}
         
         # Database connections
         self.access_db = None
         self.postgres_db = None
         
+        # Tables and columns of both databases, read once per run
+        self.catalog: Optional[CatalogSnapshot] = None
+        
         # Lookup maps for foreign keys (built during migration)
         self.lookup_maps: Dict[str, Dict[str, str]] = {}
+        
+        # Legacy key -> new id crosswalk in the destination database
+        self.crosswalk: Optional[IdCrosswalk] = None
+        
+        # Ids known to exist in each reference table, from its lookup maps
+        self.reference_ids: Dict[str, Set[str]] = {}
+        
+        # (legacy key -> id) pairs captured while loading reference tables, per
+        # destination table: {'complete': bool, 'keys': {key_name: {legacy_key: id}}}
+        self.captured_keys: Dict[str, Dict[str, Any]] = {}
+        
+        # Set when SIGINT arrives during a table; the in-flight batch finishes first
+        self._interrupted = False
+        
+        # Normalized/fuzzy FK indexes built from lookup_maps, keyed by whether
+        # they live in shared memory for transform worker processes
+        self.fk_indexes: Dict[bool, Dict[str, ForeignKeyIndex]] = {}
+        self._fk_index_signature = None
     
     def connect_databases(self):
         """Connect to source and destination databases"""
@@ -54,24 +111,36 @@ class MigrationRunner:
         if not db_path:
             raise ValueError("source_database not specified in config")
         
-        self.access_db = AccessConnection(db_path)
+        self.access_db = AccessConnection(
+            db_path,
+            cache_budget_mb=self.config.get('migration', {}).get('memory_budget_mb', 512),
+            intern_columns=INTERNED_COLUMNS
+        )
         self.logger.success(f"Connected to Access database: {db_path}")
         
         # Connect to PostgreSQL
-        db_config = self.config.get('target_database', {})
-        if 'connection_string' in db_config:
-            self.postgres_db = PostgresConnection.from_connection_string(
-                db_config['connection_string']
-            )
-        else:
-            self.postgres_db = PostgresConnection(
-                host=db_config.get('host', 'localhost'),
-                port=db_config.get('port', 54322),
-                database=db_config.get('database', 'postgres'),
-                user=db_config.get('user', 'postgres'),
-                password=db_config.get('password', 'postgres')
-            )
+        self.postgres_db = PostgresConnection.from_config(self.config.get('target_database', {}))
+        if self.profile:
+            # Profiling only reads the catalog and lookup data
+            self.postgres_db.conn.set_session(readonly=True)
         self.logger.success("Connected to PostgreSQL database")
+        
+        self.crosswalk = IdCrosswalk(self.postgres_db)
+        if not self.dry_run:
+            self.crosswalk.ensure_table()
+        
+        self.catalog = CatalogSnapshot.take(self.access_db, self.postgres_db)
+        self.logger.info(
+            f"Catalog: {len(self.catalog.source_tables)} source tables, "
+            f"{len(self.catalog.dest_tables)} destination tables"
+        )
+    
+    def _tables_to_migrate(self) -> List[str]:
+        """Access table names to migrate, from the config's destination table names (empty = all)"""
+        access_tables, unknown = get_access_tables(self.config.get('tables', []))
+        for table_name in unknown:
+            self.logger.warning(f"Table '{table_name}' not found in mappings, skipping")
+        return access_tables
     
     def validate_schemas(self) -> bool:
         """Validate source and destination schemas"""
@@ -80,39 +149,16 @@ class MigrationRunner:
             return True
         
         self.logger.info("Validating schemas...")
-        validator = SchemaValidator(self.access_db, self.postgres_db, self.logger)
+        validator = SchemaValidator(self.access_db, self.postgres_db, self.logger, catalog=self.catalog)
         
         # Validate connections
         if not validator.validate_connections():
             return False
         
         # Get tables to migrate
-        tables_to_migrate = self.config.get('tables', [])
-        if not tables_to_migrate:
+        if not self.config.get('tables'):
             self.logger.warning("No tables specified in config, will migrate all mapped tables")
-            # Get all mapped tables
-            from mappers import TABLE_MAPPINGS
-            tables_to_migrate = list(TABLE_MAPPINGS.keys())
-        else:
-            # Convert config table names (lowercase) to Access table names (from TABLE_MAPPINGS)
-            from mappers import TABLE_MAPPINGS
-            # Reverse lookup: dest_table -> access_table
-            reverse_mapping = {v: k for k, v in TABLE_MAPPINGS.items()}
-            access_tables_to_migrate = []
-            for table_name in tables_to_migrate:
-                # Try to find Access table name
-                access_table = reverse_mapping.get(table_name.lower())
-                if access_table:
-                    access_tables_to_migrate.append(access_table)
-                else:
-                    # Try direct match (case-insensitive)
-                    for acc_tbl, dest_tbl in TABLE_MAPPINGS.items():
-                        if dest_tbl.lower() == table_name.lower():
-                            access_tables_to_migrate.append(acc_tbl)
-                            break
-                    else:
-                        self.logger.warning(f"Table '{table_name}' not found in mappings, skipping")
-            tables_to_migrate = access_tables_to_migrate
+        tables_to_migrate = self._tables_to_migrate()
         
         # Validate each table
         all_valid = True
@@ -121,7 +167,7 @@ class MigrationRunner:
             
             # Get required columns
             required_source = get_required_source_columns(access_table)
-            required_dest = get_required_dest_columns(dest_table)
+            required_dest = required_columns(self.catalog.dest_schema(dest_table))
             
             # Validate source
             if not validator.validate_source_schema(access_table, required_source):
@@ -139,9 +185,16 @@ class MigrationRunner:
                 all_valid = False
                 continue
             
-            # Validate data compatibility (sample)
-            sample_size = self.config.get('validation', {}).get('sample_records', 10)
-            validator.validate_data_compatibility(access_table, field_mapping, sample_size)
+            # Validate data compatibility (stratified random sample)
+            validation_config = self.config.get('validation', {})
+            validator.validate_data_compatibility(
+                access_table,
+                dest_table,
+                confidence=validation_config.get('sample_confidence', 0.95),
+                margin=validation_config.get('sample_margin', 0.05),
+                date_column=validation_config.get('sample_strata', {}).get(access_table),
+                period=validation_config.get('sample_period', 'year')
+            )
         
         # Print validation report
         validator.print_report()
@@ -153,13 +206,10 @@ class MigrationRunner:
         self.logger.info("Building foreign key lookup maps...")
         
         # Reference tables (no dependencies) - migrate these first to build lookup maps
-        reference_tables = ['Customers', 'Yarn_Types', 'Fabric_Quality', 'Users']
+        reference_tables = list(LOOKUP_KEYS)
         
         # Get tables to migrate from config
-        tables_to_migrate = self.config.get('tables', [])
-        if not tables_to_migrate:
-            from mappers import TABLE_MAPPINGS
-            tables_to_migrate = list(TABLE_MAPPINGS.keys())
+        tables_to_migrate = self._tables_to_migrate()
         
         for access_table in reference_tables:
             if access_table not in tables_to_migrate:
@@ -167,8 +217,7 @@ class MigrationRunner:
                 dest_table = get_table_mapping(access_table)
                 try:
                     # Check if table exists in destination
-                    dest_tables = self.postgres_db.get_tables()
-                    if dest_table in dest_tables:
+                    if dest_table in self.catalog.dest:
                         self.logger.info(f"Building lookup map from existing {dest_table} data...")
                         self._build_lookup_map_from_db(access_table, dest_table)
                 except Exception as e:
@@ -177,8 +226,8 @@ class MigrationRunner:
             
             dest_table = get_table_mapping(access_table)
             
-            # Check if already migrated
-            if self.state.should_skip_table(dest_table, self.force):
+            # Check if already migrated (a profile streams completed tables too)
+            if self.state.should_skip_table(dest_table, self.force or self.profile):
                 # Build lookup map from existing data
                 self.logger.info(f"Building lookup map from existing {dest_table} data...")
                 self._build_lookup_map_from_db(access_table, dest_table)
@@ -187,136 +236,220 @@ class MigrationRunner:
             # Migrate the table first
             self.logger.info(f"Migrating {access_table} to build lookup map...")
             result = self.migrate_table(access_table, dest_table)
+            captured = self.captured_keys.pop(dest_table, None)
+            
+            if result.get('status') != 'completed':
+                continue
             
-            if result.get('status') == 'completed':
-                # Build lookup map from migrated data
+            if captured and captured['complete']:
+                # Every row was inserted in this run, so the ids captured during
+                # the load are the whole map; no need to read anything back
+                config = get_lookup_config(access_table)
+                lookup_map = captured['keys'].get(config['source_key'], {})
+                name_lookup_map = captured['keys'].get(config.get('alt_source_key'), {})
+                self._register_lookup_map(dest_table, config, lookup_map, name_lookup_map)
+                self.logger.success(
+                    f"Captured lookup map for {access_table} -> {dest_table} during load: {len(lookup_map)} entries"
+                )
+            else:
+                # Resumed or partly pre-existing table: load it from the crosswalk
                 self._build_lookup_map_from_db(access_table, dest_table)
     
     def _build_lookup_map_from_db(self, access_table: str, dest_table: str):
-        """Build lookup map by querying both source and destination"""
-        # Get unique identifier field for lookup based on table mapping
-        lookup_config = {
-            'Customers': {
-                'source_key': 'Customer',  # Access field name
-                'dest_key': 'name',  # PostgreSQL field name
-            },
-            'Yarn_Types': {
-                'source_key': 'Yarn_Code',
-                'dest_key': 'code',
-                'alt_source_key': 'Yarn_Type',  # Alternative lookup by description
-                'alt_dest_key': 'description',  # Alternative destination field (but we'll map to code via description)
-            },
-            'Fabric_Quality': {
-                'source_key': 'Fab_Qual_No',  # Actual field name in Access
-                'dest_key': 'quality_code',
-            },
-            'Users': {
-                'source_key': 'User_Code',
-                'dest_key': 'email',
-                'alt_source_key': 'User_Name',  # Alternative lookup by name
-                'alt_dest_key': 'name',  # Alternative destination field
-            },
-        }
+        """
+        Build the lookup map for a reference table that is already in the destination
         
-        config = lookup_config.get(access_table)
+        Uses the legacy id crosswalk when it covers every key in the table
+        (one indexed query). Otherwise the source and destination tables are
+        joined on their natural keys, with crosswalk entries taking precedence,
+        and the keys the crosswalk lacked are saved to it so later runs can
+        skip the join. The crosswalk is partial for tables partly loaded
+        before it existed, or by runs without it.
+        """
+        config = get_lookup_config(access_table)
         if not config:
             self.logger.warning(f"No lookup config for {access_table}, skipping lookup map")
             return
         
-        lookup_key = config['source_key']
-        dest_lookup_field = config['dest_key']
-        lookup_map = {}
-        
-        # For Users, also build a name-based lookup map
-        name_lookup_map = {}
-        
         try:
-            # Get all records from source
-            source_records = self.access_db.fetch_all(access_table)
+            lookup_map = {}
+            name_lookup_map = {}
+            if self.crosswalk:
+                lookup_map = self.crosswalk.load(dest_table, config['source_key'])
+                if lookup_map and 'alt_source_key' in config:
+                    name_lookup_map = self.crosswalk.load(dest_table, config['alt_source_key'])
             
-            # Get all records from destination (include alternative fields for Users and Yarn_Types)
-            if access_table in ['Users', 'Yarn_Types'] and 'alt_dest_key' in config:
-                dest_records = self.postgres_db.fetch_all(
-                    f'SELECT id, "{dest_lookup_field}", "{config["alt_dest_key"]}" FROM "{dest_table}"'
+            dest_keys = 0
+            if lookup_map:
+                row = self.postgres_db.fetch_one(
+                    f"SELECT COUNT(DISTINCT NULLIF(BTRIM({quote_ident(config['dest_key'])}::text), '')) AS keys "
+                    f"FROM {quote_ident(dest_table)}"
                 )
+                dest_keys = row['keys'] if row else 0
+            
+            if lookup_map and len(lookup_map) >= dest_keys:
+                self.logger.info(f"Loaded {dest_table} lookup map from the id crosswalk")
             else:
-                dest_records = self.postgres_db.fetch_all(
-                    f'SELECT id, "{dest_lookup_field}" FROM "{dest_table}"'
-                )
+                if lookup_map:
+                    self.logger.info(
+                        f"The id crosswalk covers {len(lookup_map):,} of {dest_keys:,} {dest_table} keys, "
+                        f"joining on natural keys for the rest"
+                    )
+                join_map, join_name_map = self._join_lookup_map(access_table, dest_table, config)
+                missing = {key: new_id for key, new_id in join_map.items() if key not in lookup_map}
+                missing_names = {key: new_id for key, new_id in join_name_map.items() if key not in name_lookup_map}
+                lookup_map = {**join_map, **lookup_map}
+                name_lookup_map = {**join_name_map, **name_lookup_map}
+                if self.crosswalk and not self.dry_run:
+                    self.crosswalk.ensure_table()
+                    self.crosswalk.record(dest_table, config['source_key'], missing.items())
+                    if 'alt_source_key' in config:
+                        self.crosswalk.record(dest_table, config['alt_source_key'], missing_names.items())
             
-            # Build mapping: source lookup key -> destination ID
-            dest_map = {}
-            alt_dest_map = {}
-            for r in dest_records:
-                key_value = r.get(dest_lookup_field)
-                if key_value:
-                    dest_map[str(key_value).strip()] = r['id']
-                
-                # For Users and Yarn_Types, also build alternative field map
-                if access_table in ['Users', 'Yarn_Types'] and 'alt_dest_key' in config:
-                    alt_value = r.get(config['alt_dest_key'])
-                    if alt_value:
-                        alt_dest_map[str(alt_value).strip().upper()] = r['id']  # Uppercase for case-insensitive matching
-            
-            # Build reverse mapping from source to destination
-            for record in source_records:
-                source_key = record.get(lookup_key)
-                if source_key:
-                    source_key_str = str(source_key).strip()
-                    if source_key_str in dest_map:
-                        lookup_map[source_key_str] = dest_map[source_key_str]
-                
-                # For Users and Yarn_Types, also build alternative field mapping
-                if access_table in ['Users', 'Yarn_Types'] and 'alt_source_key' in config:
-                    alt_key = record.get(config['alt_source_key'])
-                    if alt_key:
-                        alt_key_str = str(alt_key).strip().upper()  # Uppercase for case-insensitive matching
-                        if alt_key_str in alt_dest_map:
-                            name_lookup_map[alt_key_str] = alt_dest_map[alt_key_str]
-            
-            # Store lookup map with multiple keys for easier lookup
-            # Use destination table name as primary key
-            self.lookup_maps[dest_table] = lookup_map
-            
-            # For Users, also store name-based lookup map
-            if access_table == 'Users' and name_lookup_map:
-                self.lookup_maps['users_by_name'] = name_lookup_map
-            
-            # For Yarn_Types, also store description-based lookup map
-            if access_table == 'Yarn_Types' and name_lookup_map:
-                self.lookup_maps['yarn_types_by_description'] = name_lookup_map
-            
-            # Also store with singular form for field matching (e.g., "customer" for "customer_id")
-            if dest_table.endswith('s'):
-                singular_key = dest_table[:-1]  # Remove 's'
-                self.lookup_maps[singular_key] = lookup_map
-            
-            # Store with underscore removed for matching
-            no_underscore_key = dest_table.replace('_', '')
-            self.lookup_maps[no_underscore_key] = lookup_map
+            self._register_lookup_map(dest_table, config, lookup_map, name_lookup_map)
             
             self.logger.success(f"Built lookup map for {access_table} -> {dest_table}: {len(lookup_map)} entries")
             if name_lookup_map:
                 self.logger.success(f"Built name-based lookup map for {access_table}: {len(name_lookup_map)} entries")
-            
+        
         except Exception as e:
             self.logger.error(f"Error building lookup map for {access_table}: {e}")
             import traceback
             self.logger.debug(traceback.format_exc())
     
+    def _join_lookup_map(
+        self,
+        access_table: str,
+        dest_table: str,
+        config: Dict[str, str]
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Build lookup maps by joining source and destination rows on their natural keys
+        
+        Returns:
+            (source key -> id, uppercase alternative key -> id)
+        """
+        lookup_key = config['source_key']
+        dest_lookup_field = config['dest_key']
+        has_alt = 'alt_source_key' in config and 'alt_dest_key' in config
+        lookup_map = {}
+        name_lookup_map = {}
+        
+        # Source rows come from the run's shared extraction of the table
+        source_table = self.access_db.fetch_table(access_table)
+        key_position = source_table.schema.index(lookup_key)
+        alt_position = source_table.schema.index(config['alt_source_key']) if has_alt else None
+        
+        # Get all records from destination (include the alternative field if there is one)
+        if has_alt:
+            dest_records = self.postgres_db.fetch_all(
+                f'SELECT id, "{dest_lookup_field}", "{config["alt_dest_key"]}" FROM "{dest_table}"'
+            )
+        else:
+            dest_records = self.postgres_db.fetch_all(
+                f'SELECT id, "{dest_lookup_field}" FROM "{dest_table}"'
+            )
+        
+        # Build mapping: destination key -> destination ID
+        dest_map = {}
+        alt_dest_map = {}
+        for r in dest_records:
+            key_value = legacy_key(r.get(dest_lookup_field))
+            if key_value:
+                dest_map[key_value] = r['id']
+            
+            if has_alt:
+                # Uppercase for case-insensitive matching
+                alt_value = legacy_key(r.get(config['alt_dest_key']), uppercase=True)
+                if alt_value:
+                    alt_dest_map[alt_value] = r['id']
+        
+        # Build reverse mapping from source to destination
+        for row in source_table:
+            if key_position is not None:
+                source_key = legacy_key(row[key_position])
+                if source_key and source_key in dest_map:
+                    lookup_map[source_key] = dest_map[source_key]
+            
+            if alt_position is not None:
+                alt_key = legacy_key(row[alt_position], uppercase=True)
+                if alt_key and alt_key in alt_dest_map:
+                    name_lookup_map[alt_key] = alt_dest_map[alt_key]
+        
+        return lookup_map, name_lookup_map
+    
+    def _register_lookup_map(
+        self,
+        dest_table: str,
+        config: Dict[str, str],
+        lookup_map: Dict[str, str],
+        name_lookup_map: Dict[str, str]
+    ):
+        """Store a reference table's lookup maps under the names FK columns resolve to"""
+        # Use destination table name as primary key
+        self.lookup_maps[dest_table] = lookup_map
+        self.reference_ids[dest_table] = set(lookup_map.values()) | set(name_lookup_map.values())
+        
+        # Alternative (name/description based) lookup map, e.g. users_by_name
+        if name_lookup_map and 'alt_map' in config:
+            self.lookup_maps[config['alt_map']] = name_lookup_map
+        
+        # Also store with singular form for field matching (e.g., "customer" for "customer_id")
+        if dest_table.endswith('s'):
+            singular_key = dest_table[:-1]  # Remove 's'
+            self.lookup_maps[singular_key] = lookup_map
+        
+        # Store with underscore removed for matching
+        no_underscore_key = dest_table.replace('_', '')
+        self.lookup_maps[no_underscore_key] = lookup_map
+    
     def migrate_table(
         self,
         access_table: str,
         dest_table: str,
-        batch_size: int = 1000
+        batch_size: int = 1000,
+        replay_table: Optional[SpooledTable] = None,
+        replay_ordinals: Optional[List[Optional[int]]] = None
     ) -> Dict[str, Any]:
-        """Migrate a single table"""
+        """
+        Migrate a single table
+        
+        With replay_table, those rows (rejected records read back from a
+        dead-letter file) are loaded instead of the source table, without
+        touching the table's checkpoint. replay_ordinals are their ordinals in
+        the source table, which rows rejected again are recorded with.
+        """
         self.logger.info(f"\n{'='*60}")
         self.logger.info(f"Migrating: {access_table} -> {dest_table}")
         self.logger.info(f"{'='*60}")
         
-        # Check if should skip
-        if self.state.should_skip_table(dest_table, self.force):
+        # With state in the destination database, several migration processes
+        # can run at once; each table is migrated by whichever claims it first
+        if not self.state.claim_table(dest_table):
+            self.logger.info(f"Skipping {dest_table} (being migrated by another process)")
+            return {'status': 'skipped', 'reason': 'claimed'}
+        
+        try:
+            return self._migrate_table(access_table, dest_table, batch_size, replay_table, replay_ordinals)
+        finally:
+            self.state.release_table(dest_table)
+    
+    def _migrate_table(
+        self,
+        access_table: str,
+        dest_table: str,
+        batch_size: int,
+        replay_table: Optional[SpooledTable] = None,
+        replay_ordinals: Optional[List[Optional[int]]] = None
+    ) -> Dict[str, Any]:
+        """Migrate a single table once it has been claimed"""
+        replay = replay_table is not None
+        
+        # Check if should skip (a profile covers completed tables too)
+        if self.profile and dest_table in self.profiles:
+            self.logger.info(f"Skipping {dest_table} (already profiled)")
+            return {'status': 'skipped', 'reason': 'profiled'}
+        if not replay and self.state.should_skip_table(dest_table, self.force or self.profile):
             self.logger.info(f"Skipping {dest_table} (already completed)")
             state = self.state.get_table_state(dest_table)
             return {
@@ -324,9 +457,11 @@ class MigrationRunner:
                 'records_migrated': state.get('records_migrated', 0),
             }
         
-        # Reset if force
-        if self.force:
+        # Reset if force; the table's crosswalk entries may point at rows no longer there
+        if self.force and not replay:
             self.state.reset_table(dest_table)
+            if self.crosswalk is not None and not self.dry_run:
+                self.crosswalk.clear(dest_table)
         
         # Get mappings and transformations
         field_mapping = get_field_mapping(access_table)
@@ -337,116 +472,501 @@ class MigrationRunner:
             return {'status': 'skipped', 'reason': 'no_mapping'}
         
         # Get destination table schema to check which columns exist
-        dest_schema = self.postgres_db.get_table_schema(dest_table)
+        dest_schema = self.catalog.dest_schema(dest_table)
         dest_columns = {col['name'] for col in dest_schema['columns']}
         has_created_at = 'created_at' in dest_columns
         has_updated_at = 'updated_at' in dest_columns
         
         # Get record count
         try:
-            total_records = self.access_db.get_record_count(access_table)
-            self.logger.info(f"Total records: {total_records:,}")
+            if replay:
+                total_records = len(replay_table)
+                self.logger.info(f"Replaying {total_records:,} rejected records")
+            else:
+                total_records = self.access_db.get_record_count(access_table)
+                self.logger.info(f"Total records: {total_records:,}")
         except Exception as e:
             self.logger.error(f"Could not get record count: {e}")
             return {'status': 'failed', 'error': str(e)}
         
-        if total_records == 0:
+        if total_records == 0 and not replay:
             self.logger.warning(f"Table {access_table} is empty, skipping")
-            self.state.mark_table_complete(dest_table, 0)
+            if not self.profile:
+                self.state.update_table_state(dest_table, source_count=0, source_counted_at=datetime.now().isoformat())
+                self.state.mark_table_complete(dest_table, 0)
             return {'status': 'skipped', 'reason': 'empty'}
         
-        # Start migration
-        self.state.update_table_state(dest_table, status='in_progress')
+        # Resume from the last committed batch if a previous run stopped partway
+        table_state = self.state.get_table_state(dest_table)
+        start_ordinal = 0
         migrated_count = 0
-        errors = []
+        if not self.force and not self.dry_run and not replay and table_state.get('last_id'):
+            start_ordinal = table_state['last_id']
+            migrated_count = table_state.get('records_migrated', 0)
+        
+        # Start migration (a profile leaves the table's state untouched)
+        if not replay and not self.profile:
+            self.state.update_table_state(dest_table, status='in_progress')
+        # Rejections by reason for this table
+        rejects: Dict[str, int] = {}
         
         try:
-            # Fetch all records (Access doesn't support efficient pagination)
-            self.logger.info("Fetching records from source...")
-            all_records = self.access_db.fetch_all(access_table)
+            if replay:
+                source_table = replay_table
+            else:
+                # Extract the table once (Access doesn't support efficient pagination);
+                # tables over the memory budget are spooled to disk and replayed by chunk
+                self.logger.info("Fetching records from source...")
+                # Taken before the read, so changes made during it count as after it
+                counted_at = datetime.now()
+                source_table = self.access_db.fetch_table(
+                    access_table,
+                    intern_columns=get_interned_columns(access_table)
+                )
+            source_schema = source_table.schema
+            source_count = len(source_table)
+            if not replay and not self.profile:
+                # Cached for validate.py --fast
+                self.state.update_table_state(
+                    dest_table,
+                    source_count=source_count,
+                    source_counted_at=counted_at.isoformat()
+                )
+            if source_table.spilled:
+                self.logger.info("Source table exceeds the memory budget, spooled to disk")
+            
+            if start_ordinal > source_count:
+                self.logger.warning(
+                    f"Checkpoint at record {start_ordinal:,} is past the end of the source "
+                    f"({source_count:,} records), restarting table from the beginning"
+                )
+                start_ordinal = 0
+                migrated_count = 0
+            elif start_ordinal:
+                self.logger.info(f"Resuming from checkpoint at record {start_ordinal:,}")
             
             # Process in batches
-            self.logger.info(f"Processing {len(all_records)} records in batches of {batch_size}...")
+            self.logger.info(f"Processing {source_count - start_ordinal} records in batches of {batch_size}...")
+            
+            workers = self._transform_workers(source_count)
+            if workers > 1:
+                self.logger.info(f"Transforming with {workers} worker processes")
             
-            with tqdm(total=len(all_records), desc=f"Migrating {dest_table}") as pbar:
-                for i in range(0, len(all_records), batch_size):
-                    batch = all_records[i:i + batch_size]
+            batches = source_table.iter_batches(batch_size, start=start_ordinal)
+            ordinal = start_ordinal
+            
+            lookup_maps = self._get_fk_indexes(shared=workers > 1)
+            
+            started = time.monotonic()
+            with TransformExecutor(access_table, dest_table, source_schema, lookup_maps, workers=workers) as executor, \
+                    tqdm(total=source_count, initial=start_ordinal, desc=f"Migrating {dest_table}") as pbar, \
+                    self._deferred_interrupt():
+                # Rows are loaded as tuples: transformed fields, then defaults, then timestamps
+                default_columns = self._default_columns(dest_table, dest_schema, executor.dest_schema, source_schema)
+                # Add timestamps only if columns exist in destination schema
+                timestamp_columns = [
+                    col for col in ('created_at', 'updated_at')
+                    if col in dest_columns and col not in executor.dest_schema
+                ]
+                load_columns = (
+                    list(executor.dest_schema.columns)
+                    + [col for col, _ in default_columns]
+                    + timestamp_columns
+                )
+                
+                # Order-independent checksums of the source rows read and of the rows
+                # loaded, recorded for verification against a destination aggregate
+                row_hasher = None
+                source_checksum = None
+                loaded_checksum = None
+                if self.config.get('migration', {}).get('checksums', True) and not self.dry_run:
+                    row_hasher = LoadedRowHasher(dest_schema, load_columns, self.KEEP_NULL_COLUMNS)
+                    loaded_checksum = RowChecksum()
+                    if not replay:
+                        # Rows before the checkpoint were read by an earlier run, which
+                        # saved their checksum with it (rehashed for older checkpoints)
+                        partial = table_state.get('source_checksum') if start_ordinal else None
+                        if partial and partial.get('rows') == start_ordinal:
+                            source_checksum = RowChecksum.from_dict(partial)
+                        else:
+                            source_checksum = RowChecksum()
+                            source_checksum.update(source_row_hash(row) for row in islice(source_table, start_ordinal))
+                    if start_ordinal:
+                        partial = table_state.get('loaded_checksum')
+                        if partial and partial.get('columns') == row_hasher.columns:
+                            loaded_checksum = RowChecksum.from_dict(partial)
+                        else:
+                            # Rows loaded by an earlier run weren't checksummed
+                            loaded_checksum = None
+                
+                id_position = executor.dest_schema.index('id')
+                
+                # Rows sharing a natural key are resolved here instead of by the server
+                dedupe = self._duplicate_filter(dest_table, dest_schema, executor, source_table, start_ordinal)
+                
+                # Rows the server would reject are caught before they are sent
+                checker = ConstraintChecker(dest_schema, load_columns, self.KEEP_NULL_COLUMNS, self.reference_ids)
+                profiler = LoadProfiler(executor.plan, checker) if self.profile else None
+                
+                # Natural keys of reference tables are recorded in the id crosswalk
+                # as rows are inserted, with the ids the inserts returned. A profile
+                # captures the ids of the rows it would load, so the lookup maps of
+                # the tables after it are built as a real run would build them.
+                key_fields = [
+                    (name, uppercase, source_schema.index(name))
+                    for name, uppercase in get_lookup_keys(access_table)
+                    if name in source_schema
+                ]
+                capture_keys = (
+                    bool(key_fields) and 'id' in executor.dest_schema
+                    and (self.profile or (self.crosswalk is not None and not self.dry_run))
+                )
+                if capture_keys:
+                    self.captured_keys[dest_table] = {
+                        # Rows loaded by an earlier run (or skipped as conflicts) aren't captured
+                        'complete': start_ordinal == 0 and not replay,
+                        'keys': {name: {} for name, _, _ in key_fields},
+                    }
+                
+                # Rejected rows are recorded with their ordinal in the source table
+                # (for replayed rows, the one they were first rejected with)
+                def source_ordinal(row_ordinal):
+                    return replay_ordinals[row_ordinal] if replay_ordinals is not None else row_ordinal
+                
+                def reject(row, row_ordinal, stage, reason, field=None, detail=None):
+                    self._reject(
+                        access_table, dest_table, source_schema, row, source_ordinal(row_ordinal),
+                        stage, reason, field, detail
+                    )
+                    rejects[reason] = rejects.get(reason, 0) + 1
+                
+                def drop_duplicate(row, row_ordinal):
+                    if not self.profile:
+                        self.dead_letters.write(
+                            access_table, dest_table, source_schema.as_dict(row), source_ordinal(row_ordinal),
+                            'duplicate', "duplicate key", field=', '.join(dedupe.columns),
+                            detail=f"resolved by duplicate policy '{dedupe.policy}'"
+                        )
+                
+                def stage(row_ordinal, row, transformed):
+                    """
+                    Queue a transformed row for loading
+                    
+                    A row that breaks a constraint is rejected, and the row its
+                    duplicate policy falls back to (if any) is queued instead.
+                    """
+                    while True:
+                        defaults = tuple(default(row) for _, default in default_columns)
+                        load_row = transformed + defaults + timestamps
+                        violation = profiler.check(load_row) if profiler else checker.check(load_row)
+                        if not violation:
+                            break
+                        reject(row, row_ordinal, 'constraint', violation[1], field=violation[0])
+                        fallback = dedupe.release(row_ordinal, row) if dedupe else None
+                        if fallback is None:
+                            return
+                        row_ordinal, row, transformed = fallback
+                    load_rows.append(load_row)
+                    load_sources.append(row)
+                    load_ordinals.append(row_ordinal)
+                    if capture_keys:
+                        load_keys.append(tuple(
+                            legacy_key(row[position], uppercase) for _, uppercase, position in key_fields
+                        ))
+                
+                for batch, results in executor.map(batches):
+                    timestamps = (datetime.now(),) * len(timestamp_columns)
+                    load_rows = []
+                    # Source row and ordinal of each load row, for rejects and row-level checkpoints
+                    load_sources = []
+                    load_ordinals = []
+                    load_keys = []
+                    for offset, (row, (transformed, transform_error)) in enumerate(zip(batch, results)):
+                        row_ordinal = ordinal + offset
+                        if profiler:
+                            profiler.observe_transform(row, transformed, transform_error)
+                        if transform_error:
+                            reject(row, row_ordinal, 'transform', "transform error", detail=transform_error)
+                            # Rows merged into this one, or the fallback row of its key, are loaded in its place
+                            fallback = dedupe.release(row_ordinal, row) if dedupe else None
+                            if fallback is None:
+                                continue
+                            row_ordinal, row, transformed = fallback
+                        elif dedupe:
+                            transformed, dropped = dedupe.offer(row_ordinal, transformed, row)
+                            if dropped:
+                                drop_duplicate(row, row_ordinal)
+                            if transformed is None:
+                                continue
+                        stage(row_ordinal, row, transformed)
+                    batch_end = ordinal + len(batch)
+                    
+                    source_before = source_hashes = None
+                    if source_checksum is not None:
+                        source_before = RowChecksum(source_checksum.rows, source_checksum.hash_sum)
+                        source_hashes = [source_row_hash(row) for row in batch]
+                        source_checksum.update(source_hashes)
                     
-                    for record in batch:
-                        try:
-                            # Transform record
-                            transformed = apply_transformations(
-                                record,
-                                field_mapping,
-                                transformations,
-                                lookup_maps=self.lookup_maps
+                    # Insert into PostgreSQL (if not dry run). Rows that fail to insert
+                    # are replaced by the fallback rows of their keys, inserted in a
+                    # further round; all rows before batch_end are processed by then,
+                    # so those rounds checkpoint at batch_end.
+                    batch_rows = len(load_rows)
+                    batch_errors = 0
+                    checkpoint_ordinals = load_ordinals
+                    while load_rows:
+                        load_hashes = None
+                        if loaded_checksum is not None:
+                            try:
+                                load_hashes = [row_hasher.hash_row(load_row) for load_row in load_rows]
+                            except Exception as e:
+                                self.logger.warning(f"Loaded rows can't be checksummed, no checksum recorded: {e}")
+                                loaded_checksum = None
+                        
+                        load_errors = []
+                        # Ids of the rows actually inserted (not skipped by ON CONFLICT)
+                        inserted_ids: List[Any] = []
+                        if not self.dry_run:
+                            before_commit = self._commit_hook(
+                                dest_table, migrated_count, checkpoint_ordinals, batch_end,
+                                load_rows, id_position,
+                                [name for name, _, _ in key_fields] if capture_keys else [], load_keys,
+                                checkpoint=not replay,
+                                checksum=loaded_checksum, load_hashes=load_hashes,
+                                checksum_columns=row_hasher.columns if row_hasher else None,
+                                source_checksum=source_before, source_hashes=source_hashes
                             )
-                            
-                            # Ensure id is always present
-                            if 'id' not in transformed:
-                                from transformers import generate_cuid
-                                transformed['id'] = generate_cuid()
-                            
-                            # Add default values for required fields that don't exist in source
-                            self._add_default_values(dest_table, transformed, record)
-                            
-                            # Add timestamps only if columns exist in destination schema
-                            from datetime import datetime
-                            if has_created_at and 'created_at' not in transformed:
-                                transformed['created_at'] = datetime.now()
-                            if has_updated_at and 'updated_at' not in transformed:
-                                transformed['updated_at'] = datetime.now()
-                            
-                            # Insert into PostgreSQL (if not dry run)
-                            if not self.dry_run:
-                                self._insert_record(dest_table, transformed)
-                            
-                            migrated_count += 1
-                            pbar.update(1)
-                            
-                        except Exception as e:
-                            error_msg = f"Error migrating record: {e}"
-                            errors.append(error_msg)
-                            self.logger.warning(error_msg)
-                            if self.config.get('validation', {}).get('strict_mode'):
-                                raise
+                            load_errors = self._insert_rows(
+                                dest_table, load_columns, load_rows,
+                                before_commit=before_commit,
+                                returning='id' if capture_keys or loaded_checksum is not None else None,
+                                inserted=inserted_ids
+                            )
+                        for i, error in load_errors:
+                            field, reason = self._describe_insert_error(error)
+                            reject(load_sources[i], load_ordinals[i], 'insert', reason, field=field, detail=str(error))
+                        
+                        if self.profile and capture_keys:
+                            captured = self.captured_keys[dest_table]
+                            for k, (name, _, _) in enumerate(key_fields):
+                                captured['keys'][name].update(
+                                    (keys[k], load_row[id_position])
+                                    for keys, load_row in zip(load_keys, load_rows) if keys[k] is not None
+                                )
+                        
+                        migrated_count += len(load_rows) - len(load_errors)
+                        batch_errors += len(load_errors)
+                        if loaded_checksum is not None:
+                            inserted = set(inserted_ids)
+                            loaded_checksum.update(
+                                h for load_row, h in zip(load_rows, load_hashes) if load_row[id_position] in inserted
+                            )
+                        
+                        failed = [(load_ordinals[i], load_sources[i]) for i, _ in load_errors]
+                        load_rows, load_sources, load_ordinals, load_keys = [], [], [], []
+                        for row_ordinal, row in failed:
+                            fallback = dedupe.release(row_ordinal, row) if dedupe else None
+                            if fallback is not None:
+                                stage(*fallback)
+                        checkpoint_ordinals = [batch_end] * len(load_rows)
                     
-                    # Update state periodically
-                    if (i + batch_size) % (batch_size * 10) == 0:
-                        self.state.update_table_state(
-                            dest_table,
-                            records_migrated=migrated_count
-                        )
+                    if dedupe:
+                        for row_ordinal, row in dedupe.settle():
+                            drop_duplicate(row, row_ordinal)
+                    ordinal = batch_end
+                    pbar.update(len(batch))
+                    
+                    # Checkpoint after each committed batch: last_id is the ordinal of
+                    # the next source record to process. A transactional state store
+                    # already committed it with the rows, unless rows were rejected.
+                    if not self.dry_run and not replay and \
+                            (not self.state.transactional or batch_errors or not batch_rows):
+                        checkpoint = {'records_migrated': migrated_count, 'last_id': ordinal}
+                        if loaded_checksum is not None:
+                            checkpoint['loaded_checksum'] = dict(loaded_checksum.as_dict(), columns=row_hasher.columns)
+                        if source_checksum is not None:
+                            checkpoint['source_checksum'] = source_checksum.as_dict()
+                        self.state.checkpoint(dest_table, **checkpoint)
+                    
+                    if self._interrupted:
+                        raise KeyboardInterrupt
             
-            # Mark as complete
-            if not self.dry_run:
-                self.state.mark_table_complete(dest_table, migrated_count)
-                self.logger.success(f"Completed: {migrated_count:,} records migrated")
+            elapsed = time.monotonic() - started
+            
+            if profiler:
+                profile = self._profile_table(dest_table, profiler, executor, elapsed)
             else:
+                profile = None
+                # Report how foreign key values were resolved
+                for column, stats in executor.fk_stats.items():
+                    self.logger.info(f"FK resolution {format_fk_stats(column, stats)}")
+                
+                # Fields that failed to transform were loaded as NULL
+                for field, count in executor.field_errors.most_common():
+                    self.logger.warning(f"{field}: {count:,} values failed to transform and were loaded as NULL")
+            
+            duplicates = dedupe.summary() if dedupe else None
+            if duplicates and duplicates['duplicate_rows']:
+                message = (
+                    f"Duplicate ({', '.join(duplicates['key'])}): {duplicates['duplicate_keys']:,} keys repeated, "
+                    f"{duplicates['dropped']:,} rows dropped, {duplicates['merged']:,} merged "
+                    f"(policy '{duplicates['policy']}', {duplicates['mode']} key set)"
+                )
+                if duplicates['false_positives']:
+                    message += f", {duplicates['false_positives']:,} Bloom filter false positives"
+                self.logger.warning(message)
+            
+            for reason, count in sorted(rejects.items(), key=lambda item: -item[1]):
+                self.logger.warning(f"Rejected {count:,} records: {reason}")
+            
+            # Mark as complete
+            if self.dry_run:
                 self.logger.info(f"Dry run: Would migrate {migrated_count:,} records")
+            elif replay:
+                # Replayed rows add to the table's total; its checkpoint is unchanged
+                table_state = self.state.get_table_state(dest_table)
+                updates = {'records_migrated': table_state.get('records_migrated', 0) + migrated_count}
+                # Replayed rows are added to the recorded checksum, which is dropped if they can't be
+                checksum = table_state.get('checksum')
+                if checksum and checksum.get('loaded'):
+                    if loaded_checksum is not None and checksum['columns'] == row_hasher.columns:
+                        loaded = RowChecksum.from_dict(checksum['loaded']) + loaded_checksum
+                        updates['checksum'] = dict(checksum, loaded=loaded.as_dict())
+                    else:
+                        updates['checksum'] = dict(checksum, loaded=None)
+                self.state.update_table_state(dest_table, **updates)
+                self.logger.success(f"Replayed: {migrated_count:,} of {total_records:,} records loaded")
+            else:
+                checksum = None
+                if source_checksum is not None:
+                    checksum = {
+                        'columns': row_hasher.columns,
+                        'source': source_checksum.as_dict(),
+                        'loaded': loaded_checksum.as_dict() if loaded_checksum is not None else None,
+                    }
+                if elapsed > 0 and source_count > start_ordinal:
+                    # Source rows per second through transforms and INSERTs, for profile projections
+                    self.state.update_table_state(dest_table, load_rate=round((source_count - start_ordinal) / elapsed, 1))
+                self.state.mark_table_complete(dest_table, migrated_count, checksum=checksum)
+                self.logger.success(f"Completed: {migrated_count:,} records migrated")
             
             return {
                 'status': 'completed',
                 'records_migrated': migrated_count,
-                'errors': errors,
+                'rejected': sum(rejects.values()),
+                'rejects': rejects,
+                'duplicates': duplicates,
+                'fk_resolution': executor.fk_stats,
+                'field_errors': dict(executor.field_errors),
+                'profile': profile,
             }
-            
+        
         except Exception as e:
             error_msg = f"Migration failed: {e}"
             self.logger.error(error_msg)
-            self.state.mark_table_failed(dest_table, error_msg)
+            if not replay and not self.profile:
+                self.state.mark_table_failed(dest_table, error_msg)
             return {
                 'status': 'failed',
                 'error': error_msg,
                 'records_migrated': migrated_count,
             }
     
-    def _add_default_values(self, dest_table: str, transformed: Dict[str, Any], source_record: Dict[str, Any]):
-        """Add default values for required fields that don't exist in source"""
-        from datetime import datetime
-        from mappers import get_required_dest_columns
+    def _profile_table(
+        self,
+        dest_table: str,
+        profiler: LoadProfiler,
+        executor: TransformExecutor,
+        elapsed: float
+    ) -> Dict[str, Any]:
+        """
+        Finish and report the profile of a table streamed through a profiling dry run
+        
+        The load time is projected from the rate recorded by the table's last
+        migration if there is one, else from the measured transform time plus
+        INSERTs at migration.profile_insert_rate rows per second.
+        """
+        profile = profiler.table_profile(
+            executor.fk_stats,
+            executor.field_errors,
+            elapsed,
+            insert_rate=self.config.get('migration', {}).get('profile_insert_rate', 5000),
+            recorded_rate=self.state.get_table_state(dest_table).get('load_rate')
+        )
+        self.profiles[dest_table] = profile
         
-        required_fields = get_required_dest_columns(dest_table)
+        for column, column_profile in sorted(profile['columns'].items()):
+            for line in format_column_profile(column, column_profile):
+                self.logger.warning(line)
+        for reason, count in sorted(profile['row_errors'].items(), key=lambda item: -item[1]):
+            self.logger.warning(f"{count:,} rows failed to transform: {reason}")
+        self.logger.info(
+            f"Profiled {profile['rows']:,} records in {profile['transform_seconds']:.1f}s, "
+            f"projected load time {profile['projected_load_seconds']:,.0f}s ({profile['projection_basis']})"
+        )
+        return profile
+    
+    @contextmanager
+    def _deferred_interrupt(self):
+        """Defer the first Ctrl+C until the in-flight batch is committed and checkpointed"""
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+        
+        def handle_sigint(signum, frame):
+            self.logger.warning("Interrupt received, finishing current batch before stopping (Ctrl+C again to abort)")
+            self._interrupted = True
+            # A second Ctrl+C interrupts immediately
+            signal.signal(signal.SIGINT, previous_handler)
+        
+        self._interrupted = False
+        previous_handler = signal.signal(signal.SIGINT, handle_sigint)
+        try:
+            yield
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+    
+    def _transform_workers(self, record_count: int) -> int:
+        """Number of transform worker processes to use for a table of this size"""
+        migration_config = self.config.get('migration', {})
+        workers = resolve_worker_count(migration_config.get('transform_workers', 0))
+        
+        # Small tables are not worth the process startup and pickling cost
+        if record_count < migration_config.get('parallel_min_records', 20000):
+            return 0
+        return workers
+    
+    def _get_fk_indexes(self, shared: bool = False) -> Dict[str, ForeignKeyIndex]:
+        """Get FK indexes for the current lookup maps, building them once per reference table"""
+        signature = tuple((name, id(m), len(m)) for name, m in self.lookup_maps.items())
+        if signature != self._fk_index_signature:
+            self._release_fk_indexes()
+            self._fk_index_signature = signature
+        
+        if shared not in self.fk_indexes:
+            max_distance = self.config.get('migration', {}).get('fk_fuzzy_max_distance', 2)
+            self.fk_indexes[shared] = build_fk_indexes(self.lookup_maps, max_distance, shared=shared)
+            if shared:
+                self.logger.info(
+                    f"Placed {len(set(map(id, self.fk_indexes[shared].values())))} lookup indexes in shared memory"
+                )
+        return self.fk_indexes[shared]
+    
+    def _release_fk_indexes(self):
+        """Release shared memory held by FK indexes"""
+        for indexes in self.fk_indexes.values():
+            release_fk_indexes(indexes)
+        self.fk_indexes = {}
+    
+    def _default_columns(
+        self,
+        dest_table: str,
+        table_schema: Dict[str, Any],
+        transformed_schema: RowSchema,
+        source_schema: RowSchema
+    ) -> List[Tuple[str, Callable[[tuple], Any]]]:
+        """Columns to append for required fields that don't exist in source, with a value function per column"""
+        required_fields = required_columns(table_schema)
         
         # Default values for specific tables/fields
         defaults = {
@@ -462,54 +982,264 @@ class MigrationRunner:
             },
         }
         
+        columns = []
+        
         # Apply defaults for this table
         if dest_table in defaults:
             for field, default_value in defaults[dest_table].items():
-                if field in required_fields and field not in transformed:
-                    transformed[field] = default_value
+                if field in required_fields and field not in transformed_schema:
+                    columns.append((field, lambda row, value=default_value: value))
         
         # Special handling for delivery_note - try to derive customer_id from Delivery_No
-        if dest_table == 'delivery_note' and 'customer_id' not in transformed:
+        if dest_table == 'delivery_note' and 'customer_id' not in transformed_schema:
             # Try to find customer from related production_information or pack_info
             # For now, set to None (nullable in schema)
             pass
         
         # Special handling for user_logs - set action based on Login_Time
-        if dest_table == 'user_logs' and 'action' not in transformed:
-            if source_record.get('Login_Time'):
-                transformed['action'] = 'login'
-            elif source_record.get('Logout_Time'):
-                transformed['action'] = 'logout'
-            else:
-                transformed['action'] = 'unknown'
+        if dest_table == 'user_logs' and 'action' not in transformed_schema \
+                and all(col != 'action' for col, _ in columns):
+            def user_log_action(row):
+                if source_schema.get(row, 'Login_Time'):
+                    return 'login'
+                if source_schema.get(row, 'Logout_Time'):
+                    return 'logout'
+                return 'unknown'
+            columns.append(('action', user_log_action))
+        
+        return columns
     
-    def _insert_record(self, table_name: str, record: Dict[str, Any]):
-        """Insert a single record into PostgreSQL"""
-        # Filter out None values for optional fields (let DB use defaults)
-        # But keep required fields even if None (will cause error if truly required)
-        filtered_record = {k: v for k, v in record.items() if v is not None or k in ['id', 'created_at', 'updated_at']}
+    def _duplicate_filter(
+        self,
+        dest_table: str,
+        dest_schema: Dict[str, Any],
+        executor: TransformExecutor,
+        source_table: SpooledTable,
+        start_ordinal: int
+    ) -> Optional[DuplicateFilter]:
+        """
+        Duplicate filter on the table's natural key, or None if it has none
+        
+        The natural key is the table's first unique key on transformed columns.
+        The source is pre-scanned when the policy needs it, and rows before a
+        resume point are replayed so duplicates of them are still caught. The
+        key set isn't saved with checkpoints, so this replay reads those rows
+        back from the source table.
+        """
+        key = natural_key(dest_schema, executor.dest_schema.columns)
+        if key is None:
+            return None
+        
+        migration_config = self.config.get('migration', {})
+        dedupe = DuplicateFilter(
+            key,
+            [executor.dest_schema.index(col) for col in key],
+            compile_key_function(executor.plan, key),
+            lambda row: transform_row(row, executor.plan),
+            policy=migration_config.get('duplicate_policy', 'first'),
+            expected_rows=len(source_table),
+            exact_max_rows=migration_config.get('dedupe_exact_max_rows', 2000000),
+            error_rate=migration_config.get('dedupe_bloom_error_rate', 0.001)
+        )
+        if dedupe.needs_prescan:
+            self.logger.info(
+                f"Scanning {dest_table} for duplicate ({', '.join(key)}) values "
+                f"({'Bloom filter' if dedupe.use_bloom else 'exact set'})..."
+            )
+            dedupe.prescan(source_table)
+        if start_ordinal:
+            dedupe.resume(islice(source_table.iter_rows(), start_ordinal))
+        
+        # Lookups made by the scans aren't part of the load's statistics
+        collect_plan_stats(executor.plan)
+        collect_field_errors(executor.plan)
+        return dedupe
+    
+    def _reject(
+        self,
+        access_table: str,
+        dest_table: str,
+        source_schema: RowSchema,
+        row: tuple,
+        ordinal: int,
+        stage: str,
+        reason: str,
+        field: Optional[str] = None,
+        detail: Optional[str] = None
+    ):
+        """
+        Write a rejected record to the dead-letter file, raising in strict mode
         
-        if not filtered_record:
+        A profile only counts rejects: nothing is written and strict mode
+        doesn't stop it.
+        """
+        if self.profile:
             return
+        self.dead_letters.write(
+            access_table, dest_table, source_schema.as_dict(row), ordinal,
+            stage, reason, field=field, detail=detail
+        )
+        if self.config.get('validation', {}).get('strict_mode'):
+            column = f" ({field})" if field else ""
+            raise RuntimeError(f"Record {ordinal} of {access_table} rejected{column}: {detail or reason}")
+    
+    @staticmethod
+    def _describe_insert_error(error: Exception) -> Tuple[Optional[str], str]:
+        """
+        Failing column and a short, groupable reason for an insert error
+        
+        Database errors are described by their SQLSTATE name (e.g. "unique
+        violation"), so rejects with different values count as one reason.
+        """
+        diag = getattr(error, 'diag', None)
+        field = getattr(diag, 'column_name', None)
+        pgcode = getattr(error, 'pgcode', None)
+        if pgcode:
+            try:
+                return field, psycopg2.errorcodes.lookup(pgcode).lower().replace('_', ' ')
+            except KeyError:
+                pass
+        lines = str(error).strip().splitlines()
+        return field, lines[0] if lines else type(error).__name__
+    
+    def _commit_hook(
+        self,
+        dest_table: str,
+        migrated_before: int,
+        load_ordinals: List[int],
+        batch_end: int,
+        load_rows: List[tuple],
+        id_position: Optional[int],
+        key_names: List[str],
+        load_keys: List[tuple],
+        checkpoint: bool = True,
+        checksum: Optional[RowChecksum] = None,
+        load_hashes: Optional[List[int]] = None,
+        checksum_columns: Optional[List[str]] = None,
+        source_checksum: Optional[RowChecksum] = None,
+        source_hashes: Optional[List[int]] = None
+    ) -> Optional[Callable[[Any, int, int, int, Optional[List[Any]]], None]]:
+        """
+        Build the callback run in the loader's transaction before each commit
+        
+        The callback takes the loader cursor, the range of load rows written
+        in the transaction, the number of rows loaded so far in the batch and
+        the ids the insert returned. It records the inserted rows' legacy keys
+        in the id crosswalk (and in captured_keys, for the lookup maps) and,
+        with a transactional state store (unless checkpoint is False), writes
+        the checkpoint so both commit atomically with the rows. The checkpoint
+        includes the loaded-row checksum (checksum, the table's checksum before
+        the batch, plus load_hashes of the rows inserted so far) and the
+        source checksum up to the checkpoint (source_checksum before the
+        batch, plus source_hashes of the batch's rows before it), so a resume
+        doesn't reread the rows before the checkpoint.
         
-        # Build INSERT query
-        columns = list(filtered_record.keys())
-        placeholders = ', '.join(['%s'] * len(columns))
-        column_names = ', '.join([f'"{col}"' for col in columns])
-        values = tuple(filtered_record.values())
+        Returns:
+            The callback, or None if there is nothing to write
+        """
+        checkpoint = checkpoint and self.state.transactional
+        if not key_names and not checkpoint:
+            return None
+        
+        # Hashes of the rows inserted so far in the batch, by first row
+        committed: Dict[Optional[int], List[int]] = {}
+        
+        def before_commit(cursor, first: int, last: int, loaded: int, inserted_ids: Optional[List[Any]]):
+            if key_names and inserted_ids is not None:
+                captured = self.captured_keys[dest_table]
+                if len(inserted_ids) < last - first:
+                    captured['complete'] = False
+                
+                # Rows skipped by ON CONFLICT return no id and keep their existing mapping
+                inserted = set(inserted_ids)
+                written = [
+                    (keys, load_rows[i][id_position])
+                    for i, keys in enumerate(load_keys[first:last], first)
+                    if load_rows[i][id_position] in inserted
+                ]
+                for k, key_name in enumerate(key_names):
+                    pairs = [(keys[k], new_id) for keys, new_id in written if keys[k] is not None]
+                    self.crosswalk.record(dest_table, key_name, pairs, cursor=cursor)
+                    captured['keys'][key_name].update(pairs)
+            
+            if checkpoint:
+                next_ordinal = load_ordinals[last] if last < len(load_ordinals) else batch_end
+                updates = {'records_migrated': migrated_before + loaded, 'last_id': next_ordinal}
+                if checksum is not None and load_hashes is not None and inserted_ids is not None:
+                    # The whole batch, or single rows once inserts fall back to row by row;
+                    # rows skipped by ON CONFLICT return no id and aren't counted
+                    if last - first < len(load_rows):
+                        committed.pop(None, None)
+                    inserted = set(inserted_ids)
+                    committed[first if last - first < len(load_rows) else None] = [
+                        load_hashes[i] for i in range(first, last) if load_rows[i][id_position] in inserted
+                    ]
+                    partial = RowChecksum(checksum.rows, checksum.hash_sum)
+                    for hashes in committed.values():
+                        partial.update(hashes)
+                    updates['loaded_checksum'] = dict(partial.as_dict(), columns=checksum_columns)
+                if source_checksum is not None:
+                    batch_start = batch_end - len(source_hashes)
+                    if next_ordinal >= batch_start:
+                        partial = RowChecksum(source_checksum.rows, source_checksum.hash_sum)
+                        partial.update(source_hashes[:next_ordinal - batch_start])
+                        updates['source_checksum'] = partial.as_dict()
+                    else:
+                        # Checkpoint at a fallback row of an earlier batch
+                        updates['source_checksum'] = None
+                self.state.checkpoint(dest_table, cursor=cursor, **updates)
+        return before_commit
+    
+    def _insert_rows(
+        self,
+        table_name: str,
+        columns: List[str],
+        rows: List[tuple],
+        before_commit: Optional[Callable[[Any, int, int, int, Optional[List[Any]]], None]] = None,
+        returning: Optional[str] = None,
+        inserted: Optional[List[Any]] = None
+    ) -> List[Tuple[int, Exception]]:
+        """
+        Insert a batch of positional rows into PostgreSQL
         
-        query = f'INSERT INTO "{table_name}" ({column_names}) VALUES ({placeholders})'
+        The batch is sent as one statement. If it fails, rows are retried one at
+        a time so a single bad record doesn't reject the whole batch. If a
+        before_commit callback is given (see _commit_hook) it is run in each
+        transaction before commit. With returning, the returned values of the
+        committed rows are appended to inserted.
         
+        Returns:
+            (row index, error) for each row that could not be inserted
+        """
+        keep_null = self.KEEP_NULL_COLUMNS
+        hook = None
+        if before_commit:
+            hook = lambda cursor, returned: before_commit(cursor, 0, len(rows), len(rows), returned)
         try:
-            self.postgres_db.execute_query(query, values)
-        except Exception as e:
-            # Check if it's a duplicate key error (unique constraint)
-            error_str = str(e).lower()
-            if 'duplicate key' in error_str or 'unique constraint' in error_str:
-                # Skip duplicate (idempotent)
-                return
-            # Re-raise other errors
-            raise
+            returned = self.postgres_db.insert_rows(
+                table_name, columns, rows, keep_null=keep_null, returning=returning, before_commit=hook
+            )
+            if inserted is not None and returned:
+                inserted.extend(returned)
+            return []
+        except Exception:
+            pass
+        
+        errors = []
+        for i, row in enumerate(rows):
+            hook = None
+            if before_commit:
+                loaded = i - len(errors) + 1
+                hook = lambda cursor, returned, i=i, loaded=loaded: before_commit(cursor, i, i + 1, loaded, returned)
+            try:
+                returned = self.postgres_db.insert_rows(
+                    table_name, columns, [row], keep_null=keep_null, returning=returning, before_commit=hook
+                )
+                if inserted is not None and returned:
+                    inserted.extend(returned)
+            except Exception as e:
+                errors.append((i, e))
+        return errors
     
     def run(self):
         """Run the migration"""
@@ -520,10 +1250,15 @@ class MigrationRunner:
             
             if self.dry_run:
                 self.logger.warning("DRY RUN MODE - No data will be inserted")
+            if self.profile:
+                self.logger.info("PROFILE MODE - Profiling every table's load problems per column")
             
-            if self.force:
+            if self.replay_file:
+                self.logger.info(f"REPLAY MODE - Loading rejected records from {self.replay_file}")
+            elif self.force:
+                # Each table's state is reset once it is claimed (see _migrate_table),
+                # so tables other processes are migrating keep theirs
                 self.logger.warning("FORCE MODE - Will re-migrate all tables")
-                self.state.reset_all()
             
             # Connect to databases
             self.connect_databases()
@@ -537,33 +1272,11 @@ class MigrationRunner:
             self.build_lookup_maps()
             
             # Start migration
-            self.state.start_migration()
+            if not self.profile:
+                self.state.start_migration()
             
             # Get tables to migrate (in dependency order)
-            tables_to_migrate = self.config.get('tables', [])
-            if not tables_to_migrate:
-                from mappers import TABLE_MAPPINGS
-                tables_to_migrate = list(TABLE_MAPPINGS.keys())
-            else:
-                # Convert config table names (lowercase) to Access table names (from TABLE_MAPPINGS)
-                from mappers import TABLE_MAPPINGS
-                # Reverse lookup: dest_table -> access_table
-                reverse_mapping = {v: k for k, v in TABLE_MAPPINGS.items()}
-                access_tables_to_migrate = []
-                for table_name in tables_to_migrate:
-                    # Try to find Access table name
-                    access_table = reverse_mapping.get(table_name.lower())
-                    if access_table:
-                        access_tables_to_migrate.append(access_table)
-                    else:
-                        # Try direct match (case-insensitive)
-                        for acc_tbl, dest_tbl in TABLE_MAPPINGS.items():
-                            if dest_tbl.lower() == table_name.lower():
-                                access_tables_to_migrate.append(acc_tbl)
-                                break
-                        else:
-                            self.logger.warning(f"Table '{table_name}' not found in mappings, skipping")
-                tables_to_migrate = access_tables_to_migrate
+            tables_to_migrate = self._tables_to_migrate()
             
             # Migration order (dependencies first)
             migration_order = [
@@ -583,32 +1296,77 @@ class MigrationRunner:
                 return False
             
             # Migrate each table
-            results = {}
-            for access_table in migration_order:
-                dest_table = get_table_mapping(access_table)
-                result = self.migrate_table(
-                    access_table,
-                    dest_table,
-                    batch_size=self.config.get('migration', {}).get('batch_size', 1000)
-                )
-                results[dest_table] = result
+            batch_size = self.config.get('migration', {}).get('batch_size', 1000)
+            if self.replay_file:
+                results = self._replay_rejects(migration_order, batch_size)
+            else:
+                results = {}
+                for access_table in migration_order:
+                    dest_table = get_table_mapping(access_table)
+                    result = self.migrate_table(access_table, dest_table, batch_size=batch_size)
+                    results[dest_table] = result
             
             # Print summary
             self._print_summary(results)
             
-            return True
+            if self.profile and self.profiles:
+                profile_file = save_profile(
+                    self.profiles,
+                    Path(self.config.get('migration', {}).get('profile_file', 'reports/dry-run-profile.json'))
+                )
+                projected = sum(profile['projected_load_seconds'] for profile in self.profiles.values())
+                self.logger.info(f"Projected load time: {projected / 60:,.1f} minutes")
+                self.logger.info(f"Load profile saved to: {profile_file}")
             
+            return True
+        
+        except KeyboardInterrupt:
+            self.logger.warning("Migration interrupted. Progress is checkpointed; run again to resume.")
+            return False
         except Exception as e:
             self.logger.error(f"Migration failed: {e}")
             import traceback
             self.logger.error(traceback.format_exc())
             return False
         finally:
+            self._release_fk_indexes()
+            self.dead_letters.close()
+            self.state.close()
             if self.access_db:
                 self.access_db.close()
             if self.postgres_db:
                 self.postgres_db.close()
     
+    def _replay_rejects(self, migration_order: List[str], batch_size: int) -> Dict[str, Any]:
+        """
+        Load the records of a dead-letter file through the pipeline again
+        
+        Tables are replayed in migration order, so rejected reference rows are
+        loaded (and added to the lookup maps) before the rows that refer to
+        them. Records rejected again go to this run's dead-letter file.
+        """
+        rejected_tables = load_rejected_tables(self.replay_file)
+        for access_table, (_, rows, _) in rejected_tables.items():
+            if access_table not in migration_order:
+                self.logger.warning(f"Skipping {len(rows):,} rejected {access_table} records (table not selected)")
+        
+        results = {}
+        for access_table in migration_order:
+            if access_table not in rejected_tables:
+                continue
+            dest_table = get_table_mapping(access_table)
+            schema, rows, ordinals = rejected_tables[access_table]
+            results[dest_table] = self.migrate_table(
+                access_table, dest_table, batch_size=batch_size,
+                replay_table=SpooledTable(schema, rows), replay_ordinals=ordinals
+            )
+            
+            # Replayed reference rows are in the crosswalk now; reload the lookup map
+            self.captured_keys.pop(dest_table, None)
+            if access_table in LOOKUP_KEYS and results[dest_table].get('status') == 'completed':
+                self._build_lookup_map_from_db(access_table, dest_table)
+        return results
+    
     def _print_summary(self, results: Dict[str, Any]):
         """Print migration summary"""
         self.logger.info("\n" + "=" * 60)
@@ -626,8 +1384,25 @@ class MigrationRunner:
         self.logger.info(f"  Skipped: {skipped}")
         self.logger.info(f"Total records migrated: {total_migrated:,}")
         
+        duplicate_rows = sum((r.get('duplicates') or {}).get('duplicate_rows', 0) for r in results.values())
+        if duplicate_rows:
+            self.logger.info(f"Duplicate rows resolved: {duplicate_rows:,}")
+        
+        if self.dead_letters.total:
+            self.logger.warning(f"Records rejected: {self.dead_letters.total:,}")
+            for (dest_table, reason), count in self.dead_letters.counts.most_common():
+                self.logger.warning(f"  {dest_table}: {reason}: {count:,}")
+            self.logger.info(f"Rejected records written to: {self.dead_letters.path}")
+        
+        if self.access_db:
+            cache = self.access_db.cache.summary()
+            self.logger.info(
+                f"Source table cache: {cache['hits']} hits, {cache['misses']} misses, "
+                f"{cache['spilled']} of {cache['tables']} tables spilled to disk"
+            )
+        
         state_summary = self.state.get_summary()
-        self.logger.info(f"\nMigration state saved to: migration-state.json")
+        self.logger.info(f"\nMigration state saved to: {self.state.location}")
         
         if self.dry_run:
             self.logger.warning("\nThis was a DRY RUN - no data was actually migrated")
@@ -647,11 +1422,22 @@ def main():
         action='store_true',
         help='Validate and show what would be migrated without inserting data'
     )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Dry run that profiles every table (FK hit rates, parse failures, truncations, projected load time)'
+    )
     parser.add_argument(
         '--force',
         action='store_true',
         help='Force re-migration of all tables (clears state)'
     )
+    parser.add_argument(
+        '--replay-rejects',
+        type=str,
+        metavar='PATH',
+        help='Load the records of a rejects file (e.g. after fixing mappings) instead of the source tables'
+    )
     
     args = parser.parse_args()
     
@@ -665,19 +1451,33 @@ def main():
         config = yaml.safe_load(f)
     
     # Override config with CLI args
-    if args.dry_run:
+    if args.dry_run or args.profile:
         config['migration']['dry_run'] = True
     
     if args.force:
         config['migration']['force'] = True
     
+    if args.profile and (config['migration'].get('force', False) or args.replay_rejects):
+        print("Error: --profile can't be combined with --force or --replay-rejects")
+        sys.exit(1)
+    
     # Run migration
     runner = MigrationRunner(
         config,
         dry_run=config['migration'].get('dry_run', False),
-        force=config['migration'].get('force', False)
+        force=config['migration'].get('force', False),
+        profile=args.profile
     )
     
+    if args.replay_rejects:
+        if runner.force:
+            print("Error: --replay-rejects can't be combined with --force")
+            sys.exit(1)
+        runner.replay_file = Path(args.replay_rejects)
+        if not runner.replay_file.exists():
+            print(f"Error: Rejects file not found: {runner.replay_file}")
+            sys.exit(1)
+    
     success = runner.run()
     sys.exit(0 if success else 1)
 
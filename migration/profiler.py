@@ -0,0 +1,208 @@
+"""
+Full-pass load profile of the source tables, collected during a dry run
+"""
+import json
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from constraints import ConstraintChecker
+from fk_index import ForeignKeyResolver
+from transformers import RowPlan
+
+# Constraint violation reasons, by the profile counter they are reported under
+VIOLATION_KINDS = {
+    "null value in required column": 'null_required',
+    "value too long for length": 'truncations',
+    "numeric value out of range": 'out_of_range',
+    "integer value out of range": 'out_of_range',
+}
+
+# Longest unparsed value kept in a profile, in characters
+MAX_VALUE_TEXT = 80
+
+
+def _value_text(value: Any) -> str:
+    text = str(value)
+    return text if len(text) <= MAX_VALUE_TEXT else text[:MAX_VALUE_TEXT] + '...'
+
+
+class LoadProfiler:
+    """
+    Per-column load problems of one table, collected as its rows stream through the transforms
+    
+    For each destination column it counts:
+    - parse failures: non-blank source values a transform raised on or
+      turned into NULL, with a histogram of the failing values
+    - truncations: values longer than the column (which the server would
+      reject), with the longest length seen
+    - NULL-to-required violations and numeric/integer range violations
+    Foreign key hit/miss rates come from the resolvers' statistics (see
+    format_fk_stats) and are merged in by table_profile.
+    """
+    
+    def __init__(self, plan: RowPlan, checker: ConstraintChecker, top: int = 5):
+        self.checker = checker
+        self.top = top
+        # (source position, destination position) of the steps that parse
+        # values, the last step per column (whose value is loaded); foreign
+        # keys are profiled by their resolvers, and plain text can't fail
+        last_steps = {dest_index: (source_index, step) for source_index, dest_index, step in plan.steps}
+        self.parse_steps = [
+            (source_index, dest_index)
+            for dest_index, (source_index, step) in last_steps.items()
+            if source_index is not None and step is not None and not isinstance(step, ForeignKeyResolver)
+        ]
+        self.dest_columns = plan.dest_schema.columns
+        self.lengths = {name: size for _, name, size in checker.lengths}
+        
+        self.rows = 0
+        self.row_errors: Counter = Counter()
+        self.unparsed: Dict[str, Counter] = {}
+        self.violations: Dict[str, Counter] = {}
+        self.max_lengths: Dict[str, int] = {}
+    
+    def observe_transform(self, row: Sequence[Any], transformed: Optional[tuple], error: Optional[str]):
+        """Record a source row and the result of transforming it"""
+        self.rows += 1
+        if error:
+            self.row_errors[error.split('\n')[0]] += 1
+            return
+        for source_index, dest_index in self.parse_steps:
+            value = row[source_index]
+            if transformed[dest_index] is None and value is not None and \
+                    not (isinstance(value, str) and not value.strip()):
+                column = self.dest_columns[dest_index]
+                self.unparsed.setdefault(column, Counter())[_value_text(value)] += 1
+    
+    def check(self, load_row: Sequence[Any]) -> Optional[Tuple[str, str]]:
+        """
+        Check a load row like ConstraintChecker.check, recording every violation
+        
+        Returns:
+            (column, reason) for the first violation, or None if the row is valid
+        """
+        first = None
+        for column, reason in self.checker.violations(load_row):
+            first = first or (column, reason)
+            kind = next((kind for prefix, kind in VIOLATION_KINDS.items() if reason.startswith(prefix)), None)
+            if kind is None:
+                # Foreign keys are profiled by their resolvers
+                continue
+            self.violations.setdefault(column, Counter())[kind] += 1
+            if kind == 'truncations':
+                length = len(str(load_row[self.checker.columns.index(column)]))
+                self.max_lengths[column] = max(self.max_lengths.get(column, 0), length)
+        return first
+    
+    def table_profile(
+        self,
+        fk_stats: Dict[str, Dict[str, Any]],
+        field_errors: Counter,
+        transform_seconds: float,
+        insert_rate: Optional[float],
+        recorded_rate: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Profile of the table
+        
+        Args:
+            fk_stats: Foreign key resolution statistics per column (TransformExecutor.fk_stats)
+            field_errors: Values that raised in a transform, per column (TransformExecutor.field_errors)
+            transform_seconds: Time the dry run took to stream the table through the transforms
+            insert_rate: Rows per second assumed for the INSERTs
+            recorded_rate: Rows per second of the table's last migration, if known; it
+                covers transforms and INSERTs and is used instead of the estimate
+        
+        Returns:
+            Row counts, projected load time and per-column problems
+        """
+        columns: Dict[str, Dict[str, Any]] = {}
+        
+        for column, stats in fk_stats.items():
+            counts = stats['counts']
+            hits = counts.get('exact', 0) + counts.get('canonical', 0) + counts.get('fuzzy', 0)
+            misses = counts.get('miss', 0) + counts.get('no_map', 0)
+            columns.setdefault(column, {})['foreign_key'] = {
+                'resolved': hits,
+                'unresolved': misses,
+                'null': counts.get('null', 0),
+                'hit_rate': hits / (hits + misses) if hits + misses else None,
+                'by_method': {method: counts.get(method, 0) for method in ('exact', 'canonical', 'fuzzy')},
+                'top_missing': Counter(stats['missing']).most_common(self.top),
+            }
+        
+        for column in set(self.unparsed) | set(field_errors):
+            unparsed = self.unparsed.get(column, Counter())
+            columns.setdefault(column, {})['parse_failures'] = {
+                'count': sum(unparsed.values()) + field_errors.get(column, 0),
+                'distinct': len(unparsed),
+                'top_values': unparsed.most_common(self.top),
+            }
+        
+        for column, counts in self.violations.items():
+            profile = columns.setdefault(column, {})
+            profile.update(counts)
+            if column in self.max_lengths:
+                profile['max_length'] = self.max_lengths[column]
+                profile['length_limit'] = self.lengths[column]
+        
+        if recorded_rate:
+            projected = self.rows / recorded_rate
+            basis = 'recorded'
+        else:
+            projected = transform_seconds + (self.rows / insert_rate if insert_rate else 0)
+            basis = 'estimated'
+        
+        return {
+            'rows': self.rows,
+            'row_errors': dict(self.row_errors),
+            'transform_seconds': round(transform_seconds, 3),
+            'transform_rate': round(self.rows / transform_seconds) if transform_seconds else None,
+            'projected_load_seconds': round(projected, 1),
+            'projection_basis': basis,
+            'columns': columns,
+        }
+
+
+def format_column_profile(column: str, profile: Dict[str, Any]) -> List[str]:
+    """Report lines for the problems of one column"""
+    lines = []
+    fk = profile.get('foreign_key')
+    if fk and fk['unresolved']:
+        line = f"{column}: {fk['unresolved']:,} unresolved foreign keys ({fk['hit_rate']:.1%} hit rate)"
+        if fk['top_missing']:
+            line += ", top missing: " + ", ".join(f"'{value}' x{count}" for value, count in fk['top_missing'])
+        lines.append(line)
+    parse = profile.get('parse_failures')
+    if parse:
+        line = f"{column}: {parse['count']:,} values failed to parse"
+        if parse['top_values']:
+            line += ", top: " + ", ".join(f"'{value}' x{count}" for value, count in parse['top_values'])
+        lines.append(line)
+    if profile.get('truncations'):
+        lines.append(
+            f"{column}: {profile['truncations']:,} values longer than {profile['length_limit']} "
+            f"(longest {profile['max_length']})"
+        )
+    if profile.get('null_required'):
+        lines.append(f"{column}: {profile['null_required']:,} NULLs in required column")
+    if profile.get('out_of_range'):
+        lines.append(f"{column}: {profile['out_of_range']:,} numbers out of range")
+    return lines
+
+
+def save_profile(profiles: Dict[str, Dict[str, Any]], output_file: Path) -> Path:
+    """Write the profiles of all tables, with totals, as JSON"""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        'profiled_at': datetime.now().isoformat(),
+        'total_rows': sum(profile['rows'] for profile in profiles.values()),
+        'projected_load_seconds': round(sum(profile['projected_load_seconds'] for profile in profiles.values()), 1),
+        'tables': profiles,
+    }
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    return output_file
@@ -0,0 +1,383 @@
+"""
+Hash-bucketed reconciliation of source and destination table contents
+"""
+import hashlib
+from array import array
+from datetime import date, datetime, time
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Any, Callable, List, Optional, Sequence, Set, Tuple
+
+from catalog import CatalogSnapshot
+from dedupe import natural_key
+from mappers import get_transformations
+from transform_pool import compile_row_plan
+from transformers import collect_field_errors, lookup_foreign_key, transform_row
+from utils.db_connection import AccessConnection, PostgresConnection, quote_ident
+
+# Separates values in a row's text form, and stands in for NULL
+FIELD_SEPARATOR = '\x1f'
+NULL_MARKER = '\x1e'
+
+# Row and key hashes are the first 15 hex digits of an md5 digest (60 bits),
+# so they fit a bigint and bucket arithmetic stays exact on both sides
+HASH_HEX_DIGITS = 15
+
+# Generated by the migration, never compared
+GENERATED_COLUMNS = ('id', 'created_at', 'updated_at')
+# Types whose text form differs between Python and PostgreSQL
+SKIPPED_TYPES = ('json', 'jsonb', 'bytea', 'ARRAY')
+
+NUMERIC_TYPES = ('numeric', 'integer', 'bigint', 'smallint', 'real', 'double precision')
+TIMESTAMP_TYPES = ('timestamp without time zone', 'timestamp with time zone')
+
+
+def hash_text(text: str) -> int:
+    """60-bit hash of a text, as computed by hash_sql in PostgreSQL"""
+    return int(hashlib.md5(text.encode('utf-8')).hexdigest()[:HASH_HEX_DIGITS], 16)
+
+
+def hash_sql(expression: str) -> str:
+    """SQL computing hash_text of a text expression as a bigint"""
+    return f"('x' || substr(md5({expression}), 1, {HASH_HEX_DIGITS}))::bit({HASH_HEX_DIGITS * 4})::bigint"
+
+
+def compared_columns(
+    dest_table: str,
+    dest_schema: Dict[str, Any],
+    transformed: Sequence[str],
+    keep_null: Sequence[str] = ()
+) -> List[Dict[str, Any]]:
+    """
+    Destination columns whose values can be compared with transformed source rows
+    
+    Generated columns, foreign keys (whose ids differ by design) and types
+    without a comparable text form are left out, and so are columns with a
+    server default: None is loaded into those as DEFAULT (see
+    PostgresConnection.insert_rows), so a source NULL never matches the
+    stored value. Columns in keep_null are loaded as NULL and are kept.
+    
+    Returns:
+        Catalog entries of the columns, in transformed order
+    """
+    catalog = {col['name']: col for col in dest_schema['columns']}
+    transformations = get_transformations(dest_table)
+    foreign_keys = dest_schema.get('foreign_keys', {})
+    return [
+        catalog[name] for name in transformed
+        if name in catalog
+        and name not in GENERATED_COLUMNS
+        and name not in foreign_keys
+        and transformations.get(name) is not lookup_foreign_key
+        and catalog[name]['type'] not in SKIPPED_TYPES
+        and (catalog[name]['default'] is None or name in keep_null)
+    ]
+
+
+def text_normalizer(column: Dict[str, Any]) -> Callable[[Any], str]:
+    """Python function giving a value the text form value_sql gives it in PostgreSQL"""
+    col_type = column['type']
+    if col_type == 'boolean':
+        return lambda value: 't' if value else 'f'
+    if col_type in NUMERIC_TYPES:
+        scale = column.get('scale') if col_type == 'numeric' else None
+        quantum = Decimal(1).scaleb(-scale) if scale is not None else None
+        
+        def numeric_text(value):
+            number = value if isinstance(value, Decimal) else Decimal(str(value))
+            if quantum is not None:
+                # The column rounds to its scale on insert
+                number = number.quantize(quantum, rounding=ROUND_HALF_UP)
+            if number == 0:
+                return '0'
+            return format(number.normalize(), 'f')
+        return numeric_text
+    if col_type == 'date':
+        return lambda value: (value.date() if isinstance(value, datetime) else value).isoformat()
+    if col_type in TIMESTAMP_TYPES:
+        def timestamp_text(value):
+            if not isinstance(value, datetime) and isinstance(value, date):
+                value = datetime.combine(value, time())
+            return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+        return timestamp_text
+    if col_type == 'character':
+        return lambda value: str(value).rstrip()
+    return str
+
+
+def value_sql(column: Dict[str, Any], null_text: Optional[str] = None) -> str:
+    """SQL giving a column's value the text form text_normalizer gives it in Python"""
+    name = quote_ident(column['name'])
+    col_type = column['type']
+    if col_type == 'boolean':
+        expression = f"CASE WHEN {name} THEN 't' ELSE 'f' END"
+    elif col_type in NUMERIC_TYPES:
+        expression = f"trim_scale({name}::numeric)::text"
+    elif col_type == 'date':
+        expression = f"to_char({name}, 'YYYY-MM-DD')"
+    elif col_type in TIMESTAMP_TYPES:
+        expression = f"to_char({name}::timestamp, 'YYYY-MM-DD HH24:MI:SS.US')"
+    elif col_type == 'character':
+        expression = f"rtrim({name})"
+    else:
+        expression = f"{name}::text"
+    if null_text is not None:
+        return f"coalesce({expression}, '{null_text}')"
+    return f"coalesce({expression}, chr({ord(NULL_MARKER)}))"
+
+
+class TableReconciler:
+    """
+    Finds the rows that differ between a source table and its destination table
+    
+    Source rows are transformed as the migration would transform them and
+    compared with the destination on the mapped, non-generated columns
+    (foreign keys, whose ids differ by design, are checked separately).
+    Each row gets a key hash (of its natural key, or of the whole row if the
+    table has none) and a row hash. Rows are grouped into buckets by key
+    hash, and each bucket is summarized by its row count and the sum of its
+    row hashes, which doesn't depend on row order. The source side is
+    hashed in one streaming pass; the destination side is aggregated in SQL.
+    Only buckets whose summaries differ are split further, level by level,
+    until they are small enough to compare row by row.
+    """
+    
+    def __init__(
+        self,
+        access_db: AccessConnection,
+        postgres_db: PostgresConnection,
+        access_table: str,
+        dest_table: str,
+        buckets: int = 256,
+        leaf_rows: int = 64,
+        sample_size: int = 10,
+        max_depth: int = 6,
+        catalog: Optional[CatalogSnapshot] = None
+    ):
+        self.access_db = access_db
+        self.postgres_db = postgres_db
+        self.access_table = access_table
+        self.dest_table = dest_table
+        self.buckets = buckets
+        self.leaf_rows = leaf_rows
+        self.sample_size = sample_size
+        self.max_depth = max_depth
+        self.catalog = catalog
+        self.queries = 0
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Reconcile the table
+        
+        Returns:
+            Row counts, counts of rows missing from / unexpected in / changed in
+            the destination with sample keys, and the number of queries run
+        """
+        source_table = self.access_db.fetch_table(self.access_table)
+        plan = compile_row_plan(self.access_table, self.dest_table, source_table.schema, {})
+        dest_schema = (
+            self.catalog.dest_schema(self.dest_table) if self.catalog is not None
+            else self.postgres_db.get_table_schema(self.dest_table)
+        )
+        columns = compared_columns(self.dest_table, dest_schema, plan.dest_schema.columns)
+        if not columns:
+            return {'skipped': 'no comparable columns'}
+        
+        key = natural_key(dest_schema, [col['name'] for col in columns])
+        key_columns = [col for col in columns if key and col['name'] in key]
+        if key:
+            key_columns.sort(key=lambda col: key.index(col['name']))
+        
+        source = self._hash_source(source_table, plan, columns, key_columns)
+        key_sql, row_sql = self._hash_expressions(columns, key_columns)
+        
+        # Descend through mismatching buckets, level by level
+        leaves: List[Tuple[int, Set[int]]] = []
+        modulus, prefixes = 1, None
+        for depth in range(1, self.max_depth + 1):
+            parent, modulus = modulus, modulus * self.buckets
+            source_buckets = self._source_buckets(source, parent, prefixes, modulus)
+            dest_buckets = self._dest_buckets(key_sql, row_sql, parent, prefixes, modulus)
+            mismatched = {
+                bucket for bucket in set(source_buckets) | set(dest_buckets)
+                if source_buckets.get(bucket) != dest_buckets.get(bucket)
+            }
+            small = {
+                bucket for bucket in mismatched
+                if max(source_buckets.get(bucket, (0, 0))[0], dest_buckets.get(bucket, (0, 0))[0]) <= self.leaf_rows
+            }
+            if small:
+                leaves.append((modulus, small))
+            prefixes = mismatched - small
+            if not prefixes:
+                break
+        else:
+            leaves.append((modulus, prefixes))
+        
+        result = {
+            'source_rows': len(source['keys']),
+            'dest_rows': None,
+            'key': list(key) if key else None,
+            'columns': [col['name'] for col in columns],
+            'untransformable': source['errors'],
+            'missing': 0,
+            'unexpected': 0,
+            'changed': 0,
+            'samples': {'missing': [], 'unexpected': [], 'changed': []},
+        }
+        
+        missing_ordinals: List[int] = []
+        for leaf_modulus, leaf_buckets in leaves:
+            self._compare_leaves(source, key_sql, row_sql, key_columns or columns, leaf_modulus, leaf_buckets,
+                                 result, missing_ordinals)
+        
+        # Keys of the source rows to show as samples
+        if missing_ordinals:
+            key_text = self._source_key_text(source_table, plan, key_columns or columns, missing_ordinals)
+            result['samples']['missing'] = [key_text[i] for i in missing_ordinals if i in key_text]
+        
+        result['dest_rows'] = self.postgres_db.get_record_count(self.dest_table)
+        result['match'] = not (result['missing'] or result['unexpected'] or result['changed'])
+        result['queries'] = self.queries
+        return result
+    
+    def _hash_source(self, source_table, plan, columns, key_columns) -> Dict[str, Any]:
+        """
+        Key and row hash of every source row, in one pass
+        
+        Rows with fields that fail to transform are hashed with those fields
+        NULL, as they are loaded, and counted in errors.
+        """
+        positions = [plan.dest_schema.index(col['name']) for col in columns]
+        key_positions = [plan.dest_schema.index(col['name']) for col in key_columns]
+        normalizers = [text_normalizer(col) for col in columns]
+        key_normalizers = [text_normalizer(col) for col in key_columns]
+        
+        keys = array('q')
+        rows = array('q')
+        ordinals = array('q')
+        errors = 0
+        for ordinal, row in enumerate(source_table):
+            transformed = transform_row(row, plan)
+            if collect_field_errors(plan):
+                errors += 1
+            row_text = self._row_text(transformed, positions, normalizers)
+            if key_columns:
+                key_text = self._row_text(transformed, key_positions, key_normalizers)
+                keys.append(hash_text(key_text))
+            else:
+                keys.append(hash_text(row_text))
+            rows.append(hash_text(row_text))
+            ordinals.append(ordinal)
+        return {'keys': keys, 'rows': rows, 'ordinals': ordinals, 'errors': errors}
+    
+    @staticmethod
+    def _row_text(row: tuple, positions: List[int], normalizers: List[Callable[[Any], str]]) -> str:
+        return FIELD_SEPARATOR.join(
+            NULL_MARKER if row[p] is None else normalize(row[p])
+            for p, normalize in zip(positions, normalizers)
+        )
+    
+    @staticmethod
+    def _hash_expressions(columns, key_columns) -> Tuple[str, str]:
+        separator = f"chr({ord(FIELD_SEPARATOR)})"
+        row_text = f"concat_ws({separator}, {', '.join(value_sql(col) for col in columns)})"
+        key_text = row_text
+        if key_columns:
+            key_text = f"concat_ws({separator}, {', '.join(value_sql(col) for col in key_columns)})"
+        return hash_sql(key_text), hash_sql(row_text)
+    
+    @staticmethod
+    def _in_prefixes(key_hash: int, parent: int, prefixes: Optional[Set[int]]) -> bool:
+        return prefixes is None or key_hash % parent in prefixes
+    
+    def _source_buckets(self, source, parent, prefixes, modulus) -> Dict[int, Tuple[int, int]]:
+        buckets: Dict[int, List[int]] = {}
+        for key_hash, row_hash in zip(source['keys'], source['rows']):
+            if not self._in_prefixes(key_hash, parent, prefixes):
+                continue
+            bucket = buckets.setdefault(key_hash % modulus, [0, 0])
+            bucket[0] += 1
+            bucket[1] += row_hash
+        return {bucket: tuple(summary) for bucket, summary in buckets.items()}
+    
+    def _dest_where(self, parent: int, prefixes: Optional[Set[int]]) -> Tuple[str, tuple]:
+        if prefixes is None:
+            return "", ()
+        return "WHERE kh %% %s = ANY(%s)", (parent, sorted(prefixes))
+    
+    def _dest_buckets(self, key_sql, row_sql, parent, prefixes, modulus) -> Dict[int, Tuple[int, int]]:
+        where, params = self._dest_where(parent, prefixes)
+        rows = self.postgres_db.fetch_all(f"""
+            SELECT kh %% %s AS bucket, COUNT(*) AS rows, SUM(rh) AS hash_sum
+            FROM (SELECT {key_sql} AS kh, {row_sql} AS rh FROM {quote_ident(self.dest_table)}) h
+            {where}
+            GROUP BY 1
+        """, (modulus,) + params)
+        self.queries += 1
+        return {row['bucket']: (row['rows'], int(row['hash_sum'])) for row in rows}
+    
+    def _compare_leaves(self, source, key_sql, row_sql, display_columns, modulus, buckets, result, missing_ordinals):
+        """Compare the rows of small mismatching buckets one by one"""
+        source_rows: Dict[int, List[Tuple[int, int]]] = {}
+        for key_hash, row_hash, ordinal in zip(source['keys'], source['rows'], source['ordinals']):
+            if key_hash % modulus in buckets:
+                source_rows.setdefault(key_hash, []).append((row_hash, ordinal))
+        
+        display = f"concat_ws(', ', {', '.join(value_sql(col, 'NULL') for col in display_columns)})"
+        dest_records = self.postgres_db.fetch_all(f"""
+            SELECT kh, rh, display FROM (
+                SELECT {key_sql} AS kh, {row_sql} AS rh, {display} AS display
+                FROM {quote_ident(self.dest_table)}
+            ) h
+            WHERE kh %% %s = ANY(%s)
+        """, (modulus, sorted(buckets)))
+        self.queries += 1
+        dest_rows: Dict[int, List[Tuple[int, str]]] = {}
+        for record in dest_records:
+            dest_rows.setdefault(record['kh'], []).append((record['rh'], record['display']))
+        
+        samples = result['samples']
+        for key_hash in set(source_rows) | set(dest_rows):
+            src = source_rows.get(key_hash, [])
+            dst = dest_rows.get(key_hash, [])
+            # Rows identical on both sides cancel out
+            unmatched_dst = list(dst)
+            unmatched_src = []
+            for row_hash, ordinal in src:
+                match = next((i for i, (h, _) in enumerate(unmatched_dst) if h == row_hash), None)
+                if match is None:
+                    unmatched_src.append(ordinal)
+                else:
+                    unmatched_dst.pop(match)
+            # Same key on both sides with different values
+            changed = min(len(unmatched_src), len(unmatched_dst))
+            if changed:
+                result['changed'] += changed
+                for _, display in unmatched_dst[:changed]:
+                    if len(samples['changed']) < self.sample_size:
+                        samples['changed'].append(display)
+            for ordinal in unmatched_src[changed:]:
+                result['missing'] += 1
+                if len(missing_ordinals) < self.sample_size:
+                    missing_ordinals.append(ordinal)
+            for _, display in unmatched_dst[changed:]:
+                result['unexpected'] += 1
+                if len(samples['unexpected']) < self.sample_size:
+                    samples['unexpected'].append(display)
+    
+    def _source_key_text(self, source_table, plan, display_columns, ordinals: List[int]) -> Dict[int, str]:
+        """Display text of some source rows' keys, formatted like the destination's"""
+        wanted = set(ordinals)
+        positions = [plan.dest_schema.index(col['name']) for col in display_columns]
+        normalizers = [text_normalizer(col) for col in display_columns]
+        texts = {}
+        for ordinal, row in enumerate(source_table):
+            if ordinal in wanted:
+                transformed = transform_row(row, plan)
+                texts[ordinal] = ', '.join(
+                    'NULL' if transformed[p] is None else normalize(transformed[p])
+                    for p, normalize in zip(positions, normalizers)
+                )
+                if len(texts) == len(wanted):
+                    break
+        return texts
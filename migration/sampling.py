@@ -0,0 +1,376 @@
+"""
+Stratified random sampling of source tables and keyed sample comparison
+"""
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+from catalog import CatalogSnapshot
+from dedupe import natural_key
+from id_crosswalk import IdCrosswalk, legacy_key
+from mappers import get_lookup_config
+from reconcile import compared_columns, text_normalizer
+from transform_pool import compile_row_plan
+from transformers import collect_field_errors, transform_date, transform_row
+from utils.db_connection import AccessConnection, PostgresConnection, quote_ident
+from utils.table_cache import SpooledTable
+
+SAMPLE_PERIODS = ('year', 'month')
+UNDATED = 'undated'
+
+
+def required_sample_size(population: int, confidence: float = 0.95, margin: float = 0.05) -> int:
+    """
+    Rows to sample to estimate a share of a table within margin at a confidence level
+    
+    Cochran's formula for the worst case proportion (0.5), with the finite
+    population correction.
+    
+    Args:
+        population: Rows in the table
+        confidence: Confidence level, e.g. 0.95
+        margin: Margin of error, e.g. 0.05 for +/- 5 points
+    
+    Returns:
+        Sample size, at most population
+    """
+    if not 0 < confidence < 1 or not 0 < margin < 1:
+        raise ValueError(f"Confidence and margin must be between 0 and 1 (got {confidence}, {margin})")
+    if population <= 0:
+        return 0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    infinite = z * z * 0.25 / (margin * margin)
+    return min(population, math.ceil(infinite / (1 + (infinite - 1) / population)))
+
+
+def date_stratum(value: Any, period: str = 'year') -> str:
+    """Stratum label of a date value: its year or month, or 'undated'"""
+    if period not in SAMPLE_PERIODS:
+        raise ValueError(f"Unknown sample period {period!r}, expected one of {', '.join(SAMPLE_PERIODS)}")
+    try:
+        parsed = transform_date(value)
+    except Exception:
+        parsed = None
+    if parsed is None:
+        return UNDATED
+    return f"{parsed.year:04d}" if period == 'year' else f"{parsed.year:04d}-{parsed.month:02d}"
+
+
+class StratifiedReservoir:
+    """
+    Uniform random sample of each stratum of a row stream of unknown composition
+    
+    Every stratum keeps a reservoir (Algorithm R) as large as the whole
+    sample, since its share of the table isn't known until the stream ends;
+    sample() then allocates the sample across strata in proportion to their
+    sizes. A random subset of a uniform sample is itself uniform.
+    """
+    
+    def __init__(self, capacity: int, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.random = random.Random(seed)
+        self.counts: Dict[str, int] = {}
+        self._reservoirs: Dict[str, List[Tuple[int, tuple]]] = {}
+    
+    def offer(self, stratum: str, ordinal: int, row: tuple):
+        seen = self.counts.get(stratum, 0)
+        self.counts[stratum] = seen + 1
+        reservoir = self._reservoirs.setdefault(stratum, [])
+        if seen < self.capacity:
+            reservoir.append((ordinal, row))
+            return
+        slot = self.random.randrange(seen + 1)
+        if slot < self.capacity:
+            reservoir[slot] = (ordinal, row)
+    
+    def allocation(self, size: int) -> Dict[str, int]:
+        """Rows to draw from each stratum: proportional, at least one per stratum"""
+        total = sum(self.counts.values())
+        if not total:
+            return {}
+        return {
+            stratum: min(count, self.capacity, max(1, round(size * count / total)))
+            for stratum, count in self.counts.items()
+        }
+    
+    def sample(self, size: int) -> Dict[str, List[Tuple[int, tuple]]]:
+        """
+        Draw a stratified sample of about size rows
+        
+        Returns:
+            {stratum: [(ordinal, row)] in table order}
+        """
+        return {
+            stratum: sorted(self.random.sample(self._reservoirs[stratum], n))
+            for stratum, n in self.allocation(size).items()
+        }
+
+
+def stratified_sample(
+    source_table: SpooledTable,
+    confidence: float = 0.95,
+    margin: float = 0.05,
+    date_column: Optional[str] = None,
+    period: str = 'year',
+    seed: Optional[int] = None
+) -> Tuple[Dict[str, List[Tuple[int, tuple]]], Dict[str, Dict[str, int]]]:
+    """
+    Sample a source table in one streaming pass, stratified by date range
+    
+    Args:
+        source_table: Extracted source table
+        confidence: Confidence level the sample size is chosen for
+        margin: Margin of error the sample size is chosen for
+        date_column: Source column whose year or month defines the strata
+            (the table is a single stratum if None)
+        period: 'year' or 'month'
+        seed: Random seed, for a reproducible sample
+    
+    Returns:
+        ({stratum: [(ordinal, row)]}, {stratum: {'rows', 'sampled'}})
+    """
+    size = required_sample_size(len(source_table), confidence, margin)
+    reservoir = StratifiedReservoir(size, seed)
+    position = source_table.schema.index(date_column) if date_column else None
+    if date_column and position is None:
+        raise ValueError(f"Sample stratum column '{date_column}' not found")
+    
+    for ordinal, row in enumerate(source_table):
+        stratum = date_stratum(row[position], period) if position is not None else 'all'
+        reservoir.offer(stratum, ordinal, row)
+    
+    sample = reservoir.sample(size)
+    strata = {
+        stratum: {'rows': reservoir.counts[stratum], 'sampled': len(rows)}
+        for stratum, rows in sorted(sample.items())
+    }
+    return sample, strata
+
+
+class SampleComparer:
+    """
+    Compares a stratified random sample of source rows with their destination rows
+    
+    Sampled source rows are transformed as the migration would transform
+    them, and their destination rows are fetched with one query on the
+    natural key (or, for reference tables without one, on the ids recorded
+    in the id crosswalk). Each compared column is then compared value by
+    value; columns with a server default are left out (see
+    reconcile.compared_columns), since a source NULL loads as the default.
+    Unlike the first rows of a table, the sample covers every date range, so
+    the mismatch rate it gives holds for the table within the margin at the
+    confidence level.
+    """
+    
+    def __init__(
+        self,
+        access_db: AccessConnection,
+        postgres_db: PostgresConnection,
+        access_table: str,
+        dest_table: str,
+        confidence: float = 0.95,
+        margin: float = 0.05,
+        date_column: Optional[str] = None,
+        period: str = 'year',
+        sample_size: int = 10,
+        seed: Optional[int] = None,
+        catalog: Optional[CatalogSnapshot] = None
+    ):
+        self.access_db = access_db
+        self.postgres_db = postgres_db
+        self.access_table = access_table
+        self.dest_table = dest_table
+        self.confidence = confidence
+        self.margin = margin
+        self.date_column = date_column
+        self.period = period
+        self.sample_size = sample_size
+        self.seed = seed
+        self.catalog = catalog
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Sample and compare the table
+        
+        Returns:
+            Dict with population, sampled, strata, untransformable (rows with
+            fields that failed to transform, loaded as NULL), field_errors
+            ({column: count}), unkeyed (rows without a key, not compared),
+            missing, mismatched (rows), mismatches ({column: count}),
+            mismatch_rate and samples (descriptions of differing rows)
+        """
+        source_table = self.access_db.fetch_table(self.access_table)
+        plan = compile_row_plan(self.access_table, self.dest_table, source_table.schema, {})
+        dest_schema = (
+            self.catalog.dest_schema(self.dest_table) if self.catalog is not None
+            else self.postgres_db.get_table_schema(self.dest_table)
+        )
+        columns = compared_columns(self.dest_table, dest_schema, plan.dest_schema.columns)
+        if not columns:
+            return {'skipped': 'no comparable columns'}
+        catalog = {col['name']: col for col in dest_schema['columns']}
+        
+        key = natural_key(dest_schema, [col['name'] for col in columns])
+        if key:
+            key_columns = [catalog[name] for name in key]
+            key_positions = [plan.dest_schema.index(name) for name in key]
+            row_key = lambda source_row, transformed: tuple(transformed[p] for p in key_positions)
+        else:
+            row_key = self._crosswalk_key(source_table)
+            if row_key is None:
+                return {'skipped': 'no natural key or id crosswalk entries'}
+            key_columns = [catalog['id']]
+        
+        sample, strata = stratified_sample(
+            source_table, self.confidence, self.margin, self.date_column, self.period, self.seed
+        )
+        
+        result = {
+            'population': len(source_table),
+            'sampled': sum(info['sampled'] for info in strata.values()),
+            'confidence': self.confidence,
+            'margin': self.margin,
+            'key': [col['name'] for col in key_columns],
+            'strata': strata,
+            'untransformable': 0,
+            'field_errors': {},
+            'unkeyed': 0,
+            'missing': 0,
+            'mismatched': 0,
+            'mismatches': {},
+            'samples': [],
+        }
+        
+        key_text = self._key_text(key_columns)
+        positions = [plan.dest_schema.index(col['name']) for col in columns]
+        normalizers = [text_normalizer(col) for col in columns]
+        expected: Dict[str, tuple] = {}
+        keys: List[tuple] = []
+        for rows in sample.values():
+            for ordinal, row in rows:
+                transformed = transform_row(row, plan)
+                # Fields that fail to transform are set to NULL (and loaded so)
+                field_errors = collect_field_errors(plan)
+                if field_errors:
+                    result['untransformable'] += 1
+                    for column, count in field_errors.items():
+                        result['field_errors'][column] = result['field_errors'].get(column, 0) + count
+                key_value = row_key(row, transformed)
+                if key_value is None or any(value is None for value in key_value):
+                    result['unkeyed'] += 1
+                    continue
+                expected[key_text(key_value)] = tuple(transformed[p] for p in positions)
+                keys.append(key_value)
+        
+        actual = self._fetch_dest(columns, key_columns, keys, key_text)
+        for text, values in expected.items():
+            dest_values = actual.get(text)
+            if dest_values is None:
+                result['missing'] += 1
+                self._describe(result, f"{text}: missing from destination")
+                continue
+            differing = [
+                (column, source_value, dest_value)
+                for column, normalize, source_value, dest_value in zip(columns, normalizers, values, dest_values)
+                if self._normalized(normalize, source_value) != self._normalized(normalize, dest_value)
+            ]
+            if differing:
+                result['mismatched'] += 1
+                for column, source_value, dest_value in differing:
+                    result['mismatches'][column['name']] = result['mismatches'].get(column['name'], 0) + 1
+                self._describe(result, f"{text}: " + ', '.join(
+                    f"{column['name']} {source_value!r} != {dest_value!r}"
+                    for column, source_value, dest_value in differing
+                ))
+        
+        compared = len(expected)
+        result['mismatch_rate'] = (result['missing'] + result['mismatched']) / compared if compared else 0.0
+        return result
+    
+    @staticmethod
+    def _normalized(normalize: Callable[[Any], str], value: Any) -> Optional[str]:
+        return None if value is None else normalize(value)
+    
+    def _describe(self, result: Dict[str, Any], description: str):
+        if len(result['samples']) < self.sample_size:
+            result['samples'].append(description)
+    
+    @staticmethod
+    def _key_text(key_columns: List[Dict[str, Any]]) -> Callable[[Sequence[Any]], str]:
+        normalizers = [text_normalizer(col) for col in key_columns]
+        return lambda key: ', '.join(normalize(value) for normalize, value in zip(normalizers, key))
+    
+    def _crosswalk_key(self, source_table: SpooledTable) -> Optional[Callable[[tuple, tuple], Optional[tuple]]]:
+        """Key function giving a sampled row's destination id from the id crosswalk"""
+        source_key = get_lookup_config(self.access_table).get('source_key')
+        position = source_table.schema.index(source_key) if source_key else None
+        if position is None:
+            return None
+        ids = IdCrosswalk(self.postgres_db).load(self.dest_table, source_key)
+        if not ids:
+            return None
+        
+        def row_key(source_row, transformed):
+            new_id = ids.get(legacy_key(source_row[position]))
+            return (new_id,) if new_id is not None else None
+        return row_key
+    
+    def _fetch_dest(
+        self,
+        columns: List[Dict[str, Any]],
+        key_columns: List[Dict[str, Any]],
+        keys: List[tuple],
+        key_text: Callable[[Sequence[Any]], str]
+    ) -> Dict[str, tuple]:
+        """Destination values of the sampled rows, by key text, in one query"""
+        if not keys:
+            return {}
+        key_names = [quote_ident(col['name']) for col in key_columns]
+        select = ', '.join(
+            [f"{name} AS k{i}" for i, name in enumerate(key_names)]
+            + [f"{quote_ident(col['name'])} AS c{i}" for i, col in enumerate(columns)]
+        )
+        if len(key_names) == 1:
+            condition, params = f"{key_names[0]} = ANY(%s)", ([key[0] for key in keys],)
+        else:
+            condition, params = f"({', '.join(key_names)}) IN %s", (tuple(keys),)
+        
+        rows = self.postgres_db.fetch_all(
+            f"SELECT {select} FROM {quote_ident(self.dest_table)} WHERE {condition}", params
+        )
+        return {
+            key_text([row[f"k{i}"] for i in range(len(key_columns))]):
+                tuple(row[f"c{i}"] for i in range(len(columns)))
+            for row in rows
+        }
+
+
+def format_sample_result(dest_table: str, result: Dict[str, Any]) -> List[str]:
+    """Describe the differences a sample comparison found"""
+    if not result.get('sampled'):
+        return []
+    bad = result['missing'] + result['mismatched']
+    if not bad and not result['untransformable'] and not result['unkeyed']:
+        return []
+    messages = []
+    if bad:
+        columns = ', '.join(f"{name} ({count})" for name, count in sorted(result['mismatches'].items()))
+        message = (
+            f"Sample of {result['sampled']} rows: {result['missing']} missing, "
+            f"{result['mismatched']} with different values ({result['mismatch_rate']:.1%} "
+            f"+/- {result['margin']:.0%} of {dest_table} at {result['confidence']:.0%} confidence)"
+        )
+        if columns:
+            message += f"; columns: {columns}"
+        if result['samples']:
+            message += f" (e.g. {'; '.join(result['samples'])})"
+        messages.append(message)
+    if result['untransformable']:
+        fields = ', '.join(f"{name} ({count})" for name, count in sorted(result['field_errors'].items()))
+        messages.append(
+            f"Sample of {result['sampled']} rows: {result['untransformable']} have fields that fail to transform: {fields}"
+        )
+    if result['unkeyed']:
+        messages.append(f"Sample of {result['sampled']} rows: {result['unkeyed']} have no key and were not compared")
+    return messages
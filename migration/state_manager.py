@@ -1,51 +1,411 @@
 """
 Migration state management for re-runnable migrations
 """
+import atexit
 import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from utils.db_connection import PostgresConnection, quote_ident
 
-class StateManager:
-    """Manages migration state for resume capability"""
+
+def _empty_state() -> Dict[str, Any]:
+    return {
+        'version': '1.0',
+        'started_at': None,
+        'last_updated': None,
+        'tables': {},
+    }
+
+
+class JsonStateStore:
+    """
+    State kept in a JSON file
     
-    def __init__(self, state_file: str = "migration-state.json"):
-        self.state_file = Path(state_file)
-        self.state: Dict[str, Any] = {
-            'version': '1.0',
-            'started_at': None,
-            'last_updated': None,
-            'tables': {},
-        }
-        self.load()
+    Writes go to a temporary file that is renamed over the state file, so a
+    crash never leaves a half-written file behind. Routine updates are
+    debounced and flushed at most every flush_interval seconds; batch
+    checkpoints are flushed right away (see StateManager.checkpoint).
+    """
     
-    def load(self):
+    def __init__(self, state_file: Path, flush_interval: float = 2.0):
+        self.state_file = state_file
+        self.flush_interval = flush_interval
+        self.state = _empty_state()
+        self._dirty = False
+        self._last_flush = 0.0
+    
+    @property
+    def location(self) -> str:
+        return str(self.state_file)
+    
+    def load(self) -> Dict[str, Any]:
         """Load state from file"""
         if self.state_file.exists():
             try:
                 with open(self.state_file, 'r') as f:
                     self.state = json.load(f)
             except Exception:
-                # If file is corrupted, start fresh
-                self.state = {
-                    'version': '1.0',
-                    'started_at': None,
-                    'last_updated': None,
-                    'tables': {},
-                }
+                # Keep the unreadable file for inspection rather than silently discarding it
+                corrupt_file = self.state_file.with_suffix(self.state_file.suffix + '.corrupt')
+                os.replace(self.state_file, corrupt_file)
+                logging.getLogger("migration").warning(
+                    f"Migration state file was unreadable, moved to {corrupt_file}"
+                )
+                self.state = _empty_state()
+        return self.state
     
-    def save(self):
-        """Save state to file"""
+    def update_table(self, table_name: str, defaults: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+        table_state = self.state['tables'].setdefault(table_name, defaults)
+        table_state.update(updates)
+        self._touch()
+        return dict(table_state)
+    
+    def set_meta(self, key: str, value: Any):
+        self.state[key] = value
+        self._touch()
+    
+    def delete_table(self, table_name: str):
+        self.state['tables'].pop(table_name, None)
+        self._touch()
+    
+    def reset(self):
+        self.state = _empty_state()
+        self._touch()
+    
+    def _touch(self):
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        """Atomically write state to file"""
+        if not self._dirty:
+            return
         self.state['last_updated'] = datetime.now().isoformat()
         self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.state_file, 'w') as f:
-            json.dump(self.state, f, indent=2)
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_file.parent, prefix=self.state_file.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.state, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.state_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._dirty = False
+        self._last_flush = time.monotonic()
+    
+    def close(self):
+        self.flush()
+
+
+class SqliteStateStore:
+    """
+    State kept in an embedded SQLite database in WAL mode
+    
+    Each table's state is its own row, so a checkpoint writes only that row.
+    Updates are read-modify-write inside an immediate transaction, which
+    makes them safe when several worker processes share the database.
+    """
+    
+    def __init__(self, state_file: Path):
+        self.state_file = state_file
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(state_file), timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS table_state (table_name TEXT PRIMARY KEY, state TEXT NOT NULL)')
+    
+    @property
+    def location(self) -> str:
+        return str(self.state_file)
+    
+    def load(self) -> Dict[str, Any]:
+        state = _empty_state()
+        for key, value in self.conn.execute('SELECT key, value FROM meta'):
+            state[key] = json.loads(value)
+        for table_name, table_state in self.conn.execute('SELECT table_name, state FROM table_state'):
+            state['tables'][table_name] = json.loads(table_state)
+        return state
+    
+    def update_table(self, table_name: str, defaults: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute(
+                'SELECT state FROM table_state WHERE table_name = ?', (table_name,)
+            ).fetchone()
+            table_state = json.loads(row[0]) if row else defaults
+            table_state.update(updates)
+            self.conn.execute(
+                'INSERT INTO table_state (table_name, state) VALUES (?, ?) '
+                'ON CONFLICT(table_name) DO UPDATE SET state = excluded.state',
+                (table_name, json.dumps(table_state))
+            )
+            self._set_meta('last_updated', datetime.now().isoformat())
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return table_state
+    
+    def _set_meta(self, key: str, value: Any):
+        self.conn.execute(
+            'INSERT INTO meta (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+            (key, json.dumps(value))
+        )
+    
+    def set_meta(self, key: str, value: Any):
+        self._set_meta(key, value)
+    
+    def delete_table(self, table_name: str):
+        self.conn.execute('DELETE FROM table_state WHERE table_name = ?', (table_name,))
+    
+    def reset(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        self.conn.execute('DELETE FROM table_state')
+        self.conn.execute('DELETE FROM meta')
+        self.conn.execute('COMMIT')
+    
+    def flush(self):
+        # Every update is committed as it happens
+        pass
+    
+    def close(self):
+        self.conn.close()
+
+
+class PostgresStateStore:
+    """
+    State kept in a _migration_state table in the destination database
+    
+    Batch checkpoints can be written through the loader's cursor so they
+    commit in the same transaction as the batch's rows: a resumed run
+    continues exactly after the last committed batch. Updates merge JSONB
+    server-side, and tables are claimed with advisory locks so several
+    migration processes can share the work. A read-only store (for a
+    profiling dry run) neither creates the table nor writes to it.
+    """
+    
+    TABLE = '_migration_state'
+    
+    # Advisory lock namespace for table claims
+    LOCK_CLASS = 20467
+    
+    def __init__(self, postgres_db: PostgresConnection, read_only: bool = False):
+        self.db = postgres_db
+        self.read_only = read_only
+        if read_only:
+            self.db.conn.set_session(readonly=True)
+            return
+        self.db.execute_query(f"""
+            CREATE TABLE IF NOT EXISTS "{self.TABLE}" (
+                scope TEXT NOT NULL,
+                name TEXT NOT NULL,
+                state JSONB NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (scope, name)
+            )
+        """)
+    
+    @property
+    def location(self) -> str:
+        return f'"{self.TABLE}" table in the destination database'
+    
+    def _exists(self) -> bool:
+        row = self.db.fetch_one('SELECT to_regclass(%s) IS NOT NULL AS present', (quote_ident(self.TABLE),))
+        return bool(row and row['present'])
+    
+    def load(self) -> Dict[str, Any]:
+        state = _empty_state()
+        if self.read_only and not self._exists():
+            return state
+        for row in self.db.fetch_all(f'SELECT scope, name, state FROM "{self.TABLE}"'):
+            if row['scope'] == 'table':
+                state['tables'][row['name']] = row['state']
+            else:
+                state[row['name']] = row['state']
+        return state
+    
+    def load_table(self, table_name: str) -> Optional[Dict[str, Any]]:
+        if self.read_only and not self._exists():
+            return None
+        row = self.db.fetch_one(
+            f'SELECT state FROM "{self.TABLE}" WHERE scope = %s AND name = %s',
+            ('table', table_name)
+        )
+        return row['state'] if row else None
+    
+    def _upsert(self, scope: str, name: str, value: Any, merge: Optional[Any] = None, cursor=None) -> Any:
+        """Insert or update one state row; merge (if given) is folded into an existing object"""
+        if merge is None:
+            update = 'EXCLUDED.state'
+            params = (scope, name, json.dumps(value))
+        else:
+            update = f'"{self.TABLE}".state || %s::jsonb'
+            params = (scope, name, json.dumps(value), json.dumps(merge))
+        query = f"""
+            INSERT INTO "{self.TABLE}" (scope, name, state) VALUES (%s, %s, %s::jsonb)
+            ON CONFLICT (scope, name) DO UPDATE
+            SET state = {update}, updated_at = now()
+            RETURNING state
+        """
+        
+        if cursor is not None:
+            cursor.execute(query, params)
+            return cursor.fetchone()[0]
+        
+        own_cursor = self.db.conn.cursor()
+        try:
+            own_cursor.execute(query, params)
+            result = own_cursor.fetchone()[0]
+            self.db.conn.commit()
+            return result
+        except Exception:
+            self.db.conn.rollback()
+            raise
+        finally:
+            own_cursor.close()
+    
+    def update_table(self, table_name: str, defaults: Dict[str, Any], updates: Dict[str, Any], cursor=None) -> Dict[str, Any]:
+        return self._upsert('table', table_name, {**defaults, **updates}, merge=updates, cursor=cursor)
+    
+    def set_meta(self, key: str, value: Any):
+        self._upsert('meta', key, value)
+    
+    def delete_table(self, table_name: str):
+        self.db.execute_query(
+            f'DELETE FROM "{self.TABLE}" WHERE scope = %s AND name = %s', ('table', table_name)
+        )
+    
+    def reset(self):
+        self.db.execute_query(f'DELETE FROM "{self.TABLE}"')
+    
+    def claim(self, table_name: str) -> bool:
+        """Try to take the session advisory lock for a table"""
+        row = self.db.fetch_one(
+            'SELECT pg_try_advisory_lock(%s, hashtext(%s)) AS claimed',
+            (self.LOCK_CLASS, table_name)
+        )
+        return bool(row and row['claimed'])
+    
+    def release(self, table_name: str):
+        self.db.fetch_one(
+            'SELECT pg_advisory_unlock(%s, hashtext(%s)) AS released',
+            (self.LOCK_CLASS, table_name)
+        )
+    
+    def flush(self):
+        # Every update is committed as it happens
+        pass
+    
+    def close(self):
+        self.db.close()
+
+
+class StateManager:
+    """Manages migration state for resume capability"""
+    
+    def __init__(
+        self,
+        state_file: str = "migration-state.json",
+        backend: Optional[str] = None,
+        postgres_db: Optional[PostgresConnection] = None,
+        read_only: bool = False
+    ):
+        state_path = Path(state_file)
+        if backend is None:
+            backend = 'sqlite' if state_path.suffix in ('.db', '.sqlite', '.sqlite3') else 'json'
+        
+        if backend == 'postgres':
+            if postgres_db is None:
+                raise ValueError("The postgres state backend needs a destination database connection")
+            self.store = PostgresStateStore(postgres_db, read_only=read_only)
+        elif backend == 'sqlite':
+            self.store = SqliteStateStore(state_path)
+        elif backend == 'json':
+            self.store = JsonStateStore(state_path)
+        else:
+            raise ValueError(f"Unknown state backend: {backend}")
+        
+        self.state_file = state_path
+        self.state: Dict[str, Any] = _empty_state()
+        self.load()
+        atexit.register(self.store.flush)
+        
+        # Carry over progress from a JSON state file when switching to SQLite
+        legacy_file = state_path.with_suffix('.json')
+        if backend == 'sqlite' and not self.state['tables'] and legacy_file.exists():
+            self._import_state(JsonStateStore(legacy_file).load())
+    
+    def _import_state(self, state: Dict[str, Any]):
+        """Copy state from another store into this one"""
+        for table_name, table_state in state.get('tables', {}).items():
+            self.store.update_table(table_name, {}, table_state)
+        if state.get('started_at'):
+            self.store.set_meta('started_at', state['started_at'])
+        self.load()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], read_only: bool = False) -> 'StateManager':
+        """
+        Create a state manager from the 'state' section of config.yaml
+        
+        Args:
+            read_only: Open the postgres backend's connection read-only and
+                don't create its table (for a profiling dry run)
+        """
+        state_config = config.get('state', {}) or {}
+        backend = state_config.get('backend')
+        postgres_db = None
+        if backend == 'postgres':
+            # A dedicated connection, so state writes outside a batch never
+            # commit a loader transaction early
+            postgres_db = PostgresConnection.from_config(config.get('target_database', {}))
+        return cls(
+            state_file=state_config.get('file', 'migration-state.json'),
+            backend=backend,
+            postgres_db=postgres_db,
+            read_only=read_only,
+        )
+    
+    @property
+    def transactional(self) -> bool:
+        """Whether checkpoints can be committed in the destination database transaction"""
+        return isinstance(self.store, PostgresStateStore)
+    
+    @property
+    def location(self) -> str:
+        """Where the state is stored (for log messages)"""
+        return self.store.location
+    
+    def load(self):
+        """Load state from the store"""
+        self.state = self.store.load()
+    
+    def save(self):
+        """Write any pending state changes"""
+        self.store.flush()
+    
+    def close(self):
+        """Flush and close the state store"""
+        self.store.close()
     
     def start_migration(self):
         """Mark migration as started"""
         if not self.state['started_at']:
             self.state['started_at'] = datetime.now().isoformat()
+            self.store.set_meta('started_at', self.state['started_at'])
         self.save()
     
     def get_table_state(self, table_name: str) -> Dict[str, Any]:
@@ -60,21 +420,69 @@ class StateManager:
     
     def update_table_state(self, table_name: str, **kwargs):
         """Update state for a specific table"""
-        if table_name not in self.state['tables']:
-            self.state['tables'][table_name] = {
-                'status': 'in_progress',
-                'records_migrated': 0,
-                'last_id': None,
-                'started_at': datetime.now().isoformat(),
-                'completed_at': None,
-            }
+        self._write_table_state(table_name, kwargs)
+    
+    def checkpoint(self, table_name: str, cursor=None, **kwargs):
+        """
+        Record a batch checkpoint
         
-        self.state['tables'][table_name].update(kwargs)
-        self.state['tables'][table_name]['last_updated'] = datetime.now().isoformat()
-        self.save()
+        With the postgres backend and a loader cursor, the checkpoint is
+        written in the loader's transaction and commits with the batch.
+        Otherwise it is flushed before returning, so it is durable even with
+        a debounced store.
+        """
+        if self.transactional and cursor is not None:
+            self._write_table_state(table_name, kwargs, cursor)
+        else:
+            self._write_table_state(table_name, kwargs)
+            self.store.flush()
+    
+    def _write_table_state(self, table_name: str, updates: Dict[str, Any], cursor=None):
+        defaults = {
+            'status': 'in_progress',
+            'records_migrated': 0,
+            'last_id': None,
+            'started_at': datetime.now().isoformat(),
+            'completed_at': None,
+        }
+        updates['last_updated'] = datetime.now().isoformat()
+        if cursor is not None:
+            table_state = self.store.update_table(table_name, defaults, updates, cursor=cursor)
+        else:
+            table_state = self.store.update_table(table_name, defaults, updates)
+        self.state['tables'][table_name] = table_state
+    
+    def claim_table(self, table_name: str) -> bool:
+        """
+        Claim a table for this process and refresh its state
+        
+        Returns False if another process sharing the state is migrating it.
+        Only the postgres backend coordinates between processes.
+        """
+        if not self.transactional:
+            return True
+        if not self.store.claim(table_name):
+            return False
+        table_state = self.store.load_table(table_name)
+        if table_state is None:
+            self.state['tables'].pop(table_name, None)
+        else:
+            self.state['tables'][table_name] = table_state
+        return True
+    
+    def release_table(self, table_name: str):
+        """Release a table claimed with claim_table"""
+        if self.transactional:
+            self.store.release(table_name)
     
-    def mark_table_complete(self, table_name: str, records_migrated: int, checksum: Optional[str] = None):
-        """Mark a table as completed"""
+    def mark_table_complete(self, table_name: str, records_migrated: int, checksum: Optional[Dict[str, Any]] = None):
+        """
+        Mark a table as completed
+        
+        Args:
+            checksum: Checksums of the source rows read and the rows loaded
+                (see checksum.RowChecksum), with the columns they were taken over
+        """
         self.update_table_state(
             table_name,
             status='completed',
@@ -82,6 +490,7 @@ class StateManager:
             completed_at=datetime.now().isoformat(),
             checksum=checksum,
         )
+        self.save()
     
     def mark_table_failed(self, table_name: str, error: str):
         """Mark a table as failed"""
@@ -90,6 +499,7 @@ class StateManager:
             status='failed',
             error=error,
         )
+        self.save()
     
     def is_table_complete(self, table_name: str) -> bool:
         """Check if a table migration is complete"""
@@ -104,19 +514,21 @@ class StateManager:
     
     def reset_table(self, table_name: str):
         """Reset state for a table"""
-        if table_name in self.state['tables']:
-            del self.state['tables'][table_name]
+        self.state['tables'].pop(table_name, None)
+        self.store.delete_table(table_name)
         self.save()
     
     def reset_all(self):
-        """Reset all migration state"""
-        self.state = {
-            'version': '1.0',
-            'started_at': None,
-            'last_updated': None,
-            'tables': {},
-        }
+        """
+        Reset all migration state
+        
+        This includes tables other processes sharing the state are
+        migrating; a forced run resets each table with reset_table once it
+        has claimed it instead.
+        """
+        self.store.reset()
         self.save()
+        self.state = self.store.load()
     
     def get_summary(self) -> Dict[str, Any]:
         """Get migration summary"""
@@ -135,4 +547,3 @@ class StateManager:
             'in_progress': in_progress,
             'total_records_migrated': total_records,
         }
-
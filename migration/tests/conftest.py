@@ -0,0 +1,7 @@
+"""
+Test setup: the migration modules import each other as top-level modules
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,82 @@
+"""
+Tests for row checksums and the PostgreSQL text form of values
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from checksum import CHECKSUM_BITS, LoadedRowHasher, RowChecksum, source_checksum, source_row_hash
+from reconcile import FIELD_SEPARATOR, NULL_MARKER, hash_text, text_normalizer
+
+
+ROWS = [('ACME', 1, None), ('Zeta', 2, 'x'), ('Widget', None, 'y')]
+
+
+def test_checksum_ignores_row_order():
+    assert source_checksum(ROWS) == source_checksum(reversed(ROWS))
+    assert source_checksum(ROWS) != source_checksum(ROWS[:2])
+
+
+def test_checksums_of_disjoint_rows_add_up():
+    assert source_checksum(ROWS[:1]) + source_checksum(ROWS[1:]) == source_checksum(ROWS)
+
+
+def test_checksum_wraps_at_64_bits():
+    checksum = RowChecksum(1, (1 << CHECKSUM_BITS) - 1)
+    checksum.add(2)
+    assert (checksum.rows, checksum.hash_sum) == (2, 1)
+
+
+def test_checksum_round_trips_through_state():
+    checksum = source_checksum(ROWS)
+    assert RowChecksum.from_dict(checksum.as_dict()) == checksum
+
+
+def test_source_row_hash_marks_nulls():
+    assert source_row_hash(('a', None)) == hash_text('a' + FIELD_SEPARATOR + NULL_MARKER)
+    assert source_row_hash(('a', None)) != source_row_hash(('a', ''))
+
+
+@pytest.mark.parametrize('column, value, text', [
+    # trim_scale(value::numeric)::text, after the column rounds to its scale
+    ({'type': 'numeric', 'scale': 2}, Decimal('1.005'), '1.01'),
+    ({'type': 'numeric', 'scale': 2}, Decimal('1.50'), '1.5'),
+    ({'type': 'numeric', 'scale': 2}, 100, '100'),
+    ({'type': 'numeric', 'scale': 2}, Decimal('-0.001'), '0'),
+    ({'type': 'numeric'}, 2.5, '2.5'),
+    ({'type': 'integer'}, 42, '42'),
+    ({'type': 'double precision'}, 1e-7, '0.0000001'),
+    # CASE WHEN value THEN 't' ELSE 'f' END
+    ({'type': 'boolean'}, True, 't'),
+    ({'type': 'boolean'}, 0, 'f'),
+    # to_char(value, 'YYYY-MM-DD')
+    ({'type': 'date'}, datetime(2024, 1, 2, 3, 4), '2024-01-02'),
+    ({'type': 'date'}, date(2024, 1, 2), '2024-01-02'),
+    # to_char(value::timestamp, 'YYYY-MM-DD HH24:MI:SS.US')
+    ({'type': 'timestamp without time zone'}, date(2024, 1, 2), '2024-01-02 00:00:00.000000'),
+    ({'type': 'timestamp with time zone'}, datetime(2024, 1, 2, 3, 4, 5, 6), '2024-01-02 03:04:05.000006'),
+    # rtrim(value) for blank-padded character columns
+    ({'type': 'character'}, 'AB  ', 'AB'),
+    ({'type': 'text'}, 'AB  ', 'AB  '),
+])
+def test_text_normalizer_matches_postgres_text(column, value, text):
+    assert text_normalizer(column)(value) == text
+
+
+def test_loaded_row_hasher_columns_and_hash():
+    dest_schema = {'columns': [
+        {'name': 'id', 'type': 'integer', 'default': "nextval('seq')"},
+        {'name': 'name', 'type': 'text', 'default': None},
+        {'name': 'qty', 'type': 'numeric', 'scale': 2, 'default': None},
+        {'name': 'status', 'type': 'text', 'default': "'open'"},
+        {'name': 'extra', 'type': 'jsonb', 'default': None},
+        {'name': 'created_at', 'type': 'timestamp with time zone', 'default': None},
+    ]}
+    load_columns = ['id', 'name', 'qty', 'status', 'extra', 'created_at']
+    hasher = LoadedRowHasher(dest_schema, load_columns)
+    assert hasher.columns == ['name', 'qty']
+    row = (None, 'ACME', Decimal('2.50'), None, '{}', datetime(2024, 1, 2))
+    assert hasher.hash_row(row) == hash_text('ACME' + FIELD_SEPARATOR + '2.5')
+    assert hasher.hash_row(row[:2] + (None,) + row[3:]) == hash_text('ACME' + FIELD_SEPARATOR + NULL_MARKER)
+    assert LoadedRowHasher(dest_schema, load_columns, keep_null=('status',)).columns == ['name', 'qty', 'status']
@@ -0,0 +1,138 @@
+"""
+Tests for duplicate natural key resolution
+"""
+import pytest
+
+from dedupe import DuplicateFilter, natural_key
+
+
+def make_filter(policy, rows, exact_max_rows=2000000):
+    """Filter keyed on the first field, with rows transformed unchanged"""
+    return DuplicateFilter(
+        ('name',),
+        [0],
+        lambda row: (row[0],),
+        tuple,
+        policy=policy,
+        expected_rows=len(rows),
+        exact_max_rows=exact_max_rows
+    )
+
+
+def load(dedupe, rows, rejected=(), batch_size=None, start=0):
+    """
+    Stream rows through a filter as the migration does
+    
+    Rows whose ordinal is in rejected fail to load, and the row the filter
+    falls back to (if any) is tried in their place.
+    
+    Returns:
+        (loaded rows, ordinals dropped as duplicates)
+    """
+    if dedupe.needs_prescan:
+        dedupe.prescan(rows)
+    if start:
+        dedupe.resume(rows[:start])
+    batch_size = batch_size or len(rows)
+    loaded, dropped = [], []
+    for batch_start in range(start, len(rows), batch_size):
+        for ordinal in range(batch_start, min(batch_start + batch_size, len(rows))):
+            row = rows[ordinal]
+            transformed, was_dropped = dedupe.offer(ordinal, tuple(row), row)
+            if was_dropped:
+                dropped.append(ordinal)
+            candidate = (ordinal, row, transformed) if transformed is not None else None
+            while candidate is not None:
+                candidate_ordinal, source, transformed = candidate
+                if candidate_ordinal not in rejected:
+                    loaded.append(transformed)
+                    break
+                candidate = dedupe.release(candidate_ordinal, source)
+        dropped += [ordinal for ordinal, _ in dedupe.settle()]
+    return loaded, sorted(dropped)
+
+
+ROWS = [('A', 1), ('B', 1), ('A', 2), ('A', 3)]
+
+
+def test_natural_key_skips_keys_with_id():
+    schema = {'unique_keys': [['id'], ['name', 'id'], ['name']]}
+    assert natural_key(schema, ['id', 'name']) == ('name',)
+    assert natural_key(schema, ['id']) is None
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        make_filter('newest', ROWS)
+
+
+@pytest.mark.parametrize('exact_max_rows', [2000000, 0])
+def test_first_keeps_first_row(exact_max_rows):
+    dedupe = make_filter('first', ROWS, exact_max_rows)
+    assert dedupe.needs_prescan == (exact_max_rows == 0)
+    loaded, dropped = load(dedupe, ROWS)
+    assert loaded == [('A', 1), ('B', 1)]
+    assert dropped == [2, 3]
+    assert dedupe.summary()['dropped'] == 2
+    assert dedupe.summary()['duplicate_keys'] == 1
+
+
+@pytest.mark.parametrize('exact_max_rows', [2000000, 0])
+def test_first_falls_back_when_first_row_rejected(exact_max_rows):
+    dedupe = make_filter('first', ROWS, exact_max_rows)
+    loaded, dropped = load(dedupe, ROWS, rejected={0})
+    assert loaded == [('B', 1), ('A', 2)]
+    assert dropped == [3]
+
+
+def test_first_releases_key_without_held_row():
+    # The first row is rejected before the next row of its key is offered
+    dedupe = make_filter('first', ROWS)
+    loaded, dropped = load(dedupe, ROWS, rejected={0}, batch_size=1)
+    assert loaded == [('B', 1), ('A', 2)]
+    assert dropped == [3]
+
+
+def test_first_resume_remembers_loaded_keys():
+    dedupe = make_filter('first', ROWS)
+    loaded, dropped = load(dedupe, ROWS, start=2)
+    assert loaded == []
+    assert dropped == [2, 3]
+
+
+def test_last_keeps_last_row():
+    dedupe = make_filter('last', ROWS)
+    loaded, dropped = load(dedupe, ROWS)
+    assert loaded == [('B', 1), ('A', 3)]
+    assert dropped == [0, 2]
+
+
+def test_last_falls_back_when_last_row_rejected():
+    dedupe = make_filter('last', ROWS)
+    loaded, dropped = load(dedupe, ROWS, rejected={3})
+    assert loaded == [('B', 1), ('A', 2)]
+    assert dropped == [0]
+
+
+def test_last_resume_holds_earlier_row():
+    dedupe = make_filter('last', ROWS)
+    loaded, dropped = load(dedupe, ROWS, rejected={3}, start=3)
+    assert loaded == [('A', 2)]
+    assert dropped == []
+
+
+def test_merge_combines_rows():
+    rows = [('A', 1, None), ('B', 1, 'b'), ('A', None, 'x'), ('A', 3, None)]
+    dedupe = make_filter('merge', rows)
+    loaded, dropped = load(dedupe, rows)
+    assert loaded == [('B', 1, 'b'), ('A', 3, 'x')]
+    assert dropped == []
+    assert dedupe.summary()['merged'] == 2
+
+
+@pytest.mark.parametrize('policy', ['first', 'last', 'merge'])
+def test_null_keys_never_collide(policy):
+    rows = [(None, 1), (None, 2), ('A', 1)]
+    loaded, dropped = load(make_filter(policy, rows), rows)
+    assert loaded == [(None, 1), (None, 2), ('A', 1)]
+    assert dropped == []
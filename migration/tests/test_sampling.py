@@ -0,0 +1,55 @@
+"""
+Tests for stratified sampling
+"""
+import pytest
+
+from sampling import StratifiedReservoir, required_sample_size
+
+
+def reservoir(counts, capacity=1000):
+    sampler = StratifiedReservoir(capacity, seed=1)
+    ordinal = 0
+    for stratum, count in counts.items():
+        for _ in range(count):
+            sampler.offer(stratum, ordinal, (ordinal,))
+            ordinal += 1
+    return sampler
+
+
+def test_required_sample_size():
+    assert required_sample_size(10 ** 9) == 385
+    assert required_sample_size(1000) == 278
+    assert required_sample_size(50) == 45
+    assert required_sample_size(0) == 0
+    with pytest.raises(ValueError):
+        required_sample_size(1000, confidence=1.5)
+
+
+def test_allocation_is_proportional():
+    assert reservoir({'2022': 900, '2023': 100}).allocation(100) == {'2022': 90, '2023': 10}
+
+
+def test_allocation_keeps_one_row_per_stratum():
+    assert reservoir({'2022': 999, '2023': 1}).allocation(10) == {'2022': 10, '2023': 1}
+
+
+def test_allocation_capped_by_stratum_size():
+    assert reservoir({'2022': 5, '2023': 5}).allocation(100) == {'2022': 5, '2023': 5}
+
+
+def test_allocation_capped_by_capacity():
+    assert reservoir({'2022': 50, 'undated': 50}, capacity=20).allocation(100) == {'2022': 20, 'undated': 20}
+
+
+def test_allocation_of_empty_stream():
+    assert StratifiedReservoir(10).allocation(100) == {}
+
+
+def test_sample_draws_allocation_in_table_order():
+    sampler = reservoir({'2022': 900, '2023': 100}, capacity=200)
+    sample = sampler.sample(100)
+    assert {stratum: len(rows) for stratum, rows in sample.items()} == {'2022': 90, '2023': 10}
+    for stratum, rows in sample.items():
+        ordinals = [ordinal for ordinal, _ in rows]
+        assert ordinals == sorted(ordinals)
+        assert all((ordinal < 900) == (stratum == '2022') for ordinal in ordinals)
@@ -0,0 +1,57 @@
+"""
+Tests for spooled source tables
+"""
+import gzip
+
+import pytest
+
+import utils.table_cache as table_cache
+from utils.row_schema import RowSchema
+from utils.table_cache import SpooledTable
+
+
+ROWS = [(i, f"row {i}") for i in range(10)]
+
+
+@pytest.fixture(params=['memory', 'spilled'])
+def table(request, tmp_path):
+    budget = 0 if request.param == 'spilled' else 10 ** 9
+    spooled = SpooledTable.spool(RowSchema(['id', 'name']), iter(ROWS), budget, lambda: str(tmp_path), chunk_rows=3)
+    assert spooled.spilled == (request.param == 'spilled')
+    yield spooled
+    spooled.close()
+
+
+def test_rows_kept_in_order(table):
+    assert len(table) == len(ROWS)
+    assert list(table) == ROWS
+
+
+@pytest.mark.parametrize('start', [0, 2, 3, 4, 9, 10, 12])
+def test_iter_rows_from_start(table, start):
+    assert list(table.iter_rows(start)) == ROWS[start:]
+
+
+def test_iter_batches_from_start(table):
+    assert list(table.iter_batches(4, start=3)) == [ROWS[3:7], ROWS[7:10]]
+
+
+def test_iter_rows_skips_chunks_before_start(tmp_path, monkeypatch):
+    spooled = SpooledTable.spool(RowSchema(['id', 'name']), iter(ROWS), 0, lambda: str(tmp_path), chunk_rows=3)
+    opened = []
+    real_open = gzip.open
+    
+    def gzip_open(path, *args, **kwargs):
+        opened.append(path)
+        return real_open(path, *args, **kwargs)
+    
+    monkeypatch.setattr(table_cache.gzip, 'open', gzip_open)
+    chunks = [path for path, _ in spooled._chunks]
+    assert list(spooled.iter_rows(7)) == ROWS[7:]
+    assert opened == chunks[2:]
+    spooled.close()
+
+
+def test_head_reads_no_more_than_needed(table):
+    assert table.head(4) == ROWS[:4]
+    assert table.head(20) == ROWS
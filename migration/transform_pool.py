@@ -0,0 +1,154 @@
+"""
+Transform executor for spreading CPU-bound record transformation across processes
+"""
+import os
+import signal
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+
+from transformers import (
+    compile_transform_plan, transform_batch, collect_plan_stats, collect_field_errors, RowPlan
+)
+from fk_index import merge_fk_stats
+from mappers import get_field_mapping, get_transformations
+from utils.row_schema import RowSchema
+
+
+# Compiled plan for the table a worker process was started for.
+# Set once per worker by _init_worker, never per batch.
+_worker_plan = None
+
+
+def compile_row_plan(
+    access_table: str,
+    dest_table: str,
+    source_schema: RowSchema,
+    lookup_maps: Dict[str, Dict[str, str]]
+) -> RowPlan:
+    """Compile the positional transform plan for a table"""
+    plan = compile_transform_plan(
+        get_field_mapping(access_table),
+        get_transformations(dest_table),
+        lookup_maps=lookup_maps
+    )
+    return RowPlan(plan, source_schema)
+
+
+def _init_worker(
+    access_table: str,
+    dest_table: str,
+    source_schema: RowSchema,
+    lookup_maps: Dict[str, Dict[str, str]]
+):
+    """Compile the transform plan once when a worker process starts"""
+    global _worker_plan
+    # Ctrl+C is handled by the main process, which finishes the in-flight batch
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Transformations are rebuilt from mappers in the worker rather than
+    # pickled, since some of them are lambdas
+    _worker_plan = compile_row_plan(access_table, dest_table, source_schema, lookup_maps)
+
+
+def _transform_in_worker(
+    rows: List[tuple]
+) -> Tuple[List[Tuple[Optional[tuple], Optional[str]]], Dict[str, Any], Counter]:
+    """Transform a batch using the plan compiled at worker startup"""
+    results = transform_batch(rows, _worker_plan)
+    return results, collect_plan_stats(_worker_plan), collect_field_errors(_worker_plan)
+
+
+def resolve_worker_count(setting: Any) -> int:
+    """Resolve the transform_workers config value to a process count (0 = in-process)"""
+    if setting in (None, False):
+        return 0
+    if isinstance(setting, str) and setting.lower() == 'auto':
+        return os.cpu_count() or 1
+    return max(int(setting), 0)
+
+
+class TransformExecutor:
+    """Transforms batches of positional source rows in order, optionally across a process pool"""
+    
+    def __init__(
+        self,
+        access_table: str,
+        dest_table: str,
+        source_schema: RowSchema,
+        lookup_maps: Optional[Dict[str, Dict[str, str]]] = None,
+        workers: int = 0
+    ):
+        self.access_table = access_table
+        self.dest_table = dest_table
+        self.lookup_maps = lookup_maps or {}
+        self.workers = workers
+        self.pool: Optional[ProcessPoolExecutor] = None
+        # Compiled in-process as well, for its destination layout
+        self.plan = compile_row_plan(access_table, dest_table, source_schema, self.lookup_maps)
+        # Foreign key resolution statistics per destination column
+        self.fk_stats: Dict[str, Dict[str, Any]] = {}
+        # Values that failed to transform (and were loaded as NULL) per destination column
+        self.field_errors: Counter = Counter()
+        
+        if workers > 1:
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(access_table, dest_table, source_schema, self.lookup_maps)
+            )
+    
+    @property
+    def dest_schema(self) -> RowSchema:
+        """Layout of the transformed rows"""
+        return self.plan.dest_schema
+    
+    @property
+    def parallel(self) -> bool:
+        return self.pool is not None
+    
+    def map(
+        self,
+        batches: Iterable[List[tuple]]
+    ) -> Iterator[Tuple[List[tuple], List[Tuple[Optional[tuple], Optional[str]]]]]:
+        """
+        Transform batches, yielding (batch, results) in input order
+        
+        At most two batches per worker are in flight, so memory stays bounded
+        while the loader consumes results.
+        """
+        if not self.parallel:
+            for batch in batches:
+                results = transform_batch(batch, self.plan)
+                merge_fk_stats(self.fk_stats, collect_plan_stats(self.plan))
+                self.field_errors.update(collect_field_errors(self.plan))
+                yield batch, results
+            return
+        
+        max_pending = self.workers * 2
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, self.pool.submit(_transform_in_worker, batch)))
+            if len(pending) >= max_pending:
+                yield self._collect(*pending.popleft())
+        
+        while pending:
+            yield self._collect(*pending.popleft())
+    
+    def _collect(self, batch, future):
+        """Wait for a worker batch and fold in its statistics"""
+        results, fk_stats, field_errors = future.result()
+        merge_fk_stats(self.fk_stats, fk_stats)
+        self.field_errors.update(field_errors)
+        return batch, results
+    
+    def close(self):
+        """Shut down worker processes"""
+        if self.pool:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
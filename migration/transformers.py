@@ -1,11 +1,16 @@
 """
 Data transformation functions for converting Access data to PostgreSQL format
 """
+from collections import Counter
 from datetime import datetime
 from decimal import Decimal
-from typing import Any, Optional, Dict
+from functools import partial
+from typing import Any, Optional, Dict, List, Tuple, Callable, Sequence
 import uuid
 
+from fk_index import ForeignKeyIndex, ForeignKeyResolver
+from utils.row_schema import RowSchema
+
 
 def generate_cuid() -> str:
     """Generate a CUID-like ID (simplified version)"""
@@ -278,84 +283,235 @@ def transform_json(value: Any) -> Optional[Dict]:
     return {'value': str(value)}
 
 
-def apply_transformations(
-    record: Dict[str, Any],
+def resolve_lookup_map(
+    source_field: str,
+    dest_field: str,
+    lookup_maps: Optional[Dict[str, Dict[str, str]]] = None
+) -> Optional[Dict[str, str]]:
+    """
+    Find the lookup map used to resolve a foreign key field
+    
+    Args:
+        source_field: Source field name in Access
+        dest_field: Destination foreign key field (e.g. customer_id)
+        lookup_maps: Foreign key lookup maps keyed by table name
+    
+    Returns:
+        Lookup map or None if no matching map exists
+    """
+    if not lookup_maps:
+        return None
+    
+    # Special case: User_Name -> user_id should use name-based lookup
+    if source_field == 'User_Name' and 'users_by_name' in lookup_maps:
+        return lookup_maps['users_by_name']
+    # Special case: TypeYC -> yarn_type_id should use description-based lookup
+    if source_field == 'TypeYC' and 'yarn_types_by_description' in lookup_maps:
+        return lookup_maps['yarn_types_by_description']
+    
+    # Try to find matching lookup map based on field name
+    # Pattern: customer_id -> customers, yarn_type_id -> yarn_types, etc.
+    field_base = dest_field.replace('_id', '')
+    
+    # Try exact table name match first
+    if field_base in lookup_maps:
+        return lookup_maps[field_base]
+    
+    # Try pluralized version
+    plural_key = f"{field_base}s"
+    if plural_key in lookup_maps:
+        return lookup_maps[plural_key]
+    
+    # Try to find by partial match
+    for map_name, map_data in lookup_maps.items():
+        if field_base in map_name or map_name.replace('_', '') in field_base.replace('_', ''):
+            return map_data
+    
+    return None
+
+
+def foreign_key_allows_null(dest_field: str) -> bool:
+    """Determine if null is allowed for a foreign key field based on field name patterns"""
+    allow_null = dest_field.endswith('_id') and 'customer' in dest_field.lower()  # customer_id is nullable in some tables
+    if 'delivery_note_id' in dest_field or 'pack_info_id' in dest_field:
+        allow_null = True
+    return allow_null
+
+
+def compile_transform_plan(
     field_mapping: Dict[str, str],
     transformations: Dict[str, callable],
     id_map: Optional[Dict[str, str]] = None,
     lookup_maps: Optional[Dict[str, Dict[str, str]]] = None
-) -> Dict[str, Any]:
+) -> List[Tuple[str, str, Callable[[Any], Any]]]:
     """
-    Apply all transformations to a record
+    Compile the per-field transformation steps for a table
+    
+    Lookup maps and foreign key options are resolved once here instead of
+    for every record.
     
     Args:
-        record: Source record from Access
         field_mapping: Mapping of source fields to destination fields
         transformations: Mapping of destination fields to transformation functions
         id_map: Optional ID mapping dictionary
         lookup_maps: Optional foreign key lookup maps
     
     Returns:
-        Transformed record ready for insertion
+        List of (source_field, dest_field, function) steps
     """
-    transformed = {}
+    plan = []
     
     for source_field, dest_field in field_mapping.items():
-        source_value = record.get(source_field)
-        
-        # Get transformation function
         transform_func = transformations.get(dest_field)
         
-        if transform_func:
-            try:
-                # Handle special transformations that need extra params
-                if transform_func == lookup_foreign_key:
-                    # Determine which lookup map to use
-                    lookup_map = None
-                    if lookup_maps:
-                        # Special case: User_Name -> user_id should use name-based lookup
-                        if source_field == 'User_Name' and 'users_by_name' in lookup_maps:
-                            lookup_map = lookup_maps['users_by_name']
-                        # Special case: TypeYC -> yarn_type_id should use description-based lookup
-                        elif source_field == 'TypeYC' and 'yarn_types_by_description' in lookup_maps:
-                            lookup_map = lookup_maps['yarn_types_by_description']
-                        else:
-                            # Try to find matching lookup map based on field name
-                            # Pattern: customer_id -> customers, yarn_type_id -> yarn_types, etc.
-                            field_base = dest_field.replace('_id', '')
-                            
-                            # Try exact table name match first
-                            if field_base in lookup_maps:
-                                lookup_map = lookup_maps[field_base]
-                            else:
-                                # Try pluralized version
-                                plural_key = f"{field_base}s"
-                                if plural_key in lookup_maps:
-                                    lookup_map = lookup_maps[plural_key]
-                                else:
-                                    # Try to find by partial match
-                                    for map_name, map_data in lookup_maps.items():
-                                        if field_base in map_name or map_name.replace('_', '') in field_base.replace('_', ''):
-                                            lookup_map = map_data
-                                            break
-                    
-                    # Determine if null is allowed based on field name patterns
-                    allow_null = dest_field.endswith('_id') and 'customer' in dest_field.lower()  # customer_id is nullable in some tables
-                    if 'delivery_note_id' in dest_field or 'pack_info_id' in dest_field:
-                        allow_null = True
-                    
-                    transformed[dest_field] = transform_func(source_value, lookup_map, allow_null=allow_null)
-                elif transform_func == transform_id:
-                    transformed[dest_field] = transform_func(source_value, id_map)
-                else:
-                    transformed[dest_field] = transform_func(source_value)
-            except Exception as e:
-                # Log error but continue
-                print(f"Warning: Error transforming {source_field} -> {dest_field}: {e}")
-                transformed[dest_field] = None
+        if transform_func == lookup_foreign_key:
+            lookup_map = resolve_lookup_map(source_field, dest_field, lookup_maps)
+            if isinstance(lookup_map, ForeignKeyIndex):
+                # Normalized/fuzzy matching with per-column statistics
+                step = ForeignKeyResolver(dest_field, lookup_map, allow_null=foreign_key_allows_null(dest_field))
+            else:
+                step = partial(
+                    lookup_foreign_key,
+                    lookup_map=lookup_map,
+                    allow_null=foreign_key_allows_null(dest_field)
+                )
+        elif transform_func == transform_id:
+            step = partial(transform_id, id_map=id_map)
+        elif transform_func:
+            step = transform_func
         else:
             # No transformation, use value as-is (with basic cleaning)
-            transformed[dest_field] = transform_text(source_value) if source_value is not None else None
+            step = None
+        
+        plan.append((source_field, dest_field, step))
+    
+    return plan
+
+
+class RowPlan:
+    """Transformation plan bound to positional source and destination rows"""
+    
+    __slots__ = ('dest_schema', 'steps', 'id_position', 'field_errors')
+    
+    def __init__(self, plan: List[Tuple[str, str, Callable[[Any], Any]]], source_schema: RowSchema):
+        dest_columns = list(dict.fromkeys(dest_field for _, dest_field, _ in plan))
+        if 'id' not in dest_columns:
+            dest_columns.append('id')
+        self.dest_schema = RowSchema(dest_columns)
+        self.id_position = self.dest_schema.index('id')
+        # (source position or None, destination position, function)
+        self.steps = [
+            (source_schema.index(source_field), self.dest_schema.index(dest_field), step)
+            for source_field, dest_field, step in plan
+        ]
+        # Fields that failed to transform (and were set to None), by destination field
+        self.field_errors: Counter = Counter()
+
+
+def transform_row(row: Sequence[Any], row_plan: RowPlan) -> tuple:
+    """
+    Apply a row plan to a positional source row
+    
+    Args:
+        row: Source row as a tuple, laid out by the plan's source schema
+        row_plan: Plan from RowPlan
     
-    return transformed
+    Returns:
+        Transformed row as a tuple laid out by row_plan.dest_schema
+    """
+    values = [None] * len(row_plan.dest_schema)
+    
+    for source_index, dest_index, step in row_plan.steps:
+        source_value = row[source_index] if source_index is not None else None
+        
+        if step is None:
+            values[dest_index] = transform_text(source_value) if source_value is not None else None
+            continue
+        
+        try:
+            values[dest_index] = step(source_value)
+        except Exception:
+            # Count the error but continue with the field unset
+            row_plan.field_errors[row_plan.dest_schema.columns[dest_index]] += 1
+            values[dest_index] = None
+    
+    # Ensure id is always present
+    if values[row_plan.id_position] is None:
+        values[row_plan.id_position] = generate_cuid()
+    
+    return tuple(values)
 
+
+def compile_key_function(row_plan: RowPlan, columns: Sequence[str]) -> Callable[[Sequence[Any]], tuple]:
+    """
+    Compile a function computing only some destination columns of a source row
+    
+    Used to read natural keys without transforming whole rows. Values match
+    what transform_row produces for those columns.
+    
+    Args:
+        row_plan: Plan from RowPlan
+        columns: Destination columns to compute
+    
+    Returns:
+        Function from a source row to a tuple of the columns' values
+    """
+    positions = [row_plan.dest_schema.index(col) for col in columns]
+    steps = [
+        (source_index, positions.index(dest_index), step)
+        for source_index, dest_index, step in row_plan.steps
+        if dest_index in positions
+    ]
+    
+    def key_of(row: Sequence[Any]) -> tuple:
+        values = [None] * len(positions)
+        for source_index, key_index, step in steps:
+            source_value = row[source_index] if source_index is not None else None
+            if step is None:
+                values[key_index] = transform_text(source_value) if source_value is not None else None
+                continue
+            try:
+                values[key_index] = step(source_value)
+            except Exception:
+                values[key_index] = None
+        return tuple(values)
+    return key_of
+
+
+def collect_plan_stats(row_plan: RowPlan) -> Dict[str, Dict[str, Any]]:
+    """Take foreign key resolution statistics accumulated by a plan's resolvers"""
+    return {
+        row_plan.dest_schema.columns[dest_index]: step.take_stats()
+        for _, dest_index, step in row_plan.steps
+        if isinstance(step, ForeignKeyResolver)
+    }
+
+
+def collect_field_errors(row_plan: RowPlan) -> Counter:
+    """Take the per-field transform error counts accumulated by a plan and reset them"""
+    field_errors = row_plan.field_errors
+    row_plan.field_errors = Counter()
+    return field_errors
+
+
+def transform_batch(
+    rows: List[Sequence[Any]],
+    row_plan: RowPlan
+) -> List[Tuple[Optional[tuple], Optional[str]]]:
+    """
+    Transform a batch of positional rows, capturing per-row errors
+    
+    Args:
+        rows: Source rows from Access
+        row_plan: Plan from RowPlan
+    
+    Returns:
+        List of (transformed_row, error) pairs in input order
+    """
+    results = []
+    for row in rows:
+        try:
+            results.append((transform_row(row, row_plan), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
@@ -1,15 +1,23 @@
 """
 Database connection utilities for Access and PostgreSQL
 """
+import io
 import os
+import sys
 import subprocess
 import csv
+import re
 import tempfile
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from typing import Optional, Dict, Any, List
+from psycopg2.extensions import AsIs
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from typing import Optional, Dict, Any, Iterator, List, Sequence, Tuple, Callable
 from pathlib import Path
 
+from utils.row_schema import RowSchema
+from utils.table_cache import TableCache, SpooledTable
+
 # Try to import pyodbc, but it's optional if mdbtools is available
 try:
     import pyodbc
@@ -18,10 +26,26 @@ except ImportError:
     PYODBC_AVAILABLE = False
 
 
+def intern_values(row: tuple, positions: List[int]) -> tuple:
+    """Intern the string values at the given positions of a row"""
+    values = list(row)
+    for i in positions:
+        value = values[i]
+        if type(value) is str:
+            values[i] = sys.intern(value)
+    return tuple(values)
+
+
 class AccessConnection:
     """Connection to Microsoft Access database using pyodbc or mdbtools"""
     
-    def __init__(self, db_path: str, use_mdbtools: Optional[bool] = None):
+    def __init__(
+        self,
+        db_path: str,
+        use_mdbtools: Optional[bool] = None,
+        cache_budget_mb: float = 512,
+        intern_columns: Optional[Dict[str, List[str]]] = None
+    ):
         self.db_path = Path(db_path)
         if not self.db_path.exists():
             raise FileNotFoundError(f"Access database not found: {db_path}")
@@ -30,6 +54,12 @@ class AccessConnection:
         self.conn = None
         self._mdbtools_mode = False
         
+        # Each table is extracted once per run and shared by counts, samples,
+        # lookups and the load; tables beyond the budget are spilled to disk
+        self.cache = TableCache(int(cache_budget_mb * 1024 * 1024))
+        # Categorical columns to intern per table when it is extracted
+        self.intern_columns = intern_columns or {}
+        
         # Auto-detect: try pyodbc first, fallback to mdbtools
         if use_mdbtools is None:
             use_mdbtools = not PYODBC_AVAILABLE
@@ -114,139 +144,182 @@ class AccessConnection:
             return self._get_table_schema_mdbtools(table_name)
         
         cursor = self.conn.cursor()
-        columns = []
-        
-        # Get column information
-        for column in cursor.columns(table=table_name):
-            columns.append({
-                'name': column.column_name,
-                'type': column.type_name,
-                'size': column.column_size,
-                'nullable': column.nullable == 1,
-                'default': column.column_def,
-            })
-        
+        columns = [self._odbc_column(column) for column in cursor.columns(table=table_name)]
         cursor.close()
         return {
             'table_name': table_name,
             'columns': columns,
         }
     
-    def _get_table_schema_mdbtools(self, table_name: str) -> Dict[str, Any]:
-        """Get table schema using mdbtools"""
+    def get_table_schemas(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Schema information for every table, read with one catalog call
+        
+        With mdbtools the whole database is described by a single mdb-schema
+        run; with pyodbc by a single columns() call.
+        
+        Returns:
+            {table_name: schema in the get_table_schema format}
+        """
+        if self._mdbtools_mode:
+            try:
+                parsed = self._parse_mdb_schema(self._run_mdb_schema())
+            except Exception:
+                parsed = {}
+            tables = list(parsed) or self._get_tables_mdbtools()
+            return {
+                table_name: {
+                    'table_name': table_name,
+                    'columns': parsed.get(table_name) or self._export_header_columns(table_name),
+                }
+                for table_name in tables
+            }
+        
+        tables = self.get_tables()
+        columns: Dict[str, List[Dict[str, Any]]] = {table_name: [] for table_name in tables}
+        cursor = self.conn.cursor()
+        for column in cursor.columns():
+            if column.table_name in columns:
+                columns[column.table_name].append(self._odbc_column(column))
+        cursor.close()
+        return {
+            table_name: {'table_name': table_name, 'columns': table_columns}
+            for table_name, table_columns in columns.items()
+        }
+    
+    @staticmethod
+    def _odbc_column(column) -> Dict[str, Any]:
+        return {
+            'name': column.column_name,
+            'type': column.type_name,
+            'size': column.column_size,
+            'nullable': column.nullable == 1,
+            'default': column.column_def,
+        }
+    
+    def _run_mdb_schema(self) -> str:
+        """DDL of the whole database from mdb-schema"""
+        result = subprocess.run(
+            ['mdb-schema', str(self.db_path)],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"mdb-schema failed: {result.stderr.strip()}")
+        return result.stdout
+    
+    @staticmethod
+    def _parse_mdb_schema(ddl: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Columns of each CREATE TABLE statement in mdb-schema output"""
+        tables: Dict[str, List[Dict[str, Any]]] = {}
+        create_pattern = re.compile(r'CREATE TABLE\s+(?:\[([^\]]+)\]|(\S+))', re.IGNORECASE)
+        columns = None
+        
+        for line in ddl.split('\n'):
+            stripped = line.strip()
+            
+            # Start of a table
+            create_match = create_pattern.match(stripped)
+            if create_match:
+                table_name = create_match.group(1) or create_match.group(2)
+                columns = tables.setdefault(table_name, [])
+                continue
+            
+            if columns is None:
+                continue
+            
+            # Parse column definition: [Column_Name] Type (Size),
+            col_match = re.match(r'\[([^\]]+)\]\s+(.+)', stripped)
+            if col_match:
+                col_name = col_match.group(1)
+                # Remove trailing comma if present
+                rest = col_match.group(2).strip().rstrip(',')
+                
+                # Extract type and size
+                col_type = 'VARCHAR'
+                col_size = None
+                
+                if 'Text' in rest:
+                    col_type = 'VARCHAR'
+                    size_match = re.search(r'\((\d+)\)', rest)
+                    if size_match:
+                        col_size = int(size_match.group(1))
+                elif 'Long Integer' in rest or 'Integer' in rest:
+                    col_type = 'INTEGER'
+                elif 'DateTime' in rest:
+                    col_type = 'DATETIME'
+                elif 'Double' in rest or 'Decimal' in rest or 'Currency' in rest:
+                    col_type = 'DECIMAL'
+                elif 'Yes/No' in rest or 'Boolean' in rest:
+                    col_type = 'BOOLEAN'
+                
+                columns.append({
+                    'name': col_name,
+                    'type': col_type,
+                    'size': col_size,
+                    'nullable': True,  # mdbtools doesn't show nullability
+                    'default': None,
+                })
+            
+            # Stop when we hit the closing parenthesis
+            if stripped == ');' or (stripped.startswith(')') and ';' in stripped):
+                columns = None
+        
+        return tables
+    
+    def _export_header_columns(self, table_name: str) -> List[Dict[str, Any]]:
+        """Column names from the mdb-export header, for tables mdb-schema couldn't describe"""
         columns = []
         try:
-            # Get schema from mdb-schema command
-            result = subprocess.run(
-                ['mdb-schema', str(self.db_path)],
+            sample_result = subprocess.run(
+                ['mdb-export', '-H', str(self.db_path), table_name],
                 capture_output=True,
                 text=True,
                 timeout=30
             )
-            
-            if result.returncode == 0:
-                # Parse the CREATE TABLE statement for this table
-                import re
-                lines = result.stdout.split('\n')
-                in_table = False
-                table_pattern = re.compile(r'CREATE TABLE\s+\[?' + re.escape(table_name) + r'\]?', re.IGNORECASE)
-                
-                for i, line in enumerate(lines):
-                    stripped = line.strip()
-                    
-                    # Check if this is the start of our table
-                    if table_pattern.search(stripped):
-                        in_table = True
-                        continue
-                    
-                    if in_table:
-                        # Parse column definition: [Column_Name] Type (Size),
-                        if stripped.startswith('[') and ']' in stripped:
-                            # Extract column name: [Column_Name]
-                            col_match = re.match(r'\[([^\]]+)\]\s+(.+)', stripped)
-                            if col_match:
-                                col_name = col_match.group(1)
-                                rest = col_match.group(2).strip()
-                                
-                                # Remove trailing comma if present
-                                rest = rest.rstrip(',')
-                                
-                                # Extract type and size
-                                col_type = 'VARCHAR'
-                                col_size = None
-                                
-                                if 'Text' in rest:
-                                    col_type = 'VARCHAR'
-                                    size_match = re.search(r'\((\d+)\)', rest)
-                                    if size_match:
-                                        col_size = int(size_match.group(1))
-                                elif 'Long Integer' in rest or 'Integer' in rest:
-                                    col_type = 'INTEGER'
-                                elif 'DateTime' in rest:
-                                    col_type = 'DATETIME'
-                                elif 'Double' in rest or 'Decimal' in rest or 'Currency' in rest:
-                                    col_type = 'DECIMAL'
-                                elif 'Yes/No' in rest or 'Boolean' in rest:
-                                    col_type = 'BOOLEAN'
-                                
+            if sample_result.returncode == 0 and sample_result.stdout:
+                # Get first non-empty line as header
+                lines = [l for l in sample_result.stdout.strip().split('\n') if l.strip()]
+                if lines:
+                    reader = csv.reader([lines[0]])
+                    header = next(reader, None)
+                    if header:
+                        for col_name in header:
+                            if col_name.strip():  # Skip empty column names
                                 columns.append({
-                                    'name': col_name,
-                                    'type': col_type,
-                                    'size': col_size,
-                                    'nullable': True,  # mdbtools doesn't show nullability
+                                    'name': col_name.strip(),
+                                    'type': 'VARCHAR',
+                                    'size': None,
+                                    'nullable': True,
                                     'default': None,
                                 })
-                        
-                        # Stop when we hit the closing parenthesis
-                        if stripped == ');' or (stripped.startswith(')') and ';' in stripped):
-                            break
-                        
-                        # Stop if we hit another CREATE TABLE
-                        if stripped.startswith('CREATE TABLE') and not table_pattern.search(stripped):
-                            break
-            
-            # Fallback: if schema parsing failed, try to get column names from export header
-            if not columns:
-                try:
-                    sample_result = subprocess.run(
-                        ['mdb-export', '-H', str(self.db_path), table_name],
-                        capture_output=True,
-                        text=True,
-                        timeout=30
-                    )
-                    if sample_result.returncode == 0 and sample_result.stdout:
-                        # Get first non-empty line as header
-                        lines = [l for l in sample_result.stdout.strip().split('\n') if l.strip()]
-                        if lines:
-                            reader = csv.reader([lines[0]])
-                            header = next(reader, None)
-                            if header:
-                                for col_name in header:
-                                    if col_name.strip():  # Skip empty column names
-                                        columns.append({
-                                            'name': col_name.strip(),
-                                            'type': 'VARCHAR',
-                                            'size': None,
-                                            'nullable': True,
-                                            'default': None,
-                                        })
-                except Exception:
-                    pass
-            
-            return {
-                'table_name': table_name,
-                'columns': columns,
-            }
-        except Exception as e:
-            return {
-                'table_name': table_name,
-                'columns': [],
-            }
+        except Exception:
+            pass
+        return columns
+    
+    def _get_table_schema_mdbtools(self, table_name: str) -> Dict[str, Any]:
+        """Get table schema using mdbtools"""
+        try:
+            columns = self._parse_mdb_schema(self._run_mdb_schema()).get(table_name, [])
+        except Exception:
+            columns = []
+        
+        # Fallback: if schema parsing failed, try to get column names from export header
+        if not columns:
+            columns = self._export_header_columns(table_name)
+        
+        return {
+            'table_name': table_name,
+            'columns': columns,
+        }
     
     def get_record_count(self, table_name: str) -> int:
         """Get number of records in a table"""
-        if self._mdbtools_mode:
-            return self._get_record_count_mdbtools(table_name)
+        if self._mdbtools_mode or table_name in self.cache:
+            # mdb-export has to read the whole table to count it, so count the
+            # shared extraction instead
+            return len(self.fetch_table(table_name))
         
         cursor = self.conn.cursor()
         cursor.execute(f"SELECT COUNT(*) FROM [{table_name}]")
@@ -254,74 +327,137 @@ class AccessConnection:
         cursor.close()
         return count
     
-    def _get_record_count_mdbtools(self, table_name: str) -> int:
-        """Get record count using mdbtools"""
-        try:
-            result = subprocess.run(
-                ['mdb-export', str(self.db_path), table_name],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-            if result.returncode == 0:
-                lines = [l for l in result.stdout.strip().split('\n') if l.strip()]
-                return len(lines) - 1 if lines else 0  # Subtract header
-            return 0
-        except Exception:
-            return 0
-    
-    def fetch_all(self, table_name: str, limit: Optional[int] = None):
-        """Fetch all records from a table"""
+    def fetch_table(self, table_name: str, intern_columns: Optional[List[str]] = None) -> SpooledTable:
+        """
+        Extract a whole table, once per run
+        
+        Rows are streamed from the source into the run's table cache; a table
+        larger than the memory budget is spooled to compressed chunk files as
+        it is read. Later calls for the same table are served from the cache.
+        """
+        table = self.cache.get(table_name)
+        if table is not None:
+            return table
+        
         if self._mdbtools_mode:
-            return self._fetch_all_mdbtools(table_name, limit)
+            schema, rows = self._iter_rows_mdbtools(table_name)
+        else:
+            schema, rows = self._iter_rows_odbc(table_name)
         
-        cursor = self.conn.cursor()
-        query = f"SELECT * FROM [{table_name}]"
-        if limit:
-            query += f" TOP {limit}"
-        cursor.execute(query)
+        intern_columns = intern_columns or self.intern_columns.get(table_name)
+        if intern_columns:
+            positions = [schema.index(col) for col in intern_columns if col in schema]
+            if positions:
+                rows = (intern_values(row, positions) for row in rows)
         
-        # Get column names
-        columns = [column[0] for column in cursor.description]
+        return self.cache.spool(table_name, schema, rows)
+    
+    def fetch_rows(
+        self,
+        table_name: str,
+        limit: Optional[int] = None,
+        intern_columns: Optional[List[str]] = None
+    ) -> Tuple[RowSchema, List[tuple]]:
+        """
+        Fetch all records from a table as positional tuples plus their schema
         
-        # Fetch all rows
-        rows = cursor.fetchall()
+        String values in intern_columns are interned, so repeated categorical
+        values share one object across rows, tables and lookup maps.
+        """
+        if limit and not self._mdbtools_mode and table_name not in self.cache:
+            # A sample doesn't need the whole table
+            return self._fetch_rows_odbc(table_name, limit)
+        
+        table = self.fetch_table(table_name, intern_columns)
+        rows = table.head(limit) if limit else table.to_list()
+        return table.schema, rows
+    
+    def _fetch_rows_odbc(self, table_name: str, limit: int) -> Tuple[RowSchema, List[tuple]]:
+        """Fetch the first limit records as tuples using pyodbc"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT TOP {limit} * FROM [{table_name}]")
+        schema = RowSchema(column[0] for column in cursor.description)
+        rows = [tuple(row) for row in cursor.fetchall()]
         cursor.close()
+        return schema, rows
+    
+    def _iter_rows_odbc(self, table_name: str, chunk_size: int = 10000) -> Tuple[RowSchema, Iterator[tuple]]:
+        """Stream all records as tuples using pyodbc"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT * FROM [{table_name}]")
+        schema = RowSchema(column[0] for column in cursor.description)
         
-        # Convert to list of dicts
-        return [dict(zip(columns, row)) for row in rows]
+        def rows():
+            try:
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        return
+                    for row in chunk:
+                        yield tuple(row)
+            finally:
+                cursor.close()
+        
+        return schema, rows()
     
-    def _fetch_all_mdbtools(self, table_name: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Fetch all records using mdbtools"""
-        try:
-            # Don't use -H flag so we get the header row for DictReader
-            result = subprocess.run(
-                ['mdb-export', str(self.db_path), table_name],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minutes for large tables
-            )
-            if result.returncode == 0:
-                lines = [l for l in result.stdout.strip().split('\n') if l.strip()]
-                if not lines:
-                    return []
-                
-                # Parse CSV with header row
-                reader = csv.DictReader(lines)
-                records = list(reader)
-                
-                if limit:
-                    records = records[:limit]
-                
-                return records
-            return []
-        except Exception as e:
-            return []
+    def _iter_rows_mdbtools(self, table_name: str) -> Tuple[RowSchema, Iterator[tuple]]:
+        """
+        Stream all records as tuples from mdb-export
+        
+        The CSV is parsed as it arrives, so quoted values spanning lines are
+        kept intact and the export is never held in memory as one string.
+        """
+        # stderr goes to a temporary file so a chatty export can't block on a full pipe
+        stderr = tempfile.TemporaryFile(mode='w+')
+        # Don't use -H flag so we get the header row
+        process = subprocess.Popen(
+            ['mdb-export', str(self.db_path), table_name],
+            stdout=subprocess.PIPE,
+            stderr=stderr
+        )
+        # newline='' lets the csv module handle line breaks inside quoted values
+        reader = csv.reader(io.TextIOWrapper(process.stdout, newline=''))
+        header = next(reader, None)
+        if header is None:
+            self._finish_export(process, stderr, table_name)
+            return RowSchema([]), iter(())
+        
+        schema = RowSchema(header)
+        width = len(schema)
+        
+        def rows():
+            try:
+                for row in reader:
+                    if not row or (len(row) == 1 and not row[0].strip()):
+                        continue
+                    # Pad or trim ragged lines to the header width
+                    yield tuple(row) if len(row) == width else tuple((row + [None] * width)[:width])
+            finally:
+                self._finish_export(process, stderr, table_name)
+        
+        return schema, rows()
+    
+    def _finish_export(self, process: subprocess.Popen, stderr, table_name: str):
+        """Wait for mdb-export and raise if it failed"""
+        process.stdout.close()
+        returncode = process.wait()
+        stderr.seek(0)
+        message = stderr.read().strip()
+        stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"mdb-export failed for table {table_name}: {message or returncode}")
+    
+    def fetch_all(self, table_name: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Fetch all records from a table"""
+        schema, rows = self.fetch_rows(table_name, limit)
+        
+        # Convert to list of dicts
+        return [schema.as_dict(row) for row in rows]
     
     def fetch_batch(self, table_name: str, offset: int = 0, batch_size: int = 1000):
         """Fetch a batch of records"""
         if self._mdbtools_mode:
-            all_records = self._fetch_all_mdbtools(table_name)
+            all_records = self.fetch_all(table_name)
             return all_records[offset:offset + batch_size]
         
         cursor = self.conn.cursor()
@@ -342,7 +478,8 @@ class AccessConnection:
         return [dict(zip(columns, row)) for row in batch]
     
     def close(self):
-        """Close the connection"""
+        """Close the connection and drop the table cache"""
+        self.cache.close()
         if self.conn:
             self.conn.close()
     
@@ -353,17 +490,31 @@ class AccessConnection:
         self.close()
 
 
+def quote_ident(name: str) -> str:
+    """Quote an identifier for SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
 class PostgresConnection:
     """Connection to PostgreSQL database (Supabase)"""
     
     def __init__(self, host: str, port: int, database: str, user: str, password: str):
-        self.conn = psycopg2.connect(
-            host=host,
-            port=port,
-            database=database,
-            user=user,
-            password=password
-        )
+        self._connect_args = {
+            'host': host,
+            'port': port,
+            'database': database,
+            'user': user,
+            'password': password,
+        }
+        self.conn = psycopg2.connect(**self._connect_args)
+    
+    def connection_pool(self, max_connections: int) -> ThreadedConnectionPool:
+        """
+        Pool of extra connections to the same database, for queries run in parallel threads
+        
+        The caller closes it with closeall().
+        """
+        return ThreadedConnectionPool(1, max_connections, **self._connect_args)
     
     @classmethod
     def from_connection_string(cls, connection_string: str):
@@ -379,6 +530,19 @@ class PostgresConnection:
             password=parsed.password or ""
         )
     
+    @classmethod
+    def from_config(cls, db_config: Dict[str, Any]):
+        """Create connection from the target_database section of config.yaml"""
+        if 'connection_string' in db_config:
+            return cls.from_connection_string(db_config['connection_string'])
+        return cls(
+            host=db_config.get('host', 'localhost'),
+            port=db_config.get('port', 54322),
+            database=db_config.get('database', 'postgres'),
+            user=db_config.get('user', 'postgres'),
+            password=db_config.get('password', 'postgres')
+        )
+    
     def get_tables(self) -> list:
         """Get list of all tables in the database"""
         cursor = self.conn.cursor()
@@ -394,45 +558,199 @@ class PostgresConnection:
         return tables
     
     def get_table_schema(self, table_name: str) -> Dict[str, Any]:
-        """Get schema information for a table"""
+        """Get schema information for a table, including single-column foreign keys, unique keys and indexes"""
+        return self.get_table_schemas([table_name]).get(table_name, {
+            'table_name': table_name,
+            'columns': [],
+            'foreign_keys': {},
+            'unique_keys': [],
+            'indexes': [],
+        })
+    
+    def get_table_schemas(self, table_names: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Schema information for the public base tables, with one catalog query per kind of object
+        
+        Args:
+            table_names: Tables to describe (all tables if None)
+        
+        Returns:
+            {table_name: {'table_name', 'columns', 'foreign_keys', 'unique_keys', 'indexes'}}
+        """
+        tables = self.get_tables()
+        if table_names is not None:
+            wanted = set(table_names)
+            tables = [table_name for table_name in tables if table_name in wanted]
+        schemas = {
+            table_name: {
+                'table_name': table_name,
+                'columns': [],
+                'foreign_keys': {},
+                'unique_keys': [],
+                'indexes': [],
+            }
+            for table_name in tables
+        }
+        if not schemas:
+            return schemas
+        names = list(schemas)
+        
         cursor = self.conn.cursor()
         cursor.execute("""
             SELECT 
+                table_name::text,
                 column_name,
                 data_type,
                 character_maximum_length,
                 is_nullable,
-                column_default
+                column_default,
+                numeric_precision,
+                numeric_scale
             FROM information_schema.columns
             WHERE table_schema = 'public' 
-            AND table_name = %s
-            ORDER BY ordinal_position
-        """, (table_name,))
-        
-        columns = []
+            AND table_name = ANY(%s)
+            ORDER BY table_name, ordinal_position
+        """, (names,))
         for row in cursor.fetchall():
-            columns.append({
-                'name': row[0],
-                'type': row[1],
-                'size': row[2],
-                'nullable': row[3] == 'YES',
-                'default': row[4],
+            schemas[row[0]]['columns'].append({
+                'name': row[1],
+                'type': row[2],
+                'size': row[3],
+                'nullable': row[4] == 'YES',
+                'default': row[5],
+                'precision': row[6],
+                'scale': row[7],
+            })
+        
+        # Referenced table of each single-column foreign key
+        cursor.execute("""
+            SELECT rel.relname::text, a.attname, ref.relname
+            FROM pg_constraint con
+            JOIN pg_class rel ON rel.oid = con.conrelid
+            JOIN pg_namespace ns ON ns.oid = rel.relnamespace
+            JOIN pg_class ref ON ref.oid = con.confrelid
+            JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = con.conkey[1]
+            WHERE con.contype = 'f'
+            AND ns.nspname = 'public'
+            AND rel.relname = ANY(%s)
+            AND array_length(con.conkey, 1) = 1
+        """, (names,))
+        for table_name, column, ref_table in cursor.fetchall():
+            schemas[table_name]['foreign_keys'][column] = ref_table
+        
+        # Indexes with their columns (expression columns omitted), unique
+        # ones before the primary key
+        cursor.execute("""
+            SELECT
+                rel.relname::text,
+                idx.relname::text,
+                i.indisunique,
+                i.indisprimary,
+                i.indpred IS NOT NULL,
+                0 = ANY(i.indkey::int2[]),
+                ARRAY(
+                    SELECT a.attname::text
+                    FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                    ORDER BY k.ord
+                )
+            FROM pg_index i
+            JOIN pg_class rel ON rel.oid = i.indrelid
+            JOIN pg_class idx ON idx.oid = i.indexrelid
+            JOIN pg_namespace ns ON ns.oid = rel.relnamespace
+            WHERE ns.nspname = 'public'
+            AND rel.relname = ANY(%s)
+            ORDER BY rel.relname, i.indisprimary, i.indexrelid
+        """, (names,))
+        for table_name, index_name, unique, primary, partial, expressions, columns in cursor.fetchall():
+            schemas[table_name]['indexes'].append({
+                'name': index_name,
+                'columns': list(columns),
+                'unique': unique,
+                'primary': primary,
+                'partial': partial,
+                'expressions': expressions,
             })
+            # Columns of each unique key (constraints and plain unique indexes)
+            if unique and not partial and not expressions:
+                schemas[table_name]['unique_keys'].append(list(columns))
         
         cursor.close()
-        return {
-            'table_name': table_name,
-            'columns': columns,
-        }
+        return schemas
     
     def get_record_count(self, table_name: str) -> int:
         """Get number of records in a table"""
         cursor = self.conn.cursor()
-        cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"')
-        count = cursor.fetchone()[0]
-        cursor.close()
+        try:
+            cursor.execute(f'SELECT COUNT(*) FROM {quote_ident(table_name)}')
+            count = cursor.fetchone()[0]
+        except Exception:
+            # Leave the connection usable, e.g. after a missing table
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
         return count
     
+    def get_record_counts(self, table_names: Sequence[str]) -> Dict[str, int]:
+        """Exact record counts of several tables in one round trip (UNION ALL of COUNT(*))"""
+        if not table_names:
+            return {}
+        query = ' UNION ALL '.join(f'SELECT %s, COUNT(*) FROM {quote_ident(table_name)}' for table_name in table_names)
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query, tuple(table_names))
+            counts = {row[0]: row[1] for row in cursor.fetchall()}
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        return counts
+    
+    def get_table_activity(self, table_names: Sequence[str]) -> Dict[str, Dict[str, int]]:
+        """
+        Modification counters of tables (pg_stat_user_tables) and their storage file node
+        
+        The counters only grow until statistics are reset, and the file node
+        changes on TRUNCATE or a table rewrite, so together they change
+        whenever a table's contents may have.
+        """
+        rows = self.fetch_all("""
+            SELECT
+                relname::text AS table_name,
+                n_tup_ins AS inserted,
+                n_tup_upd AS updated,
+                n_tup_del AS deleted,
+                pg_relation_filenode(relid) AS filenode
+            FROM pg_stat_user_tables
+            WHERE schemaname = 'public'
+            AND relname = ANY(%s)
+        """, (list(table_names),))
+        return {row.pop('table_name'): row for row in rows}
+    
+    def estimate_record_counts(self, table_names: Sequence[str]) -> Dict[str, Optional[int]]:
+        """
+        Planner estimates of record counts (pg_class.reltuples), without scanning
+        
+        Tables never vacuumed or analyzed have no estimate (None).
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT rel.relname::text, rel.reltuples
+            FROM pg_class rel
+            JOIN pg_namespace ns ON ns.oid = rel.relnamespace
+            WHERE ns.nspname = 'public'
+            AND rel.relkind IN ('r', 'p')
+            AND rel.relname = ANY(%s)
+        """, (list(table_names),))
+        estimates = {
+            name: int(round(reltuples)) if reltuples >= 0 else None
+            for name, reltuples in cursor.fetchall()
+        }
+        cursor.close()
+        return estimates
+    
     def execute_query(self, query: str, params: Optional[tuple] = None):
         """Execute a query (INSERT, UPDATE, DELETE)"""
         cursor = self.conn.cursor()
@@ -448,6 +766,60 @@ class PostgresConnection:
         finally:
             cursor.close()
     
+    def insert_rows(
+        self,
+        table_name: str,
+        columns: Sequence[str],
+        rows: List[Sequence[Any]],
+        keep_null: Sequence[str] = (),
+        returning: Optional[str] = None,
+        before_commit: Optional[Callable[[Any, Optional[List[Any]]], None]] = None
+    ) -> Optional[List[Any]]:
+        """
+        Insert positional rows in one statement and transaction
+        
+        None values are sent as DEFAULT so the database applies column
+        defaults, except for columns listed in keep_null. Rows that collide
+        with an existing unique key are skipped. before_commit is called with
+        the cursor (and the returned values) so extra statements (e.g. a
+        checkpoint) commit atomically with the rows.
+        
+        Returns:
+            Values of the returning column for the rows actually inserted,
+            or None if no returning column was given
+        """
+        if not rows:
+            return [] if returning else None
+        
+        default = AsIs('DEFAULT')
+        defaulted = [i for i, col in enumerate(columns) if col not in keep_null]
+        values = []
+        for row in rows:
+            row = list(row)
+            for i in defaulted:
+                if row[i] is None:
+                    row[i] = default
+            values.append(row)
+        
+        column_names = ', '.join(f'"{col}"' for col in columns)
+        query = f'INSERT INTO "{table_name}" ({column_names}) VALUES %s ON CONFLICT DO NOTHING'
+        if returning:
+            query += f' RETURNING "{returning}"'
+        
+        cursor = self.conn.cursor()
+        try:
+            result = execute_values(cursor, query, values, page_size=len(values), fetch=bool(returning))
+            returned = [r[0] for r in result] if returning else None
+            if before_commit:
+                before_commit(cursor, returned)
+            self.conn.commit()
+            return returned
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    
     def fetch_one(self, query: str, params: Optional[tuple] = None):
         """Fetch one row"""
         cursor = self.conn.cursor(cursor_factory=RealDictCursor)
@@ -0,0 +1,46 @@
+"""
+Positional row layout shared by every row of a table
+"""
+from typing import Dict, Any, Iterable, Iterator, Optional, Sequence
+
+
+class RowSchema:
+    """Column names and positions for rows carried as plain tuples"""
+    
+    __slots__ = ('columns', 'positions')
+    
+    def __init__(self, columns: Iterable[str]):
+        self.columns = tuple(columns)
+        self.positions: Dict[str, int] = {name: i for i, name in enumerate(self.columns)}
+    
+    def index(self, column: str) -> Optional[int]:
+        """Position of a column, or None if the table doesn't have it"""
+        return self.positions.get(column)
+    
+    def get(self, row: Sequence[Any], column: str, default: Any = None) -> Any:
+        """Value of a column in a positional row"""
+        i = self.positions.get(column)
+        return row[i] if i is not None else default
+    
+    def as_dict(self, row: Sequence[Any]) -> Dict[str, Any]:
+        """Convert a positional row to a dict (for reporting and legacy callers)"""
+        return dict(zip(self.columns, row))
+    
+    def __len__(self) -> int:
+        return len(self.columns)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columns)
+    
+    def __contains__(self, column: object) -> bool:
+        return column in self.positions
+    
+    def __getstate__(self):
+        return {'columns': self.columns}
+    
+    def __setstate__(self, state):
+        self.columns = state['columns']
+        self.positions = {name: i for i, name in enumerate(self.columns)}
+    
+    def __repr__(self) -> str:
+        return f"RowSchema({list(self.columns)!r})"
@@ -0,0 +1,146 @@
+"""
+Read-only foreign key lookup index stored in shared memory
+"""
+import struct
+from array import array
+from collections.abc import Mapping
+from multiprocessing import shared_memory
+from typing import Dict, Any, Iterator
+
+# Header: magic, entry count, key blob length, value blob length
+_HEADER = struct.Struct('<4sIQQ')
+_MAGIC = b'GLKI'
+_OFFSET_SIZE = 8
+
+
+class SharedLookupIndex(Mapping):
+    """
+    Sorted key array plus offsets, held in a shared memory block
+    
+    Layout: header | key offsets (n+1) | value offsets (n+1) | key blob | value blob.
+    Keys are sorted by their UTF-8 bytes so lookups are a binary search over
+    the shared buffer. Pickling an index only sends the block name, so any
+    number of worker processes can attach to it without copying the data.
+    """
+    
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        self._shm = None
+        self._owner = owner
+        
+        buf = shm.buf
+        magic, count, key_len, value_len = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Shared memory block '{shm.name}' is not a lookup index")
+        
+        self._shm = shm
+        self._count = count
+        offsets_len = (count + 1) * _OFFSET_SIZE
+        pos = _HEADER.size
+        self._key_offsets = buf[pos:pos + offsets_len].cast('Q')
+        pos += offsets_len
+        self._value_offsets = buf[pos:pos + offsets_len].cast('Q')
+        pos += offsets_len
+        self._keys = buf[pos:pos + key_len]
+        pos += key_len
+        self._values = buf[pos:pos + value_len]
+    
+    @classmethod
+    def create(cls, mapping: Dict[str, Any]) -> 'SharedLookupIndex':
+        """Build an index from a dict and place it in a new shared memory block"""
+        items = sorted(
+            (str(key).encode('utf-8'), str(value).encode('utf-8'))
+            for key, value in mapping.items()
+        )
+        
+        key_offsets = array('Q', [0])
+        value_offsets = array('Q', [0])
+        for key, value in items:
+            key_offsets.append(key_offsets[-1] + len(key))
+            value_offsets.append(value_offsets[-1] + len(value))
+        
+        key_blob = b''.join(key for key, _ in items)
+        value_blob = b''.join(value for _, value in items)
+        
+        size = (
+            _HEADER.size
+            + len(key_offsets) * _OFFSET_SIZE
+            + len(value_offsets) * _OFFSET_SIZE
+            + len(key_blob)
+            + len(value_blob)
+        )
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        
+        buf = shm.buf
+        _HEADER.pack_into(buf, 0, _MAGIC, len(items), len(key_blob), len(value_blob))
+        pos = _HEADER.size
+        for chunk in (key_offsets.tobytes(), value_offsets.tobytes(), key_blob, value_blob):
+            buf[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        
+        return cls(shm, owner=True)
+    
+    @classmethod
+    def attach(cls, name: str) -> 'SharedLookupIndex':
+        """Attach to an existing index by shared memory block name"""
+        return cls(shared_memory.SharedMemory(name=name))
+    
+    @property
+    def name(self) -> str:
+        return self._shm.name
+    
+    def __reduce__(self):
+        return (SharedLookupIndex.attach, (self._shm.name,))
+    
+    def _key_at(self, i: int) -> bytes:
+        return bytes(self._keys[self._key_offsets[i]:self._key_offsets[i + 1]])
+    
+    def _value_at(self, i: int) -> str:
+        return str(self._values[self._value_offsets[i]:self._value_offsets[i + 1]], 'utf-8')
+    
+    def _find(self, key: Any) -> int:
+        """Binary search for a key, returning its position or -1"""
+        if not isinstance(key, str):
+            return -1
+        target = key.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._key_at(lo) == target:
+            return lo
+        return -1
+    
+    def __getitem__(self, key: str) -> str:
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._value_at(i)
+    
+    def __contains__(self, key: object) -> bool:
+        return self._find(key) >= 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._key_at(i).decode('utf-8')
+    
+    def close(self):
+        """Release this process's view of the block (and remove it if we created it)"""
+        if self._shm is None:
+            return
+        # Views into the buffer must be released before the block can close
+        for view in (self._key_offsets, self._value_offsets, self._keys, self._values):
+            view.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+    
+    def __del__(self):
+        self.close()
+
@@ -0,0 +1,258 @@
+"""
+Run-scoped cache of extracted source tables with a memory budget and disk spill
+"""
+import gzip
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from utils.row_schema import RowSchema
+
+# Rows sampled per chunk when estimating memory use
+_SAMPLE_ROWS = 100
+
+
+def estimate_rows_bytes(rows: List[tuple]) -> int:
+    """Approximate memory held by a list of rows, from a sample of them"""
+    if not rows:
+        return 0
+    step = max(len(rows) // _SAMPLE_ROWS, 1)
+    sample = rows[::step]
+    sample_bytes = sum(sys.getsizeof(row) + sum(map(sys.getsizeof, row)) for row in sample)
+    return sys.getsizeof(rows) + sample_bytes * len(rows) // len(sample)
+
+
+class SpooledTable:
+    """
+    Rows of one extracted table, held in memory or spilled to compressed chunk files
+    
+    Spilled rows are stored as gzip-compressed pickles of chunk_rows rows each
+    and read back one chunk at a time, so iterating a spilled table never
+    holds more than one chunk in memory.
+    """
+    
+    def __init__(self, schema: RowSchema, rows: List[tuple], chunk_rows: int = 10000):
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self._rows: Optional[List[tuple]] = rows
+        # (path, row count) of each spilled chunk
+        self._chunks: List[Tuple[str, int]] = []
+        self._prefix: Optional[str] = None
+        self._count = len(rows)
+        self.nbytes = estimate_rows_bytes(rows)
+    
+    @classmethod
+    def spool(
+        cls,
+        schema: RowSchema,
+        rows: Iterable[tuple],
+        budget_bytes: int,
+        spill_dir: Callable[[], str],
+        chunk_rows: int = 10000
+    ) -> 'SpooledTable':
+        """
+        Build a table from a row stream without holding more than budget_bytes of it
+        
+        Rows are kept in memory until they exceed the budget; from then on
+        every chunk goes straight to disk as it is read.
+        """
+        table = cls(schema, [], chunk_rows)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                table._append_chunk(chunk, budget_bytes, spill_dir)
+                chunk = []
+        if chunk:
+            table._append_chunk(chunk, budget_bytes, spill_dir)
+        return table
+    
+    def _append_chunk(self, chunk: List[tuple], budget_bytes: int, spill_dir: Callable[[], str]):
+        self._count += len(chunk)
+        if self.spilled:
+            self._write_chunk(chunk)
+            return
+        self._rows.extend(chunk)
+        self.nbytes += estimate_rows_bytes(chunk)
+        if self.nbytes > budget_bytes:
+            self.spill(spill_dir())
+    
+    @property
+    def spilled(self) -> bool:
+        return self._rows is None
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def spill(self, directory: str):
+        """Write the rows to chunk files in directory and release them from memory"""
+        if self.spilled:
+            return
+        fd, self._prefix = tempfile.mkstemp(dir=directory)
+        os.close(fd)
+        os.unlink(self._prefix)
+        rows, self._rows = self._rows, None
+        for start in range(0, len(rows), self.chunk_rows):
+            self._write_chunk(rows[start:start + self.chunk_rows])
+    
+    def _write_chunk(self, chunk: List[tuple]):
+        path = f"{self._prefix}.{len(self._chunks)}.pkl.gz"
+        with gzip.open(path, 'wb', compresslevel=1) as f:
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._chunks.append((path, len(chunk)))
+    
+    def iter_chunks(self) -> Iterator[List[tuple]]:
+        """Yield the rows a chunk at a time"""
+        if not self.spilled:
+            yield self._rows
+            return
+        for path, _ in self._chunks:
+            with gzip.open(path, 'rb') as f:
+                yield pickle.load(f)
+    
+    def __iter__(self) -> Iterator[tuple]:
+        for chunk in self.iter_chunks():
+            yield from chunk
+    
+    def iter_rows(self, start: int = 0) -> Iterator[tuple]:
+        """Yield rows from ordinal start on, without reading the chunks before it"""
+        if not self.spilled:
+            yield from islice(self._rows, start, None)
+            return
+        offset = 0
+        for path, count in self._chunks:
+            if offset + count > start:
+                with gzip.open(path, 'rb') as f:
+                    chunk = pickle.load(f)
+                yield from chunk[max(start - offset, 0):]
+            offset += count
+    
+    def iter_batches(self, batch_size: int, start: int = 0) -> Iterator[List[tuple]]:
+        """Yield lists of batch_size rows from ordinal start on"""
+        rows = self.iter_rows(start)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+    
+    def head(self, limit: int) -> List[tuple]:
+        """First limit rows, reading no more chunks than needed"""
+        return list(islice(self.iter_rows(), limit))
+    
+    def to_list(self) -> List[tuple]:
+        """All rows as a list (read back from disk if spilled)"""
+        if not self.spilled:
+            return self._rows
+        return list(self)
+    
+    def close(self):
+        """Remove spilled chunk files"""
+        for path, _ in self._chunks:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._chunks = []
+
+
+class TableCache:
+    """
+    Extracted tables shared by every consumer in one run
+    
+    Tables are kept in memory up to budget_bytes in total. When a new table
+    pushes the total over the budget, the least recently used tables are
+    spilled to disk until it fits again.
+    """
+    
+    def __init__(self, budget_bytes: int, chunk_rows: int = 10000, spill_dir: Optional[str] = None):
+        self.budget_bytes = budget_bytes
+        self.chunk_rows = chunk_rows
+        self._spill_root = spill_dir
+        self._spill_dir: Optional[str] = None
+        self._tables: 'OrderedDict[str, SpooledTable]' = OrderedDict()
+        self.stats: Counter = Counter()
+    
+    @property
+    def memory_bytes(self) -> int:
+        """Estimated memory held by cached tables that aren't spilled"""
+        return sum(t.nbytes for t in self._tables.values() if not t.spilled)
+    
+    def __contains__(self, table_name: object) -> bool:
+        return table_name in self._tables
+    
+    def get(self, table_name: str) -> Optional[SpooledTable]:
+        """Cached table, or None (counted as a hit or miss)"""
+        table = self._tables.get(table_name)
+        if table is None:
+            self.stats['misses'] += 1
+            return None
+        self._tables.move_to_end(table_name)
+        self.stats['hits'] += 1
+        return table
+    
+    def put(self, table_name: str, table: SpooledTable) -> SpooledTable:
+        """Add an extracted table, spilling older tables if over budget"""
+        old = self._tables.pop(table_name, None)
+        if old is not None:
+            old.close()
+        self._tables[table_name] = table
+        self._enforce_budget()
+        return table
+    
+    def spool(self, table_name: str, schema: RowSchema, rows: Iterable[tuple]) -> SpooledTable:
+        """
+        Add a table from a row stream
+        
+        A table larger than the whole budget is written to disk chunk by
+        chunk as it is extracted, so it is never fully held in memory.
+        """
+        table = SpooledTable.spool(
+            schema, rows, self.budget_bytes, lambda: self.spill_dir, self.chunk_rows
+        )
+        if table.spilled:
+            self.stats['spilled'] += 1
+        return self.put(table_name, table)
+    
+    def _enforce_budget(self):
+        """Spill least recently used tables until in-memory tables fit the budget"""
+        in_memory = self.memory_bytes
+        for table in list(self._tables.values()):
+            if in_memory <= self.budget_bytes:
+                break
+            if table.spilled:
+                continue
+            in_memory -= table.nbytes
+            table.spill(self.spill_dir)
+            self.stats['spilled'] += 1
+    
+    @property
+    def spill_dir(self) -> str:
+        """Temporary directory for spilled chunks, created on first use"""
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='migration-spool-', dir=self._spill_root)
+        return self._spill_dir
+    
+    def summary(self) -> Dict[str, Any]:
+        """Hit/miss and spill statistics"""
+        return {
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'tables': len(self._tables),
+            'spilled': self.stats['spilled'],
+            'memory_mb': round(self.memory_bytes / 1024 / 1024, 1),
+        }
+    
+    def close(self):
+        """Drop all cached tables and remove spill files"""
+        for table in self._tables.values():
+            table.close()
+        self._tables.clear()
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
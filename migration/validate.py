@@ -8,30 +8,63 @@ import json
 import argparse
 import yaml
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent))
 
 from utils.db_connection import AccessConnection, PostgresConnection
 from utils.logger import MigrationLogger
+from catalog import CatalogSnapshot
 from state_manager import StateManager
-from mappers import get_table_mapping, TABLE_MAPPINGS
+from reconcile import TableReconciler
+from checksum import RowChecksum, source_checksum, verify_checksum
+from fingerprint import ColumnFingerprinter, format_drift
+from sampling import SampleComparer, format_sample_result
+from integrity import ForeignKeyChecker, RequiredFieldChecker, format_orphans
+from validation_cache import ValidationCache, config_signature, source_file_signature, table_content_hash
+from mappers import get_access_tables, get_table_mapping
+
+# Modules whose code validation results depend on: how rows are mapped and
+# transformed, and how each check reads and compares them
+VALIDATION_CODE_FILES = [
+    'mappers.py', 'transformers.py', 'fk_index.py', 'dedupe.py', 'catalog.py',
+    'validate.py', 'reconcile.py', 'sampling.py', 'fingerprint.py', 'integrity.py',
+    'checksum.py', 'validation_cache.py', 'utils/db_connection.py', 'utils/row_schema.py',
+]
 
 
 class MigrationValidator:
     """Validates migration results"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], fast: bool = False, full: bool = False):
         self.config = config
+        # Counts only, from catalog estimates and cached source counts
+        self.fast = fast
+        # Revalidate every table even if its cached result is still current
+        self.full = full
         self.logger = MigrationLogger(
             log_file=config.get('logging', {}).get('log_file'),
             level=config.get('logging', {}).get('level', 'INFO')
         )
-        self.state = StateManager()
+        self.state = StateManager.from_config(config)
         
         self.access_db = None
         self.postgres_db = None
+        # Tables and columns of both databases, read once per run
+        self.catalog: Optional[CatalogSnapshot] = None
+        
+        # Foreign key and required field check results per destination table,
+        # computed for all tables at once
+        self.fk_results: Dict[str, List[Dict[str, Any]]] = {}
+        self.null_results: Dict[str, Dict[str, Any]] = {}
+        # Exact destination record counts, fetched for all tables at once
+        self.dest_counts: Dict[str, int] = {}
+        
+        # Results of unchanged tables from earlier runs, and the current
+        # (source, destination) fingerprints of each table
+        self.cache: Optional[ValidationCache] = None
+        self.table_fingerprints: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
         
         self.validation_results: Dict[str, Any] = {
             'validated_at': datetime.now().isoformat(),
@@ -45,24 +78,17 @@ class MigrationValidator:
         
         # Access
         db_path = self.config.get('source_database')
-        self.access_db = AccessConnection(db_path)
+        self.access_db = AccessConnection(
+            db_path,
+            cache_budget_mb=self.config.get('migration', {}).get('memory_budget_mb', 512)
+        )
         self.logger.success("Connected to Access database")
         
         # PostgreSQL
-        db_config = self.config.get('target_database', {})
-        if 'connection_string' in db_config:
-            self.postgres_db = PostgresConnection.from_connection_string(
-                db_config['connection_string']
-            )
-        else:
-            self.postgres_db = PostgresConnection(
-                host=db_config.get('host', 'localhost'),
-                port=db_config.get('port', 54322),
-                database=db_config.get('database', 'postgres'),
-                user=db_config.get('user', 'postgres'),
-                password=db_config.get('password', 'postgres')
-            )
+        self.postgres_db = PostgresConnection.from_config(self.config.get('target_database', {}))
         self.logger.success("Connected to PostgreSQL database")
+        
+        self.catalog = CatalogSnapshot.take(self.access_db, self.postgres_db)
     
     def validate_table(self, access_table: str, dest_table: str) -> Dict[str, Any]:
         """Validate a single table migration"""
@@ -79,7 +105,9 @@ class MigrationValidator:
         try:
             # Get record counts
             source_count = self.access_db.get_record_count(access_table)
-            dest_count = self.postgres_db.get_record_count(dest_table)
+            dest_count = self.dest_counts.get(dest_table)
+            if dest_count is None:
+                dest_count = self.postgres_db.get_record_count(dest_table)
             
             result['source_count'] = source_count
             result['dest_count'] = dest_count
@@ -92,27 +120,69 @@ class MigrationValidator:
                 )
                 result['valid'] = False
             
-            # Sample data comparison (first 10 records)
-            self.logger.info(f"  Comparing sample data...")
-            source_samples = self.access_db.fetch_all(access_table, limit=10)
-            dest_samples = self.postgres_db.fetch_all(
-                f'SELECT * FROM "{dest_table}" LIMIT 10'
-            )
+            # Compare the checksums recorded at migration time with both sides
+            if self.config.get('validation', {}).get('checksum', True):
+                checksum = self._verify_checksum(access_table, dest_table)
+                if checksum is not None:
+                    result['checksum'] = checksum
+                    if not checksum['match']:
+                        result['errors'].append(
+                            f"Checksum mismatch on ({', '.join(checksum['columns'])}): {checksum['expected']} "
+                            f"recorded at migration, {checksum['actual']} now (rows:sum)"
+                        )
+                        result['valid'] = False
+                    if checksum.get('source_changed'):
+                        result['warnings'].append("Source rows changed since the table was migrated")
             
-            result['sample_comparison'] = {
-                'source_samples': len(source_samples),
-                'dest_samples': len(dest_samples),
-            }
+            # Compare the data itself, drilling into mismatching hash buckets
+            if self.config.get('validation', {}).get('reconcile', True):
+                self.logger.info(f"  Reconciling data...")
+                reconciliation = self._reconcile(access_table, dest_table)
+                result['reconciliation'] = reconciliation
+                for issue in self._reconciliation_errors(reconciliation):
+                    result['errors'].append(issue)
+                    result['valid'] = False
+            
+            # Compare a stratified random sample of rows value by value
+            if self.config.get('validation', {}).get('sample_diff', True):
+                self.logger.info(f"  Comparing sampled rows...")
+                sample_result = self._compare_sample(access_table, dest_table)
+                result['sample'] = sample_result
+                sample_errors = format_sample_result(dest_table, sample_result)
+                if sample_errors:
+                    result['errors'].extend(sample_errors)
+                    result['valid'] = False
+            
+            # Compare per-column aggregates (sums, date ranges, NULLs, lengths)
+            if self.config.get('validation', {}).get('fingerprint', True):
+                self.logger.info(f"  Fingerprinting columns...")
+                fingerprint = ColumnFingerprinter(
+                    self.access_db, self.postgres_db, access_table, dest_table, catalog=self.catalog
+                ).run()
+                result['fingerprint'] = fingerprint
+                for column, column_fingerprint in fingerprint.get('columns', {}).items():
+                    drift = format_drift(dest_table, column, column_fingerprint)
+                    if drift:
+                        result['warnings'].extend(drift)
+                        result['valid'] = False
             
-            # Check foreign key integrity
-            self.logger.info(f"  Checking foreign key integrity...")
+            # Foreign key integrity (checked for all tables up front)
+            result['foreign_keys'] = [
+                {
+                    'columns': fk['columns'],
+                    'references': f"{fk['ref_table']}({', '.join(fk['ref_columns'])})",
+                    'orphans': fk['orphans'],
+                    'sample': fk['sample'],
+                }
+                for fk in self.fk_results.get(dest_table, [])
+                if 'error' not in fk
+            ]
             fk_errors = self._check_foreign_keys(dest_table)
             if fk_errors:
                 result['errors'].extend(fk_errors)
                 result['valid'] = False
             
-            # Check for required fields
-            self.logger.info(f"  Checking required fields...")
+            # Required fields (checked for all tables up front)
             required_errors = self._check_required_fields(dest_table)
             if required_errors:
                 result['errors'].extend(required_errors)
@@ -122,98 +192,133 @@ class MigrationValidator:
                 self.logger.success(f"  ✓ {dest_table} validation passed")
             else:
                 self.logger.warning(f"  ⚠ {dest_table} validation has issues")
-            
+        
         except Exception as e:
             result['valid'] = False
+            result['incomplete'] = True
             result['errors'].append(f"Validation error: {e}")
             self.logger.error(f"  ✗ Error validating {dest_table}: {e}")
         
         return result
     
-    def _check_foreign_keys(self, table_name: str) -> List[str]:
-        """Check foreign key integrity"""
-        errors = []
+    def _verify_checksum(self, access_table: str, dest_table: str) -> Optional[Dict[str, Any]]:
+        """
+        Compare a table with the checksums the migration recorded
         
-        # Get foreign key constraints for this table
-        try:
-            query = """
-                SELECT
-                    tc.constraint_name,
-                    kcu.column_name,
-                    ccu.table_name AS foreign_table_name,
-                    ccu.column_name AS foreign_column_name
-                FROM information_schema.table_constraints AS tc
-                JOIN information_schema.key_column_usage AS kcu
-                    ON tc.constraint_name = kcu.constraint_name
-                JOIN information_schema.constraint_column_usage AS ccu
-                    ON ccu.constraint_name = tc.constraint_name
-                WHERE tc.constraint_type = 'FOREIGN KEY'
-                    AND tc.table_name = %s
-            """
-            fks = self.postgres_db.fetch_all(query, (table_name,))
-            
-            for fk in fks:
-                column = fk['column_name']
-                foreign_table = fk['foreign_table_name']
-                foreign_column = fk['foreign_column_name']
-                
-                # Check for orphaned foreign keys
-                orphan_query = f"""
-                    SELECT COUNT(*) as count
-                    FROM "{table_name}" t
-                    LEFT JOIN "{foreign_table}" f ON t."{column}" = f."{foreign_column}"
-                    WHERE t."{column}" IS NOT NULL
-                    AND f."{foreign_column}" IS NULL
-                """
-                orphan_result = self.postgres_db.fetch_one(orphan_query)
-                
-                if orphan_result and orphan_result.get('count', 0) > 0:
-                    errors.append(
-                        f"Orphaned foreign keys in {table_name}.{column} -> {foreign_table}.{foreign_column}: "
-                        f"{orphan_result['count']} records"
-                    )
+        The loaded-row checksum is compared with one aggregate query over the
+        destination, and the source checksum with the source rows as they are now.
         
-        except Exception as e:
-            errors.append(f"Could not check foreign keys: {e}")
-        
-        return errors
+        Returns:
+            The comparison, or None if the migration recorded no checksum
+        """
+        recorded = self.state.get_table_state(dest_table).get('checksum')
+        checksum = verify_checksum(self.postgres_db, dest_table, self.catalog.dest_schema(dest_table), recorded)
+        if checksum is not None and recorded.get('source'):
+            current = source_checksum(self.access_db.fetch_table(access_table))
+            checksum['source_changed'] = current != RowChecksum.from_dict(recorded['source'])
+        return checksum
     
-    def _check_required_fields(self, table_name: str) -> List[str]:
-        """Check that required (non-nullable) fields are populated"""
+    def _reconcile(self, access_table: str, dest_table: str) -> Dict[str, Any]:
+        """Reconcile a table's source and destination rows (see TableReconciler)"""
+        validation_config = self.config.get('validation', {})
+        reconciler = TableReconciler(
+            self.access_db,
+            self.postgres_db,
+            access_table,
+            dest_table,
+            buckets=validation_config.get('reconcile_buckets', 256),
+            leaf_rows=validation_config.get('reconcile_leaf_rows', 64),
+            sample_size=validation_config.get('sample_records', 10),
+            catalog=self.catalog
+        )
+        return reconciler.run()
+    
+    def _compare_sample(self, access_table: str, dest_table: str) -> Dict[str, Any]:
+        """Compare a sample of a table's rows with the destination (see SampleComparer)"""
+        validation_config = self.config.get('validation', {})
+        comparer = SampleComparer(
+            self.access_db,
+            self.postgres_db,
+            access_table,
+            dest_table,
+            confidence=validation_config.get('sample_confidence', 0.95),
+            margin=validation_config.get('sample_margin', 0.05),
+            date_column=validation_config.get('sample_strata', {}).get(access_table),
+            period=validation_config.get('sample_period', 'year'),
+            sample_size=validation_config.get('sample_records', 10),
+            catalog=self.catalog
+        )
+        return comparer.run()
+    
+    @staticmethod
+    def _reconciliation_errors(reconciliation: Dict[str, Any]) -> List[str]:
+        """Describe the rows that differ between source and destination"""
+        samples = reconciliation.get('samples', {})
+        descriptions = {
+            'missing': "rows missing from destination",
+            'unexpected': "rows in destination but not in source",
+            'changed': "rows with different values",
+        }
         errors = []
-        
+        for kind, description in descriptions.items():
+            count = reconciliation.get(kind)
+            if count:
+                message = f"Reconciliation: {count} {description}"
+                if samples.get(kind):
+                    message += f" (e.g. {'; '.join(samples[kind])})"
+                errors.append(message)
+        return errors
+    
+    def _check_all_foreign_keys(self, tables: List[str]):
+        """Check the foreign keys of all tables at once, concurrently"""
+        validation_config = self.config.get('validation', {})
+        checker = ForeignKeyChecker(
+            self.postgres_db,
+            workers=validation_config.get('workers', 4),
+            sample_size=validation_config.get('orphan_samples', 5)
+        )
         try:
-            # Get non-nullable columns
-            query = """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema = 'public'
-                    AND table_name = %s
-                    AND is_nullable = 'NO'
-                    AND column_default IS NULL
-            """
-            required_cols = self.postgres_db.fetch_all(query, (table_name,))
-            
-            for col in required_cols:
-                col_name = col['column_name']
-                # Skip auto-generated fields
-                if col_name in ['id', 'created_at', 'updated_at']:
-                    continue
-                
-                # Check for NULL values
-                null_query = f'SELECT COUNT(*) as count FROM "{table_name}" WHERE "{col_name}" IS NULL'
-                null_result = self.postgres_db.fetch_one(null_query)
-                
-                if null_result and null_result.get('count', 0) > 0:
-                    errors.append(
-                        f"Required field {table_name}.{col_name} has {null_result['count']} NULL values"
-                    )
-        
+            self.fk_results = checker.check(tables)
         except Exception as e:
-            errors.append(f"Could not check required fields: {e}")
-        
+            self.logger.error(f"Could not check foreign keys: {e}")
+            self.fk_results = {table: [{'error': str(e)}] for table in tables}
+    
+    def _check_foreign_keys(self, table_name: str) -> List[str]:
+        """Foreign key integrity errors for a table (from _check_all_foreign_keys)"""
+        errors = []
+        for fk in self.fk_results.get(table_name, []):
+            if 'error' in fk:
+                errors.append(f"Could not check foreign keys: {fk['error']}")
+            elif fk['orphans']:
+                errors.append(format_orphans(fk))
         return errors
     
+    def _check_all_required_fields(self, tables: List[str]):
+        """Count NULLs in required fields, one scan per table, tables in parallel"""
+        checker = RequiredFieldChecker(
+            self.postgres_db,
+            workers=self.config.get('validation', {}).get('workers', 4),
+            catalog=self.catalog
+        )
+        try:
+            self.null_results = checker.check(tables)
+        except Exception as e:
+            self.logger.error(f"Could not check required fields: {e}")
+            self.null_results = {table: {'error': str(e)} for table in tables}
+    
+    def _check_required_fields(self, table_name: str) -> List[str]:
+        """Required field errors for a table (from _check_all_required_fields)"""
+        result = self.null_results.get(table_name)
+        if not result:
+            return []
+        if 'error' in result:
+            return [f"Could not check required fields: {result['error']}"]
+        return [
+            f"Required field {table_name}.{col_name} has {count} NULL values"
+            for col_name, count in result['nulls'].items()
+            if count
+        ]
+    
     def validate_all(self) -> Dict[str, Any]:
         """Validate all migrated tables"""
         self.logger.info("=" * 60)
@@ -223,32 +328,71 @@ class MigrationValidator:
         # Connect to databases
         self.connect_databases()
         
-        # Get tables to validate
-        tables_to_validate = self.config.get('tables', [])
-        if not tables_to_validate:
-            tables_to_validate = list(TABLE_MAPPINGS.keys())
+        # Get tables to validate (config.yaml lists destination table names)
+        tables_to_validate, unknown = get_access_tables(self.config.get('tables', []))
+        for table_name in unknown:
+            self.logger.warning(f"Table '{table_name}' not found in mappings, skipping")
         
-        # Validate each table
         all_valid = True
-        for access_table in tables_to_validate:
-            dest_table = get_table_mapping(access_table)
-            result = self.validate_table(access_table, dest_table)
-            self.validation_results['tables'][dest_table] = result
+        if self.fast:
+            self.logger.info("Comparing record counts (fast mode)...")
+            for dest_table, result in self._validate_counts_fast(tables_to_validate).items():
+                self.validation_results['tables'][dest_table] = result
+                if not result['valid']:
+                    all_valid = False
+        else:
+            # Reuse the results of tables unchanged on both sides since they were validated
+            cached_results: Dict[str, Dict[str, Any]] = {}
+            if self.config.get('validation', {}).get('incremental', True):
+                cached_results = self._load_cached_results(tables_to_validate)
+            dest_tables = [
+                get_table_mapping(access_table) for access_table in tables_to_validate
+                if get_table_mapping(access_table) not in cached_results
+            ]
+            
+            if dest_tables:
+                # Check every foreign key in parallel before the per-table checks
+                self.logger.info("Checking foreign key integrity...")
+                self._check_all_foreign_keys(dest_tables)
+                self.logger.info("Checking required fields...")
+                self._check_all_required_fields(dest_tables)
+                self.logger.info("Counting destination records...")
+                try:
+                    self.dest_counts = self.postgres_db.get_record_counts(dest_tables)
+                except Exception as e:
+                    self.logger.warning(f"Could not count destination records in one query: {e}")
+            
+            # Validate each table
+            for access_table in tables_to_validate:
+                dest_table = get_table_mapping(access_table)
+                if dest_table in cached_results:
+                    result = cached_results[dest_table]
+                    self.logger.info(f"Unchanged since {result['validated_at']}: {access_table} -> {dest_table}")
+                else:
+                    result = self.validate_table(access_table, dest_table)
+                    if self.cache is not None and dest_table in self.table_fingerprints and not result.get('incomplete'):
+                        self.cache.store(dest_table, *self.table_fingerprints[dest_table], result)
+                self.validation_results['tables'][dest_table] = result
+                
+                if not result['valid']:
+                    all_valid = False
             
-            if not result['valid']:
-                all_valid = False
+            if self.cache is not None:
+                self.cache.save()
         
         # Generate summary
         total_tables = len(self.validation_results['tables'])
+        cached_tables = sum(1 for t in self.validation_results['tables'].values() if t.get('cached'))
         valid_tables = sum(1 for t in self.validation_results['tables'].values() if t['valid'])
-        total_source_records = sum(t.get('source_count', 0) for t in self.validation_results['tables'].values())
-        total_dest_records = sum(t.get('dest_count', 0) for t in self.validation_results['tables'].values())
+        total_source_records = sum(t.get('source_count') or 0 for t in self.validation_results['tables'].values())
+        total_dest_records = sum(t.get('dest_count') or 0 for t in self.validation_results['tables'].values())
         total_errors = sum(len(t.get('errors', [])) for t in self.validation_results['tables'].values())
         total_warnings = sum(len(t.get('warnings', [])) for t in self.validation_results['tables'].values())
         
         self.validation_results['summary'] = {
             'all_valid': all_valid,
             'total_tables': total_tables,
+            'cached_tables': cached_tables,
             'valid_tables': valid_tables,
             'total_source_records': total_source_records,
             'total_dest_records': total_dest_records,
@@ -258,6 +402,167 @@ class MigrationValidator:
         
         return self.validation_results
     
+    def _load_cached_results(self, access_tables: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fingerprint each table and return the cached results still current
+        
+        A result is reused if the source table and the destination table and
+        the tables it references are unchanged since it was computed (see
+        ValidationCache). With --full every table is revalidated, and the
+        cache is refreshed.
+        
+        Returns:
+            Cached result per destination table
+        """
+        validation_config = self.config.get('validation', {})
+        code_dir = Path(__file__).parent
+        self.cache = ValidationCache(
+            Path(validation_config.get('cache_file', 'reports/validation-cache.json')),
+            config_signature(self.config, [code_dir / name for name in VALIDATION_CODE_FILES])
+        )
+        
+        try:
+            file_signature = source_file_signature(self.access_db.db_path)
+            dependencies = {}
+            for access_table in access_tables:
+                dest_table = get_table_mapping(access_table)
+                references = self.catalog.dest_schema(dest_table).get('foreign_keys', {}).values()
+                dependencies[access_table] = sorted({dest_table, *references})
+            activity = self.postgres_db.get_table_activity(
+                sorted({table for tables in dependencies.values() for table in tables})
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not fingerprint tables, validating all of them: {e}")
+            return {}
+        
+        cached_results = {}
+        for access_table in access_tables:
+            dest_table = get_table_mapping(access_table)
+            try:
+                source, source_unchanged = self.cache.source_fingerprint(
+                    dest_table,
+                    file_signature,
+                    lambda: table_content_hash(self.access_db.fetch_table(access_table))
+                )
+            except Exception as e:
+                self.logger.warning(f"Could not fingerprint source table {access_table}: {e}")
+                continue
+            dest = {table: activity.get(table) for table in dependencies[access_table]}
+            self.table_fingerprints[dest_table] = (source, dest)
+            if not self.full and source_unchanged and self.cache.dest_unchanged(dest_table, dest):
+                cached_results[dest_table] = self.cache.result(dest_table)
+        
+        if cached_results:
+            self.logger.info(
+                f"Reusing {len(cached_results)} cached results; validating "
+                f"{len(access_tables) - len(cached_results)} changed tables"
+            )
+        return cached_results
+    
+    def _cached_source_count(self, access_table: str, dest_table: str) -> Tuple[int, str]:
+        """
+        Source record count recorded by the migration, or an exact count
+        
+        The recorded count is used only if the source database file hasn't
+        been modified since it was taken.
+        
+        Returns:
+            (count, 'cached' or 'exact')
+        """
+        table_state = self.state.get_table_state(dest_table)
+        count = table_state.get('source_count')
+        counted_at = table_state.get('source_counted_at')
+        if count is not None and counted_at:
+            modified = datetime.fromtimestamp(self.access_db.db_path.stat().st_mtime)
+            if modified <= datetime.fromisoformat(counted_at):
+                return count, 'cached'
+        return self.access_db.get_record_count(access_table), 'exact'
+    
+    def _validate_counts_fast(self, access_tables: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Compare record counts using catalog estimates and cached source counts
+        
+        Destination counts are estimated from pg_class.reltuples. Tables
+        without an estimate, or whose estimate differs from the source count
+        by more than validation.fast_count_tolerance, are counted exactly,
+        all in one query.
+        
+        Returns:
+            Validation result per destination table
+        """
+        tolerance = self.config.get('validation', {}).get('fast_count_tolerance', 0.02)
+        dest_tables = {access_table: get_table_mapping(access_table) for access_table in access_tables}
+        estimates = self.postgres_db.estimate_record_counts(list(dest_tables.values()))
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        for access_table, dest_table in dest_tables.items():
+            result = {
+                'access_table': access_table,
+                'dest_table': dest_table,
+                'valid': True,
+                'errors': [],
+                'warnings': [],
+                'dest_count': estimates.get(dest_table),
+                'dest_count_method': 'estimate',
+            }
+            try:
+                result['source_count'], result['source_count_method'] = \
+                    self._cached_source_count(access_table, dest_table)
+            except Exception as e:
+                result['valid'] = False
+                result['errors'].append(f"Could not count source records: {e}")
+            results[dest_table] = result
+        
+        diverging = [
+            dest_table for dest_table, result in results.items()
+            if 'source_count' in result and (
+                result['dest_count'] is None
+                or abs(result['dest_count'] - result['source_count']) > tolerance * max(result['source_count'], 1)
+            )
+        ]
+        if diverging:
+            self.logger.info(f"Counting {len(diverging)} tables exactly (estimates missing or off)")
+            try:
+                exact_counts = self.postgres_db.get_record_counts(diverging)
+            except Exception as e:
+                # One missing table fails the whole query; count the tables one at a time
+                self.logger.warning(f"Could not count destination records in one query: {e}")
+                exact_counts = {}
+                for dest_table in diverging:
+                    try:
+                        exact_counts[dest_table] = self.postgres_db.get_record_count(dest_table)
+                    except Exception as e:
+                        results[dest_table]['valid'] = False
+                        results[dest_table]['errors'].append(f"Could not count destination records: {e}")
+            for dest_table, count in exact_counts.items():
+                results[dest_table]['dest_count'] = count
+                results[dest_table]['dest_count_method'] = 'exact'
+        
+        for dest_table, result in results.items():
+            if 'source_count' not in result or result['errors']:
+                if result['errors']:
+                    self.logger.warning(f"  ⚠ {dest_table} count check has issues")
+                continue
+            source_count = result['source_count']
+            dest_count = result['dest_count']
+            # Estimates are only checked to be within the tolerance
+            result['count_match'] = dest_table not in diverging or source_count == dest_count
+            if not result['count_match']:
+                result['warnings'].append(
+                    f"Record count mismatch: source={source_count}, dest={dest_count} "
+                    f"(diff: {abs(source_count - dest_count)})"
+                )
+                result['valid'] = False
+            
+            if result['valid']:
+                self.logger.success(
+                    f"  ✓ {dest_table}: {dest_count:,} records ({result['dest_count_method']})"
+                )
+            else:
+                self.logger.warning(f"  ⚠ {dest_table} count check has issues")
+        
+        return results
+    
     def print_report(self):
         """Print validation report"""
         summary = self.validation_results['summary']
@@ -272,6 +577,8 @@ class MigrationValidator:
             self.logger.error("✗ Some validations failed")
         
         self.logger.info(f"\nTables validated: {summary['total_tables']}")
+        if summary.get('cached_tables'):
+            self.logger.info(f"  Unchanged (cached results): {summary['cached_tables']}")
         self.logger.info(f"  Valid: {summary['valid_tables']}")
         self.logger.info(f"  Issues: {summary['total_tables'] - summary['valid_tables']}")
         self.logger.info(f"\nRecords:")
@@ -288,9 +595,11 @@ class MigrationValidator:
         
         for table_name, result in self.validation_results['tables'].items():
             status = "✓" if result['valid'] else "✗"
-            self.logger.info(f"\n{status} {table_name}")
+            cached = f" (unchanged since {result['validated_at']})" if result.get('cached') else ""
+            self.logger.info(f"\n{status} {table_name}{cached}")
             self.logger.info(f"  Source: {result.get('source_count', 0):,} records")
-            self.logger.info(f"  Dest: {result.get('dest_count', 0):,} records")
+            method = f" ({result['dest_count_method']})" if result.get('dest_count_method') else ""
+            self.logger.info(f"  Dest: {result.get('dest_count') or 0:,} records{method}")
             
             if result.get('errors'):
                 for error in result['errors']:
@@ -327,6 +636,17 @@ def main():
         help='Output file for validation report'
     )
     
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Revalidate every table, ignoring cached results of unchanged tables'
+    )
+    parser.add_argument(
+        '--fast',
+        action='store_true',
+        help='Compare record counts only, using catalog estimates and cached source counts'
+    )
+    
     args = parser.parse_args()
     
     # Load config
@@ -339,7 +659,7 @@ def main():
         config = yaml.safe_load(f)
     
     # Run validation
-    validator = MigrationValidator(config)
+    validator = MigrationValidator(config, fast=args.fast, full=args.full)
     validator.validate_all()
     validator.print_report()
     validator.save_report(args.output)
@@ -0,0 +1,114 @@
+"""
+Validation results cached with the source and destination fingerprints they were computed for
+"""
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterable, Tuple
+
+from utils.table_cache import SpooledTable
+
+
+def config_signature(config: Dict[str, Any], code_files: Iterable[Path]) -> str:
+    """
+    Hash of what validation results depend on besides the data
+    
+    The validation settings and the code that maps and transforms rows;
+    results cached under another signature are discarded.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(config.get('validation', {}), sort_keys=True, default=str).encode('utf-8'))
+    for path in code_files:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def source_file_signature(db_path: Path) -> str:
+    """Size and modification time of the source database file"""
+    stat = db_path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def table_content_hash(table: SpooledTable) -> str:
+    """Hash of an extracted table's rows, in extraction order"""
+    digest = hashlib.blake2b(digest_size=16)
+    for row in table:
+        digest.update(repr(row).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class ValidationCache:
+    """
+    Per-table validation results, reused while neither side of the table has changed
+    
+    Each entry holds a table's last result together with:
+    - the source fingerprint: the .mdb file's size and mtime, plus a hash of
+      the table's rows (an Access file is often rewritten without the table
+      changing, so a moved file signature falls back to the content hash)
+    - the destination fingerprints of the table and of the tables its
+      foreign keys reference (whose changes can orphan its rows): the
+      pg_stat_user_tables insert/update/delete counters and the file node
+    """
+    
+    def __init__(self, path: Path, signature: str):
+        self.path = Path(path)
+        self.signature = signature
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            if data.get('signature') == signature:
+                self.entries = data.get('tables', {})
+    
+    def source_fingerprint(
+        self,
+        dest_table: str,
+        file_signature: str,
+        content_hash: Callable[[], str]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Current source fingerprint of a table, and whether it matches the cached one
+        
+        content_hash (which reads the table) is only called when the file
+        signature has moved since the cached result. If the content still
+        matches, the cached entry takes the new file signature, so the table
+        isn't read again on the next run.
+        """
+        entry = self.entries.get(dest_table)
+        if entry is not None and entry['source']['file'] == file_signature:
+            return dict(entry['source']), True
+        fingerprint = {'file': file_signature, 'content': content_hash()}
+        unchanged = entry is not None and entry['source'].get('content') == fingerprint['content']
+        if unchanged:
+            entry['source'] = dict(fingerprint)
+        return fingerprint, unchanged
+    
+    def dest_unchanged(self, dest_table: str, fingerprints: Dict[str, Any]) -> bool:
+        """Whether the destination fingerprints of the table and its references are unchanged"""
+        entry = self.entries.get(dest_table)
+        return entry is not None and entry['dest'] == fingerprints
+    
+    def result(self, dest_table: str) -> Dict[str, Any]:
+        """Cached result of a table, marked as such"""
+        entry = self.entries[dest_table]
+        return dict(entry['result'], cached=True, validated_at=entry['validated_at'])
+    
+    def store(self, dest_table: str, source: Dict[str, Any], dest: Dict[str, Any], result: Dict[str, Any]):
+        self.entries[dest_table] = {
+            'source': source,
+            'dest': dest,
+            'result': result,
+            'validated_at': datetime.now().isoformat(),
+        }
+    
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'signature': self.signature, 'tables': self.entries}, f, indent=2, default=str)
+        tmp_path.replace(self.path)
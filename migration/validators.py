@@ -1,7 +1,12 @@
 """
 Schema validation functions for pre-migration checks
 """
+from collections import Counter
 from typing import Dict, Any, List, Optional
+from catalog import CatalogSnapshot
+from sampling import stratified_sample
+from transform_pool import compile_row_plan
+from transformers import collect_field_errors, transform_row
 from utils.db_connection import AccessConnection, PostgresConnection
 from utils.logger import MigrationLogger
 
@@ -9,26 +14,39 @@ from utils.logger import MigrationLogger
 class SchemaValidator:
     """Validates source and destination schemas before migration"""
     
-    def __init__(self, access_db: AccessConnection, postgres_db: PostgresConnection, logger: MigrationLogger):
+    def __init__(
+        self,
+        access_db: AccessConnection,
+        postgres_db: PostgresConnection,
+        logger: MigrationLogger,
+        catalog: Optional[CatalogSnapshot] = None
+    ):
         self.access_db = access_db
         self.postgres_db = postgres_db
         self.logger = logger
+        self._catalog = catalog
         self.errors: List[str] = []
         self.warnings: List[str] = []
     
+    @property
+    def catalog(self) -> CatalogSnapshot:
+        """Catalog snapshot of both databases (taken on first use if none was given)"""
+        if self._catalog is None:
+            self._catalog = CatalogSnapshot.take(self.access_db, self.postgres_db)
+        return self._catalog
+    
     def validate_source_schema(self, table_name: str, required_columns: List[str]) -> bool:
         """Validate source table schema"""
         self.logger.info(f"Validating source table: {table_name}")
         
         try:
             # Check if table exists
-            tables = self.access_db.get_tables()
-            if table_name not in tables:
+            if table_name not in self.catalog.source:
                 self.errors.append(f"Source table '{table_name}' not found")
                 return False
             
             # Get table schema
-            schema = self.access_db.get_table_schema(table_name)
+            schema = self.catalog.source_schema(table_name)
             
             # Check required columns
             column_names = [col['name'] for col in schema['columns']]
@@ -50,7 +68,7 @@ class SchemaValidator:
             
             self.logger.success(f"Source table '{table_name}' validated")
             return True
-            
+        
         except Exception as e:
             self.errors.append(f"Error validating source table '{table_name}': {e}")
             return False
@@ -61,8 +79,7 @@ class SchemaValidator:
         
         try:
             # Check if table exists
-            tables = self.postgres_db.get_tables()
-            if table_name not in tables:
+            if table_name not in self.catalog.dest:
                 self.errors.append(
                     f"Destination table '{table_name}' not found. "
                     "Run Prisma migrations first: npx prisma migrate dev"
@@ -70,7 +87,7 @@ class SchemaValidator:
                 return False
             
             # Get table schema
-            schema = self.postgres_db.get_table_schema(table_name)
+            schema = self.catalog.dest_schema(table_name)
             
             # Check required columns
             column_names = [col['name'] for col in schema['columns']]
@@ -84,7 +101,7 @@ class SchemaValidator:
             
             self.logger.success(f"Destination table '{table_name}' validated")
             return True
-            
+        
         except Exception as e:
             self.errors.append(f"Error validating destination table '{table_name}': {e}")
             return False
@@ -100,8 +117,8 @@ class SchemaValidator:
         
         try:
             # Get schemas
-            source_schema = self.access_db.get_table_schema(source_table)
-            dest_schema = self.postgres_db.get_table_schema(dest_table)
+            source_schema = self.catalog.source_schema(source_table)
+            dest_schema = self.catalog.dest_schema(dest_table)
             
             source_columns = {col['name']: col for col in source_schema['columns']}
             dest_columns = {col['name']: col for col in dest_schema['columns']}
@@ -122,7 +139,7 @@ class SchemaValidator:
             
             self.logger.success(f"Field mappings validated: {source_table} -> {dest_table}")
             return True
-            
+        
         except Exception as e:
             self.errors.append(f"Error validating field mappings: {e}")
             return False
@@ -130,37 +147,51 @@ class SchemaValidator:
     def validate_data_compatibility(
         self,
         source_table: str,
-        field_mapping: Dict[str, str],
-        sample_size: int = 10
+        dest_table: str,
+        confidence: float = 0.95,
+        margin: float = 0.05,
+        date_column: Optional[str] = None,
+        period: str = 'year'
     ) -> bool:
-        """Validate data compatibility by sampling records"""
-        self.logger.info(f"Validating data compatibility for: {source_table} (sample: {sample_size} records)")
+        """
+        Validate data compatibility by transforming a stratified random sample of records
+        
+        The sample is drawn from the whole table (see stratified_sample), by
+        date range if date_column is given, rather than from its first rows.
+        """
+        self.logger.info(f"Validating data compatibility for: {source_table}")
         
         try:
-            # Get sample data
-            sample_data = self.access_db.fetch_all(source_table, limit=sample_size)
+            table = self.access_db.fetch_table(source_table)
+            sample, strata = stratified_sample(table, confidence, margin, date_column, period)
+            sampled = sum(info['sampled'] for info in strata.values())
             
-            if not sample_data:
+            if not sampled:
                 self.warnings.append(f"No sample data available for '{source_table}'")
                 return True
             
-            # Basic validation: check for None values in required fields
-            # This is a simplified check - actual validation happens during transformation
+            plan = compile_row_plan(source_table, dest_table, table.schema, {})
+            # Fields that fail to transform are set to NULL, counted in the plan
+            failures = Counter()
             issues = 0
-            for record in sample_data:
-                for source_col in field_mapping.keys():
-                    if source_col in record and record[source_col] is None:
-                        # This might be okay if the field is nullable
-                        pass
+            for rows in sample.values():
+                for _, row in rows:
+                    transform_row(row, plan)
+                    field_errors = collect_field_errors(plan)
+                    if field_errors:
+                        issues += 1
+                        failures.update(field_errors)
             
             if issues > 0:
+                examples = ', '.join(f"{field} ({count})" for field, count in failures.most_common(3))
                 self.warnings.append(
-                    f"Found {issues} potential data issues in sample from '{source_table}'"
+                    f"{issues} of {sampled} sampled records from '{source_table}' have fields that fail to transform "
+                    f"(~{issues / sampled:.1%} +/- {margin:.0%} of the table at {confidence:.0%} confidence): {examples}"
                 )
             
-            self.logger.success(f"Data compatibility check passed for: {source_table}")
+            self.logger.success(f"Data compatibility check passed for: {source_table} (sample: {sampled} records)")
             return True
-            
+        
         except Exception as e:
             self.warnings.append(f"Could not validate data compatibility for '{source_table}': {e}")
             return True  # Don't fail on this, just warn